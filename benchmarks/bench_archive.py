@@ -0,0 +1,110 @@
+"""
+Benchmark: report archive query latency at scale.
+
+Fills a fresh archive (tools/archive.py) with synthetic runs spread over the last
+year: `--tickers` tickers, each with a random walk of recommendations and section
+texts drawn from a finance vocabulary, of which a share is carried over unchanged
+from the ticker's previous run like tools/delta.py does. Reports the write rate and
+database size, then p50/p95 latency of the CLI's queries.
+
+    python -m benchmarks.bench_archive --runs 100000 --tickers 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from tools.archive import RECOMMENDATIONS, ReportArchive
+from tools.tracing import percentile
+
+AGENTS = ("technical_analysis_agent", "fundamental_analysis_agent", "summary_recommendation_agent")
+
+WORDS = ("revenue growth margin pressure guidance analyst upgrade downgrade target valuation premium discount "
+         "support resistance breakout momentum oversold overbought moving average crossover volume trend "
+         "datacenter hyperscaler capex backlog subscription churn pricing inventory supply demand cycle "
+         "earnings beat miss outlook dividend buyback debt leverage cash flow competition regulation tariff").split()
+
+
+def synthetic_text(rng: random.Random, chars: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def fill(archive: ReportArchive, args) -> float:
+    """Writes the synthetic runs oldest first; returns the seconds it took."""
+    rng = random.Random(0)
+    now = time.time()
+    span = 365 * 24 * 3600
+    previous: dict[str, dict] = {}
+    started = time.perf_counter()
+    for i in range(args.runs):
+        ticker = f"T{rng.randrange(args.tickers):05d}"
+        run_at = now - span + span * i / args.runs
+        last = previous.get(ticker)
+        rating = last["recommendation"] if last and rng.random() < 0.8 else rng.choice(RECOMMENDATIONS)
+        sections = []
+        for agent in AGENTS:
+            carried = last is not None and rng.random() < args.carried
+            body = last["bodies"][agent] if carried else synthetic_text(rng, args.body_chars)
+            sections.append({"agent": agent, "body": body, "carried": carried})
+        run = {"ticker": ticker, "run_at": run_at, "recommendation": rating, "short_term": rating,
+               "long_term": rng.choice(RECOMMENDATIONS), "route": "full", "close": rng.uniform(5, 500),
+               "rsi": rng.uniform(10, 90)}
+        artifacts = [{"kind": kind, "name": f"{ticker}_{kind}", "sha256": f"{rng.getrandbits(256):064x}", "bytes": 1000}
+                     for kind in ("report", "chart", "poster")]
+        archive.record(run, sections, artifacts)
+        previous[ticker] = {"recommendation": rating, "bodies": {s["agent"]: s["body"] for s in sections}}
+    return time.perf_counter() - started
+
+
+def timed(func, repeat: int) -> tuple[float, float, int]:
+    """p50 and p95 milliseconds of `func()` and the rows it returned."""
+    times, rows = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(func())
+        times.append((time.perf_counter() - started) * 1000)
+    return percentile(times, 50), percentile(times, 95), rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=100_000)
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--body-chars", type=int, default=800, help="Characters per synthetic section.")
+    parser.add_argument("--carried", type=float, default=0.5, help="Share of sections carried from the previous run.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", help="Archive to query instead of a fresh synthetic one.")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        archive = ReportArchive(args.db)
+    else:
+        archive = ReportArchive(os.path.join(tempfile.mkdtemp(), "archive.sqlite"))
+        seconds = fill(archive, args)
+        print(f"wrote {args.runs} runs in {seconds:.1f}s ({args.runs / seconds:.0f} runs/s), "
+              f"{os.path.getsize(archive.path) / 2 ** 20:.0f} MB")
+
+    now = time.time()
+    day = 24 * 3600
+    queries = {
+        "history T00001, 6 months": lambda: archive.history("T00001", now - 182 * day),
+        "Buy runs, last week": lambda: archive.runs("Buy", now - 7 * day),
+        "Buy, latest per ticker, last week": lambda: archive.runs("Buy", now - 7 * day, latest=True),
+        "changes T00001": lambda: archive.changes("T00001"),
+        "changes all tickers, last week": lambda: archive.changes(since=now - 7 * day),
+        "search 'hyperscaler', top 20": lambda: archive.search("hyperscaler"),
+        "search 'NEAR(margin pressure)', 30d": lambda: archive.search("NEAR(margin pressure)", since=now - 30 * day),
+        "search 'backlog' for T00001": lambda: archive.search("backlog", ticker="T00001"),
+    }
+    print(f"{'query':<42}{'p50 ms':>9}{'p95 ms':>9}{'rows':>7}")
+    for name, query in queries.items():
+        p50, p95, rows = timed(query, args.repeat)
+        print(f"{name:<42}{p50:>9.1f}{p95:>9.1f}{rows:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: charts/sec through the render pool at 1, 4 and N workers.
+
+Renders the technical chart for synthetic tickers, offline. Pool start-up (including
+the per-worker warm-up render) is reported separately from steady-state throughput.
+
+    python -m benchmarks.bench_charts --charts 48 --workers 1 4 8
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.bench_indicators import synthetic_panel
+from tools.chartrender import get_render_pool, render_chart_png, render_in_pool, shutdown_render_pool
+from tools.indicators import add_indicators
+
+
+def synthetic_frames(n_tickers: int, n_bars: int = 500) -> list[pd.DataFrame]:
+    panel = synthetic_panel(n_tickers, n_bars)
+    index = pd.bdate_range(end="2025-12-31", periods=n_bars)
+    frames = []
+    for row in range(n_tickers):
+        close = panel["Close"][row]
+        df = pd.DataFrame({
+            "Open": close * 0.995, "High": panel["High"][row], "Low": panel["Low"][row],
+            "Close": close, "Volume": (1e6 * (1 + row % 7)) * (close / close.mean()),
+        }, index=index)
+        frames.append(add_indicators(df).tail(200))
+    return frames
+
+
+async def bench(workers: int, frames: list[pd.DataFrame]) -> tuple[float, float]:
+    started = time.perf_counter()
+    pool = get_render_pool(workers)
+    # block until every worker has run its initializer
+    await asyncio.gather(*(asyncio.wrap_future(pool.submit(os.getpid)) for _ in range(workers * 2)))
+    warmup = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(render_in_pool(render_chart_png, df, f"T{i}") for i, df in enumerate(frames)))
+    elapsed = time.perf_counter() - started
+    shutdown_render_pool()
+    return warmup, len(frames) / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--charts", type=int, default=48)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 4, os.cpu_count() or 1}))
+    args = parser.parse_args(argv)
+
+    frames = synthetic_frames(args.charts)
+
+    started = time.perf_counter()
+    for i, df in enumerate(frames[:8]):
+        render_chart_png(df, f"T{i}")
+    inline = min(8, len(frames)) / (time.perf_counter() - started)
+
+    print(f"{args.charts} charts, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'startup (s)':>14}{'charts/sec':>12}")
+    print(f"{'inline':>8}{'-':>14}{inline:>12.1f}")
+    for workers in args.workers:
+        warmup, rate = asyncio.run(bench(workers, frames))
+        print(f"{workers:>8}{warmup:>14.2f}{rate:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: prompt size of the summary and visualization agents, full reports vs digests.
+
+Splits the sample reports in outputs/ into their agent sections and builds the
+summary and visualization requests both ways: with the analysts' full answers in the
+instruction and quoted again from the conversation history (as before
+tools/handoff.py), and with only the digests. Digests are written at their schema's
+maximum size (every string and list full), so the "digest" rows are an upper bound.
+Tokens are estimated at 4 characters each. With --live, both summary prompts are
+also sent to the model and the latency and prompt tokens are reported.
+
+    python -m benchmarks.bench_handoff
+    python -m benchmarks.bench_handoff --live gemini-2.5-flash --repeat 3
+"""
+import argparse
+import asyncio
+import glob
+import re
+import time
+
+from stock_analysis_agent.prompts import SUMMARY_AGENT_CONFIG, VISUALIZATION_AGENT_CONFIG
+from tools.handoff import HANDOFFS, FundamentalDigest, SummaryDigest, TechnicalDigest
+from tools.tracing import percentile
+
+_SECTION_RE = re.compile(r"^# (\w+_agent)\n(.*?)(?=^# \w+_agent\n|\Z)", re.S | re.M)
+_VAR_RE = re.compile(r"\{(\w+)\??\}")
+
+MAX_TEXT = "x" * 160
+
+# every field at its bound
+MAX_DIGESTS = {
+    "technical_analysis_agent": TechnicalDigest(
+        trend="sideways", momentum=MAX_TEXT, key_levels={"support": [1000.25] * 3, "resistance": [1000.25] * 3},
+        signals=[MAX_TEXT] * 4, risks=[MAX_TEXT] * 3),
+    "fundamental_analysis_agent": FundamentalDigest(
+        valuation="overvalued", valuation_note=MAX_TEXT, growth="decelerating", analyst_consensus=MAX_TEXT,
+        catalysts=[MAX_TEXT] * 3, risks=[MAX_TEXT] * 3),
+    "summary_recommendation_agent": SummaryDigest(
+        recommendation="Hold", short_term={"rating": "Hold", "reason": MAX_TEXT},
+        long_term={"rating": "Hold", "reason": MAX_TEXT}, key_points=[MAX_TEXT] * 4),
+}
+
+
+def report_sections(path: str) -> dict[str, str]:
+    with open(path) as f:
+        return {name: body.strip() for name, body in _SECTION_RE.findall(f.read())}
+
+
+def render(template: str, state: dict) -> str:
+    """Fills `{key}` / `{key?}` placeholders like ADK does; unknown keys render empty."""
+    return _VAR_RE.sub(lambda match: str(state.get(match.group(1)) or ""), template)
+
+
+def prompts(ticker: str, sections: dict[str, str], digests: bool) -> dict[str, str]:
+    """The text the summary and visualization models receive for one ticker."""
+    state = {"ticker": ticker}
+    history = {}
+    for agent, (output_key, handoff_key, _) in HANDOFFS.items():
+        state[output_key] = sections.get(agent, "")
+        # before the hand-off, the reports filled the same slots and were quoted again from history
+        state[handoff_key] = MAX_DIGESTS[agent].model_dump_json() if digests else state[output_key]
+        history[agent] = "" if digests else state[output_key]
+    return {
+        "summary": render(SUMMARY_AGENT_CONFIG["instruction"], state)
+                   + history["technical_analysis_agent"] + history["fundamental_analysis_agent"],
+        "visualization": VISUALIZATION_AGENT_CONFIG["static_instruction"]
+                         + render(VISUALIZATION_AGENT_CONFIG["instruction"], state)
+                         + history["summary_recommendation_agent"],
+    }
+
+
+async def model_latency(model: str, instruction: str) -> tuple[float, int]:
+    from google import genai
+    from google.genai import types
+
+    client = genai.Client()
+    started = time.perf_counter()
+    response = await client.aio.models.generate_content(
+        model=model,
+        contents=[types.Content(role="user", parts=[types.Part(text="BEGIN")])],
+        config=types.GenerateContentConfig(system_instruction=instruction),
+    )
+    return time.perf_counter() - started, response.usage_metadata.prompt_token_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", default="outputs/*_output.md", help="Glob of sample reports.")
+    parser.add_argument("--live", metavar="MODEL", help="Also send the summary prompts to this Gemini model (needs GOOGLE_API_KEY).")
+    parser.add_argument("--repeat", type=int, default=1, help="Live calls per prompt.")
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(args.reports))
+    if not paths:
+        raise SystemExit(f"no reports match {args.reports}")
+    header = f"{'ticker':<8}{'agent':<15}{'full tok':>10}{'digest tok':>12}{'saved':>8}"
+    if args.live:
+        header += f"{'full s':>9}{'digest s':>10}{'full ptok':>11}{'digest ptok':>13}"
+    print(f"{len(paths)} reports, tokens estimated at 4 chars each; digests at their maximum size")
+    print(header)
+    totals = {"full": 0, "digest": 0}
+    for path in paths:
+        ticker = path.split("/")[-1].split("_")[0]
+        sections = report_sections(path)
+        full, digest = prompts(ticker, sections, False), prompts(ticker, sections, True)
+        for agent in full:
+            full_tokens, digest_tokens = len(full[agent]) // 4, len(digest[agent]) // 4
+            totals["full"] += full_tokens
+            totals["digest"] += digest_tokens
+            line = f"{ticker:<8}{agent:<15}{full_tokens:>10}{digest_tokens:>12}{1 - digest_tokens / full_tokens:>8.0%}"
+            if args.live and agent == "summary":
+                runs = {mode: [asyncio.run(model_latency(args.live, prompt[agent])) for _ in range(args.repeat)]
+                        for mode, prompt in (("full", full), ("digest", digest))}
+                line += (f"{percentile([r[0] for r in runs['full']], 50):>9.2f}"
+                         f"{percentile([r[0] for r in runs['digest']], 50):>10.2f}"
+                         f"{runs['full'][0][1]:>11}{runs['digest'][0][1]:>13}")
+            print(line)
+    print(f"{'total':<23}{totals['full']:>10}{totals['digest']:>12}{1 - totals['digest'] / totals['full']:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
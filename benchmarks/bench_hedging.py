@@ -0,0 +1,90 @@
+"""
+Benchmark: tail latency of model calls with and without hedging.
+
+Drives tools/hedging.py's HedgedLlm directly with a StubLlm whose latency has a slow
+tail (`--tail` of calls take `--tail-latency`) and occasional 429s, and reports
+p50/p95/p99 call latency, extra requests sent, hedge rate and wins, retries and
+the latency the hedges saved: the lower bound the run summary also prints, and the
+measured saving (the beaten requests are left to finish to measure it).
+
+    python -m benchmarks.bench_hedging --calls 400 --latency 1.0 --tail 0.05 --tail-latency 8 --scale 0.05
+"""
+import argparse
+import asyncio
+import time
+
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from benchmarks.fakes import StubLlm
+from tools.hedging import HEDGE_POLICIES, HedgedLlm, configure_hedging, hedge_stats
+from tools.ratelimit import configure_rate_limits
+from tools.tracing import percentile
+
+
+async def run(args, enabled: bool, hedge_percentile, label: str) -> dict:
+    agent = f"bench_{label}"
+    HEDGE_POLICIES[agent] = {"deadline": None, "hedge_percentile": hedge_percentile,
+                             "hedge_after": 2 * args.latency * args.scale}
+    configure_hedging(enabled=enabled, measure_losers=True, backoff_base=0.2 * args.scale, backoff_cap=2 * args.scale)
+    stub = StubLlm(model="stub-model", latency=args.latency * args.scale, jitter=0.3 * args.latency * args.scale,
+                   tail_probability=args.tail, tail_latency=args.tail_latency * args.scale,
+                   rate_limit_probability=args.rate_limited)
+    model = HedgedLlm(model=stub.model, inner=stub, agent=agent)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, failures = [], 0
+
+    async def call():
+        nonlocal failures
+        request = LlmRequest(model=stub.model, contents=[types.Content(role="user", parts=[types.Part(text="BEGIN")])])
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                async for _ in model.generate_content_async(request):
+                    pass
+            except Exception:
+                failures += 1
+                return
+            latencies.append((time.perf_counter() - started) / args.scale)
+
+    await asyncio.gather(*(call() for _ in range(args.calls)))
+    await asyncio.sleep(args.tail_latency * args.scale)  # let beaten requests finish
+    stats = hedge_stats().get(agent, {"hedged": 0, "hedge_won": 0, "retries": 0, "saved_min": 0.0, "saved": 0.0,
+                                          "calls": args.calls})
+    return {
+        "label": label, "p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99), "requests": stub.calls / args.calls - 1, "hedged": stats["hedged"] / args.calls,
+        "won": stats["hedge_won"], "retries": stats["retries"], "saved_min": stats["saved_min"] / args.scale,
+        "saved": stats["saved"] / args.scale, "failed": failures,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=1.0, help="Typical call latency in seconds (+/- 30%%).")
+    parser.add_argument("--tail", type=float, default=0.05, help="Share of calls that straggle.")
+    parser.add_argument("--tail-latency", type=float, default=8.0, help="Latency of a straggler in seconds.")
+    parser.add_argument("--rate-limited", type=float, default=0.02, help="Share of requests answered with a 429.")
+    parser.add_argument("--scale", type=float, default=0.05, help="Time scale the stub runs at (results are reported unscaled).")
+    args = parser.parse_args(argv)
+    configure_rate_limits(gemini=0)
+
+    rows = [
+        asyncio.run(run(args, False, None, "off")),
+        asyncio.run(run(args, True, None, "retry only")),
+        asyncio.run(run(args, True, 95, "hedge p95")),
+        asyncio.run(run(args, True, 90, "hedge p90")),
+    ]
+    print(f"{args.calls} calls, {args.latency}s typical, {args.tail:.0%} take {args.tail_latency}s, "
+          f"{args.rate_limited:.0%} get a 429")
+    print(f"{'mode':<12}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'extra req':>11}{'hedged':>8}{'won':>6}"
+          f"{'retries':>9}{'saved >= s':>12}{'saved s':>9}{'failed':>8}")
+    for r in rows:
+        print(f"{r['label']:<12}{r['p50']:>8.2f}{r['p95']:>8.2f}{r['p99']:>8.2f}{r['requests']:>11.1%}"
+              f"{r['hedged']:>8.1%}{r['won']:>6}{r['retries']:>9}{r['saved_min']:>12.1f}{r['saved']:>9.1f}{r['failed']:>8}")
+
+
+if __name__ == "__main__":
+    main()
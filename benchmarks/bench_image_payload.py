@@ -0,0 +1,97 @@
+"""
+Benchmark: chart payload size (and optionally model latency) per image pipeline setting.
+
+Renders synthetic technical charts, runs them through tools/imagepipe.py with each
+setting and reports the bytes attached to the request (raw and base64, as sent
+inline), the estimated image tokens and the encode time. With --live, each variant
+is also sent to the model once per chart with the technical agent's instruction,
+and the latency and prompt tokens are reported.
+
+    python -m benchmarks.bench_image_payload --charts 8
+    python -m benchmarks.bench_image_payload --charts 3 --live gemini-2.5-flash
+"""
+import argparse
+import asyncio
+import base64
+import io
+import math
+import time
+
+from PIL import Image
+
+from benchmarks.bench_charts import synthetic_frames
+from tools.chartrender import render_chart_png
+from tools.imagepipe import prepare_chart
+from tools.tracing import percentile
+
+VARIANTS = {
+    "original": {"format": "original"},
+    "png-1000-32c": {"format": "png", "max_width": 1000, "colors": 32},
+    "png-1000-64c": {"format": "png", "max_width": 1000, "colors": 64},
+    "png-800-32c": {"format": "png", "max_width": 800, "colors": 32},
+    "webp-1000-q80": {"format": "webp", "max_width": 1000, "quality": 80},
+    "webp-768-q70": {"format": "webp", "max_width": 768, "quality": 70},
+    "jpeg-1000-q80": {"format": "jpeg", "max_width": 1000, "quality": 80},
+    "webp-1000-no-volume": {"format": "webp", "max_width": 1000, "quality": 80, "panels": ["price", "rsi"]},
+}
+
+
+def image_tokens(width: int, height: int) -> int:
+    """Gemini 2.x image token estimate: 258 for small images, else 258 per 768x768 tile."""
+    if width <= 384 and height <= 384:
+        return 258
+    return math.ceil(width / 768) * math.ceil(height / 768) * 258
+
+
+async def model_latency(model: str, instruction: str, data: bytes, mime_type: str) -> tuple[float, int]:
+    from google import genai
+    from google.genai import types
+
+    client = genai.Client()
+    started = time.perf_counter()
+    response = await client.aio.models.generate_content(
+        model=model,
+        contents=[types.Content(role="user", parts=[types.Part(text="BEGIN"), types.Part.from_bytes(data=data, mime_type=mime_type)])],
+        config=types.GenerateContentConfig(system_instruction=instruction),
+    )
+    return time.perf_counter() - started, response.usage_metadata.prompt_token_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--charts", type=int, default=8)
+    parser.add_argument("--live", metavar="MODEL", help="Also measure model latency against this Gemini model (needs GOOGLE_API_KEY).")
+    args = parser.parse_args(argv)
+
+    charts = [render_chart_png(df, f"T{i}") for i, df in enumerate(synthetic_frames(args.charts))]
+    instruction = None
+    if args.live:
+        from stock_analysis_agent.prompts import TECHNICAL_AGENT_CONFIG
+        instruction = TECHNICAL_AGENT_CONFIG["instruction"].replace("{ticker}", "T0")
+
+    print(f"{args.charts} charts")
+    header = f"{'variant':<22}{'size':>11}{'bytes':>10}{'base64':>10}{'est tok':>9}{'encode ms':>11}"
+    if args.live:
+        header += f"{'p50 s':>8}{'p95 s':>8}{'prompt tok':>12}"
+    print(header)
+    for name, settings in VARIANTS.items():
+        sizes, encode_ms = [], []
+        for png in charts:
+            started = time.perf_counter()
+            data, mime_type = prepare_chart(png, settings)
+            encode_ms.append((time.perf_counter() - started) * 1000)
+            sizes.append(data)
+        width, height = Image.open(io.BytesIO(sizes[0])).size
+        raw = sum(len(d) for d in sizes) / len(sizes)
+        b64 = sum(len(base64.b64encode(d)) for d in sizes) / len(sizes)
+        line = (f"{name:<22}{f'{width}x{height}':>11}{raw / 1024:>9.0f}K{b64 / 1024:>9.0f}K"
+                f"{image_tokens(width, height):>9}{percentile(encode_ms, 50):>11.1f}")
+        if args.live:
+            runs = [asyncio.run(model_latency(args.live, instruction, d, mime_type)) for d in sizes]
+            seconds = [r[0] for r in runs]
+            line += f"{percentile(seconds, 50):>8.2f}{percentile(seconds, 95):>8.2f}{runs[0][1]:>12}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: per-ticker pandas indicators vs the vectorized panel engine.
+
+Runs entirely offline on synthetic random-walk prices.
+
+    python -m benchmarks.bench_indicators --tickers 300 3000 --bars 500
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from tools.indicators import IndicatorState, compute_indicators
+
+
+def synthetic_panel(n_tickers: int, n_bars: int, seed: int = 0) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_tickers, n_bars)), axis=1))
+    return {"Close": close, "High": close * 1.01, "Low": close * 0.99}
+
+
+def legacy_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """The per-ticker path get_stock_data used before the indicator engine."""
+    df['SMA_50'] = df['Close'].rolling(window=50).mean()
+    df['SMA_200'] = df['Close'].rolling(window=200).mean()
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0))
+    loss = (-delta.where(delta < 0, 0))
+    avg_gain = gain.rolling(window=14).mean()
+    avg_loss = loss.rolling(window=14).mean()
+    rs = avg_gain / avg_loss
+    df['RSI'] = 100 - (100 / (1 + rs))
+    return df
+
+
+def bench(n_tickers: int, n_bars: int) -> dict:
+    panel = synthetic_panel(n_tickers, n_bars)
+    index = pd.bdate_range(end="2025-12-31", periods=n_bars)
+    frames = [pd.DataFrame({"Close": row}, index=index) for row in panel["Close"]]
+
+    started = time.perf_counter()
+    for df in frames:
+        legacy_indicators(df)
+    legacy = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compute_indicators(panel["Close"], panel["High"], panel["Low"])
+    vectorized = time.perf_counter() - started
+
+    state = IndicatorState.from_history(panel["Close"], panel["High"], panel["Low"])
+    new_bar = panel["Close"][:, -1] * 1.001
+    started = time.perf_counter()
+    state.update(new_bar, new_bar * 1.01, new_bar * 0.99)
+    incremental = time.perf_counter() - started
+
+    return {
+        "tickers": n_tickers,
+        "legacy (SMA/RSI only)": n_tickers / legacy,
+        "panel (full set)": n_tickers / vectorized,
+        "incremental bar": n_tickers / incremental,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 300, 3000])
+    parser.add_argument("--bars", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    print(f"tickers/sec at {args.bars} bars per ticker")
+    print(f"{'tickers':>8}{'legacy (SMA/RSI only)':>24}{'panel (full set)':>20}{'incremental bar':>18}")
+    for n in args.tickers:
+        row = bench(n, args.bars)
+        print(f"{row['tickers']:>8}{row['legacy (SMA/RSI only)']:>24,.0f}{row['panel (full set)']:>20,.0f}{row['incremental bar']:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
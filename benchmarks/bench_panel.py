@@ -0,0 +1,83 @@
+"""
+Benchmark: memory and build time of per-ticker DataFrames vs the universe panel.
+
+Fills a temporary price store from the synthetic provider, then loads the same 500
+days of daily bars plus SMA_50, SMA_200 and RSI for every ticker both ways: one
+get_stock_data DataFrame per ticker (float64, tz-aware index, as the charts and the
+screener used to hold them), and one UniversePanel (tools/panel.py). Memory is what
+tracemalloc sees allocated and still held once each is built, plus the peak while
+building, from a second build (tracemalloc slows it down); "200-bar frames" times
+producing the chart input of every ticker.
+
+    python -m benchmarks.bench_panel --tickers 500 3000
+"""
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import SyntheticPriceProvider
+from tools.customtool import get_stock_data
+from tools.panel import PANEL_DAYS, load_panel
+from tools.pricestore import PriceStore, set_price_store
+
+
+def measure(build) -> tuple[object, float, float, float]:
+    """Runs `build()` twice; returns (result, seconds, MB held afterwards, peak MB while building)."""
+    started = time.perf_counter()
+    build()
+    seconds = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, held / 2 ** 20, peak / 2 ** 20
+
+
+def bench(n_tickers: int, days: int) -> dict:
+    tickers = [f"T{i:05d}" for i in range(n_tickers)]
+    set_price_store(PriceStore(tempfile.mkdtemp(), provider=SyntheticPriceProvider()))
+    load_panel(tickers, days, columns=("Close",))  # fill the store, so both reads are local
+
+    frames, frame_s, frame_mb, frame_peak = measure(lambda: {t: get_stock_data(t, days) for t in tickers})
+    panel, panel_s, panel_mb, panel_peak = measure(lambda: load_panel(tickers, days))
+
+    started = time.perf_counter()
+    for df in frames.values():
+        df.tail(200)
+    frame_views = time.perf_counter() - started
+    started = time.perf_counter()
+    for ticker in tickers:
+        panel.view(ticker, 200)
+    panel_views = time.perf_counter() - started
+
+    return {
+        "tickers": n_tickers, "bars": len(panel.index),
+        "frames": (frame_s, frame_mb, frame_peak, frame_views),
+        "panel": (panel_s, panel_mb, panel_peak, panel_views),
+        "panel arrays MB": panel.nbytes / 2 ** 20,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[500, 3000])
+    parser.add_argument("--days", type=int, default=PANEL_DAYS, help="Calendar days of daily bars per ticker.")
+    args = parser.parse_args(argv)
+
+    print(f"{'tickers':>8}{'bars':>6}  {'layout':<12}{'build s':>9}{'held MB':>9}{'peak MB':>9}{'KB/ticker':>11}{'200-bar frames s':>18}")
+    for n in args.tickers:
+        row = bench(n, args.days)
+        for layout in ("frames", "panel"):
+            seconds, held, peak, views = row[layout]
+            print(f"{row['tickers']:>8}{row['bars']:>6}  {layout:<12}{seconds:>9.2f}{held:>9.1f}{peak:>9.1f}"
+                  f"{held * 1024 / n:>11.1f}{views:>18.3f}")
+        print(f"{'':>16}panel arrays {row['panel arrays MB']:.1f} MB, "
+              f"{row['frames'][1] / row['panel'][1]:.1f}x less held than per-ticker frames")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: the whole research workflow end to end, offline.
+
+Runs main.main() against synthetic prices (benchmarks/fakes.py) and stub models with
+configurable latency, in a scratch directory, so regressions in tools/customtool.py
+or main.py show up as numbers. Each universe size runs in its own process so peak
+RSS is measured per size.
+
+    python -m benchmarks.bench_pipeline --sizes 1 10 1000 --concurrency 16
+    python -m benchmarks.bench_pipeline --sizes 10 --gemini-latency 1.5 --perplexity-latency 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_one(n_tickers: int, concurrency: int, gemini_latency: float, perplexity_latency: float, jitter: float) -> dict:
+    """Runs one batch in a scratch directory and returns its measurements."""
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)
+    os.makedirs("outputs")
+    os.environ.update({
+        "CHART_CACHE_DIR": os.path.join(workdir, "charts"),
+        "SESSION_STORE_DIR": os.path.join(workdir, "sessions"),
+        "LLM_CACHE_DIR": os.path.join(workdir, "llm_cache"),
+    })
+
+    from benchmarks.fakes import SyntheticMetricsProvider, SyntheticPriceProvider, install_stub_models
+    from tools.metricsstore import MetricsStore, set_metrics_store
+    from tools.pricestore import PriceStore, set_price_store
+    from tools.tracing import aggregate, percentile
+
+    prices = SyntheticPriceProvider()
+    set_price_store(PriceStore(os.path.join(workdir, "prices"), provider=prices))
+    set_metrics_store(MetricsStore(os.path.join(workdir, "metrics.sqlite"), provider=SyntheticMetricsProvider()))
+    stubs = install_stub_models(gemini_latency, perplexity_latency, jitter)
+
+    import main
+
+    tickers = [f"SYN{i:04d}" for i in range(n_tickers)]
+    argv = tickers + ["-c", str(concurrency), "--gemini-rpm", "0", "--perplexity-rpm", "0", "--llm-cache", "off"]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(main.main(argv))
+    elapsed = time.perf_counter() - started
+
+    totals = [r["total"] for r in results]
+    return {
+        "tickers": n_tickers,
+        "ok": sum(r["ok"] for r in results),
+        "elapsed": elapsed,
+        "per_min": n_tickers / elapsed * 60,
+        "ticker_p50": percentile(totals, 50),
+        "ticker_p95": percentile(totals, 95),
+        # ru_maxrss is in KiB on Linux; chart render workers are not included
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "model_calls": sum(stub.calls for stub in stubs),
+        "price_fetches": len(prices.calls),
+        "stages": aggregate([r["tracer"] for r in results]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 1000])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--gemini-latency", type=float, default=0.05, help="Stub latency per Gemini call, seconds.")
+    parser.add_argument("--perplexity-latency", type=float, default=0.1, help="Stub latency per Perplexity call, seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter added to each stub call, seconds.")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one is not None:
+        result = run_one(args.run_one, args.concurrency, args.gemini_latency, args.perplexity_latency, args.jitter)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for size in args.sizes:
+        command = [sys.executable, "-m", "benchmarks.bench_pipeline", "--run-one", str(size),
+                   "--concurrency", str(args.concurrency), "--gemini-latency", str(args.gemini_latency),
+                   "--perplexity-latency", str(args.perplexity_latency), "--jitter", str(args.jitter)]
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [REPO, os.environ.get("PYTHONPATH")]))}
+        completed = subprocess.run(command, cwd=REPO, env=env, stdout=subprocess.PIPE, text=True, check=True)
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(f"stub latency: gemini {args.gemini_latency}s, perplexity {args.perplexity_latency}s; concurrency {args.concurrency}")
+    print(f"{'tickers':>8}{'ok':>6}{'wall s':>9}{'tickers/min':>13}{'p50 s':>8}{'p95 s':>8}{'RSS MB':>9}{'model calls':>13}{'fetches':>9}")
+    for r in results:
+        print(f"{r['tickers']:>8}{r['ok']:>6}{r['elapsed']:>9.1f}{r['per_min']:>13.1f}{r['ticker_p50']:>8.2f}{r['ticker_p95']:>8.2f}"
+              f"{r['rss_mb']:>9.0f}{r['model_calls']:>13}{r['price_fetches']:>9}")
+
+    print("\nper-stage p50 / p95 seconds")
+    stages = sorted({(s["cat"], s["name"]) for r in results for s in r["stages"]})
+    print(f"{'stage':<42}" + "".join(f"{f'{r['tickers']} tickers':>20}" for r in results))
+    for cat, name in stages:
+        cells = []
+        for r in results:
+            row = next((s for s in r["stages"] if (s["cat"], s["name"]) == (cat, name)), None)
+            cells.append(f"{row['p50']:.3f} / {row['p95']:.3f}" if row else "-")
+        print(f"{cat + ':' + name:<42}" + "".join(f"{c:>20}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: how long storing posters stalls the event loop.
+
+Generates poster-sized synthetic images (noise and gradients, so they compress like a
+busy infographic) and stores them the old way (`Part.as_image().save()` inline in
+the loop) and through tools/imagesink.py, optionally with thumbnail/WebP
+derivatives. A heartbeat task ticking every millisecond measures the longest gap
+the loop could not run anything else (what every other session waits), next to the
+wall time per poster.
+
+    python -m benchmarks.bench_poster_sink --posters 10 --size 1792x2400
+"""
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+from google.genai import types
+from PIL import Image
+
+from tools.chartrender import render_in_pool, shutdown_render_pool
+from tools.imagesink import configure_image_sink, drain_derivatives, save_poster
+
+
+def synthetic_poster(width: int, height: int, seed: int, fmt: str) -> bytes:
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    noise = rng.integers(0, 48, size=(height, width, 3))
+    buffer = io.BytesIO()
+    Image.fromarray((base + noise).clip(0, 255).astype(np.uint8)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+async def measure(store, posters: list[bytes]) -> tuple[float, float]:
+    """Runs `store` for every poster; returns (wall seconds per poster, longest loop stall in seconds)."""
+    gaps = []
+    running = True
+
+    async def heartbeat():
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    for i, data in enumerate(posters):
+        await store(i, data)
+    elapsed = time.perf_counter() - started
+    running = False
+    await beat
+    return elapsed / len(posters), max(gaps)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posters", type=int, default=10)
+    parser.add_argument("--size", default="1792x2400", help="Poster width x height in pixels.")
+    parser.add_argument("--format", choices=["png", "jpeg"], default="png")
+    args = parser.parse_args(argv)
+    width, height = (int(v) for v in args.size.split("x"))
+    mime_type = f"image/{args.format}"
+
+    posters = [synthetic_poster(width, height, seed, args.format) for seed in range(args.posters)]
+    print(f"{args.posters} {args.format} posters of {width}x{height}, {np.mean([len(p) for p in posters]) / 1e6:.1f} MB each")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        async def inline(i, data):
+            part = types.Part.from_bytes(data=data, mime_type=mime_type)
+            part.as_image().save(os.path.join(workdir, f"OLD{i}_output.{args.format}"))
+
+        async def sink(i, data):
+            await save_poster(f"NEW{i}", data, mime_type)
+
+        async def sink_with_derivatives(i, data):
+            await save_poster(f"DER{i}", data, mime_type)
+
+        async def run():
+            rows = []
+            configure_image_sink(output_dir=workdir, derivatives=[])
+            rows.append(("as_image().save in the loop (old)", *await measure(inline, posters)))
+            rows.append(("imagesink", *await measure(sink, posters)))
+            configure_image_sink(derivatives=["thumb", "webp"])
+            await render_in_pool(int)  # start and warm the workers first
+            rows.append(("imagesink + thumb/webp", *await measure(sink_with_derivatives, posters)))
+            started = time.perf_counter()
+            await drain_derivatives()
+            return rows, time.perf_counter() - started
+
+        try:
+            rows, drain = asyncio.run(run())
+        finally:
+            shutdown_render_pool()
+
+    print(f"{'sink':<36}{'ms/poster':>11}{'max loop stall ms':>19}")
+    for label, per_poster, stall in rows:
+        print(f"{label:<36}{per_poster * 1e3:>11.1f}{stall * 1e3:>19.1f}")
+    print(f"derivatives finished {drain:.1f}s after the last poster was stored")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: import cost of the entry points, with a budget check.
+
+Imports `main` (what every `python main.py` run pays before any work) and
+tools/jobqueue.py (what a cron job pays to queue a batch for the resident worker) in
+fresh interpreters under `-X importtime`, and reports the total and the packages
+that take longest to import. Exits non-zero if an entry point goes over its budget
+or imports one of the libraries that are only meant to load on first use.
+
+A dependency may import such a library itself (google.genai loads Pillow when it is
+installed), which hides a later module-level import of ours from -X importtime; so
+the repo's sources are also checked for module-level imports of them.
+
+    python -m benchmarks.bench_startup --runs 3 --budget 4.5
+"""
+import argparse
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+# Only loaded when a chart is drawn or prepared, data is fetched or a Perplexity call is made.
+LAZY_MODULES = ("yfinance", "matplotlib", "mplfinance", "litellm", "PIL")
+
+ENTRY_POINTS = {"main": None, "tools.jobqueue": 0.1}  # module -> budget in seconds (None: --budget)
+
+# The repo's own top-level packages and modules.
+OWN_PACKAGES = ("main", "tools", "stock_analysis_agent", "benchmarks")
+
+SOURCES = ("main.py", "tools/*.py", "stock_analysis_agent/*.py")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> tuple[dict[str, tuple[float, float]], dict[str, str]]:
+    """
+    Imports `module` in a fresh interpreter.
+
+    Returns:
+        ({module: (self seconds, cumulative seconds)}, {module: the module that imported it}).
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    times, parents, waiting = {}, {}, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = len(name) - len(name.lstrip())
+        name = name.strip()
+        times[name] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+        # children are printed before the module that imported them
+        while waiting and waiting[-1][0] > depth:
+            parents[waiting.pop()[1]] = name
+        waiting.append((depth, name))
+    return times, parents
+
+
+def importer(parents: dict[str, str], name: str) -> str:
+    """The first module outside `name`'s package on its import chain ("" if imported directly)."""
+    parent = parents.get(name, "")
+    while parent == name or parent.startswith(f"{name}."):
+        parent = parents.get(parent, "")
+    return parent
+
+
+def module_level_imports(names) -> list[str]:
+    """`file:line module` for every import of `names` at module level in the repo's SOURCES."""
+    found = []
+    for pattern in SOURCES:
+        for path in sorted(glob.glob(os.path.join(ROOT, pattern))):
+            with open(path) as f:
+                tree = ast.parse(f.read())
+            nodes = list(tree.body)
+            while nodes:
+                node = nodes.pop()
+                if isinstance(node, ast.If) and "TYPE_CHECKING" in ast.unparse(node.test):
+                    continue
+                if isinstance(node, (ast.If, ast.Try)):
+                    nodes.extend(node.body + node.orelse + getattr(node, "handlers", []) + getattr(node, "finalbody", []))
+                elif isinstance(node, ast.ExceptHandler):
+                    nodes.extend(node.body)
+                elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                    modules = [a.name for a in node.names] if isinstance(node, ast.Import) else [node.module or ""]
+                    for module in modules:
+                        if module.split(".")[0] in names:
+                            found.append(f"{os.path.relpath(path, ROOT)}:{node.lineno} {module}")
+    return sorted(found)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per entry point; the fastest counts.")
+    parser.add_argument("--budget", type=float, default=4.5, help="Import budget for main, in seconds.")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    over = []
+    static = module_level_imports(LAZY_MODULES)
+    if static:
+        print("module-level imports of libraries that should load on first use:")
+        for found in static:
+            print(f"  {found}")
+        over.append("module-level imports")
+    for module, budget in ENTRY_POINTS.items():
+        budget = args.budget if budget is None else budget
+        runs = [import_times(module) for _ in range(args.runs)]
+        best, parents = min(runs, key=lambda run: run[0][module][1])
+        total = best[module][1]
+        loaded = {name: importer(parents, name) for name in LAZY_MODULES if name in best}
+        eager = [name for name, by in loaded.items() if not by or by.split(".")[0] in OWN_PACKAGES]
+        status = "ok" if total <= budget and not eager else "OVER"
+        print(f"\nimport {module}: {total:.2f}s (budget {budget:.2f}s) {status}")
+        if eager:
+            print(f"  loaded at import, should be lazy: {', '.join(f'{n} (by {loaded[n]})' for n in eager)}")
+        for name, by in loaded.items():
+            if name not in eager:
+                print(f"  {name} is loaded by the dependency {by}")
+        packages: dict[str, float] = {}
+        for name, (self_seconds, _) in best.items():
+            parts = name.split(".")
+            package = ".".join(parts[:2]) if parts[0] == "google" else parts[0]
+            packages[package] = packages.get(package, 0.0) + self_seconds
+        for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {package:<32}{seconds:>8.2f}s")
+        if status != "ok":
+            over.append(module)
+    if over:
+        sys.exit(f"\nover budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Offline stand-ins for the network dependencies, shared by the benchmarks.
+
+- SyntheticPriceProvider / SyntheticMetricsProvider replace yfinance behind the price
+  and metrics stores with deterministic per-ticker random walks and financials.
+- StubLlm replaces Gemini / Perplexity: it waits a configurable latency (with an
+  optional slow tail and rate-limit errors), calls get_stock_chart once when the
+  agent has tools, returns an image for the visualization model and otherwise a
+  canned answer with token usage (ending in a <digest> block for the agents that
+  hand one off, see tools/handoff.py).
+"""
+import asyncio
+import io
+import random
+import re
+import time
+import zlib
+from typing import AsyncGenerator, Optional
+
+import numpy as np
+import pandas as pd
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+from PIL import Image
+
+
+# (sector, industry) pairs handed out to synthetic tickers
+SYNTHETIC_INDUSTRIES = [
+    ("Technology", "Semiconductors"),
+    ("Technology", "Software - Infrastructure"),
+    ("Healthcare", "Biotechnology"),
+    ("Financial Services", "Banks - Regional"),
+    ("Energy", "Oil & Gas E&P"),
+    ("Consumer Cyclical", "Specialty Retail"),
+]
+
+
+def _seed(ticker: str) -> int:
+    return zlib.crc32(ticker.upper().encode())
+
+
+class SyntheticPriceProvider:
+    """
+    Random-walk OHLCV per ticker, deterministic for a given `end`.
+
+    Daily bars only; `calls` records every fetch so benchmarks can count downloads.
+    """
+
+    def __init__(self, end: str = "2026-10-16", history: int = 1500, latency: float = 0.0):
+        self.end = pd.Timestamp(end, tz="America/New_York")
+        self.history = history
+        self.latency = latency
+        self.calls: list[tuple] = []
+
+    def frame(self, ticker: str) -> pd.DataFrame:
+        rng = np.random.default_rng(_seed(ticker))
+        index = pd.bdate_range(end=self.end, periods=self.history, tz="America/New_York")
+        close = 20 + 80 * rng.random() * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(index))))
+        spread = np.abs(rng.normal(0, 0.01, len(index)))
+        return pd.DataFrame({
+            "Open": close * (1 + rng.normal(0, 0.005, len(index))),
+            "High": close * (1 + spread),
+            "Low": close * (1 - spread),
+            "Close": close,
+            "Volume": rng.integers(100_000, 5_000_000, len(index)),
+        }, index=index)
+
+    def fetch(self, ticker: str, interval: str, start: Optional[pd.Timestamp] = None,
+              period: Optional[str] = None) -> pd.DataFrame:
+        self.calls.append((ticker, interval, start, period))
+        if self.latency:
+            time.sleep(self.latency)
+        df = self.frame(ticker)
+        if start is not None:
+            return df[df.index >= start]
+        return df[df.index >= self.end.normalize() - pd.Timedelta(days=int(period[:-1]) - 1)]
+
+
+class SyntheticMetricsProvider:
+    """Quarterly/annual income statements and an info snapshot per ticker."""
+
+    def __init__(self, end: str = "2026-06-30"):
+        self.end = pd.Timestamp(end)
+        self.calls: list[str] = []
+
+    def fetch_statements(self, ticker: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        self.calls.append(ticker)
+        rng = np.random.default_rng(_seed(ticker))
+        base = rng.lognormal(20, 1.5)
+        growth = rng.normal(0.03, 0.05)
+        quarters = pd.date_range(end=self.end, periods=5, freq="QE")[::-1]
+        revenue = base * (1 + growth) ** np.arange(5)[::-1]
+        quarterly = pd.DataFrame([revenue, revenue * rng.normal(0.1, 0.1)], index=["Total Revenue", "Net Income"], columns=quarters)
+        years = pd.date_range(end=self.end, periods=2, freq="YE")[::-1]
+        annual = pd.DataFrame([[revenue[:4].sum(), revenue[:4].sum() / (1 + growth) ** 4], [revenue[:4].sum() * 0.1] * 2],
+                              index=["Total Revenue", "Net Income"], columns=years)
+        return quarterly, annual
+
+    def fetch_info(self, ticker: str) -> dict:
+        rng = np.random.default_rng(_seed(ticker) + 1)
+        sector, industry = SYNTHETIC_INDUSTRIES[_seed(ticker) % len(SYNTHETIC_INDUSTRIES)]
+        return {
+            "sector": sector,
+            "industry": industry,
+            "marketCap": float(rng.lognormal(23, 1.5)),
+            "trailingPE": float(rng.uniform(5, 80)),
+            "priceToSalesTrailing12Months": float(rng.uniform(0.5, 40)),
+            "totalDebt": float(rng.lognormal(20, 2)),
+            "debtToEquity": float(rng.uniform(0, 200)),
+        }
+
+
+# canned <digest> JSON per agent that hands one off
+STUB_DIGESTS = {
+    "technical_analysis_agent": '{"trend": "uptrend", "momentum": "RSI 58, MACD above signal", '
+                                '"key_levels": {"support": [95.0, 90.0], "resistance": [110.0]}, '
+                                '"signals": ["price above 50-day SMA"], "risks": ["volume fading"]}',
+    "fundamental_analysis_agent": '{"valuation": "fair", "valuation_note": "P/E in line with peers", '
+                                  '"growth": "stable", "analyst_consensus": "mostly Buy, target +12%", '
+                                  '"catalysts": ["new product cycle"], "risks": ["customer concentration"]}',
+    "summary_recommendation_agent": '{"recommendation": "Hold", "short_term": {"rating": "Hold", "reason": "near resistance"}, '
+                                    '"long_term": {"rating": "Buy", "reason": "steady growth"}, '
+                                    '"key_points": ["uptrend intact", "fair valuation"]}',
+}
+
+
+def _tiny_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (30, 120, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class StubRateLimitError(Exception):
+    """What a provider raises when its quota is exhausted."""
+
+    code = 429
+
+
+class StubLlm(BaseLlm):
+    """
+    Model stand-in with canned responses.
+
+    Each call takes `latency` +/- `jitter` seconds, or `tail_latency` with probability
+    `tail_probability` (the rare straggler), and fails with a 429 with probability
+    `rate_limit_probability`.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    tail_probability: float = 0.0
+    tail_latency: float = 0.0
+    rate_limit_probability: float = 0.0
+    image: bool = False
+    digest: Optional[str] = None
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        if random.random() < self.rate_limit_probability:
+            await asyncio.sleep(0.01)
+            raise StubRateLimitError("429 RESOURCE_EXHAUSTED (stub)")
+        if random.random() < self.tail_probability:
+            await asyncio.sleep(self.tail_latency)
+        else:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        usage = types.GenerateContentResponseUsageMetadata(prompt_token_count=1200, candidates_token_count=300)
+
+        last = llm_request.contents[-1] if llm_request.contents else None
+        answered = last is not None and any(p.function_response for p in last.parts or [])
+        if llm_request.tools_dict and not answered:
+            match = re.search(r"chart of (\w+)", str(llm_request.config.system_instruction))
+            call = types.FunctionCall(name="get_stock_chart", args={"ticker": match.group(1) if match else "SYN"})
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]), usage_metadata=usage)
+            return
+
+        text = f"Stub analysis from {self.model}.\n\n- point one\n- point two"
+        if self.digest:
+            text += f"\n\n<digest>\n{self.digest}\n</digest>"
+        parts = [types.Part(text=text)]
+        if self.image:
+            parts.append(types.Part.from_bytes(data=_tiny_png(), mime_type="image/png"))
+        yield LlmResponse(content=types.Content(role="model", parts=parts), usage_metadata=usage)
+
+
+def install_stub_models(gemini_latency: float = 0.05, perplexity_latency: float = 0.1, jitter: float = 0.0,
+                        **distribution) -> list:
+    """
+    Swaps the model of every LLM agent in the workflow for a StubLlm; returns the stubs.
+
+    A hedging wrapper (tools/hedging.py) stays in place around the stub. `distribution`
+    sets the StubLlm tail / rate-limit fields on every stub.
+    """
+    import stock_analysis_agent.agent as agent_module
+    from tools.hedging import HedgedLlm
+
+    stubs = []
+    for agent in (agent_module.technical_agent, agent_module.fundamental_agent, agent_module.sector_agent,
+                  agent_module.summary_agent, agent_module.visualization_agent):
+        name = getattr(agent.model, "model", agent.model)
+        latency = perplexity_latency if str(name).startswith("perplexity/") else gemini_latency
+        stub = StubLlm(model=str(name), latency=latency, jitter=jitter,
+                       image=agent is agent_module.visualization_agent, digest=STUB_DIGESTS.get(agent.name),
+                       **distribution)
+        if isinstance(agent.model, HedgedLlm):
+            agent.model.inner = stub
+        else:
+            agent.model = stub
+        stubs.append(stub)
+    return stubs
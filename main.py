@@ -1,89 +1,412 @@
-import asyncio, datetime
-from google.adk.runners import InMemoryRunner
+import argparse, asyncio, datetime, importlib, time
+from google.adk.runners import Runner
 from google.genai import types
 from stock_analysis_agent.agent import root_agent
-import logging,random
+from tools.ratelimit import configure_rate_limits
+from tools.llmcache import LLM_CACHE_MODES, configure_llm_cache
+from tools.customtool import prerender_charts
+from tools.chartrender import shutdown_render_pool, warm_render_pool
+from tools.imagesink import DERIVATIVES, configure_image_sink, drain_derivatives, save_poster
+from tools.tracing import percentile, print_aggregate, start_trace
+from tools.report import ReportWriter
+from tools.sessionstore import ContentAddressedArtifactService, create_runner, evict_session
+from tools.screener import print_screen, screen
+from tools.backtest import backtest_universe, format_backtest, print_backtest
+from tools.sectorresearch import plan_sector_research, print_plan
+from tools.routing import plan_routes, print_route_savings, print_routes
+from tools.delta import plan_delta, print_delta, save_snapshot
+from tools.jobqueue import JobQueue
+from tools.hedging import configure_hedging, print_hedge_stats
+from tools.handoff import HANDOFFS, handoff_state
+from tools.archive import archive_metrics, archive_run
+from stock_analysis_agent.prompts import (
+    TECHNICAL_AGENT_CONFIG,
+    FUNDAMENTAL_AGENT_CONFIG,
+    SUMMARY_AGENT_CONFIG,
+    VISUALIZATION_AGENT_CONFIG
+)
+import logging
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(name)s - %(message)s'
 )
+logger = logging.getLogger(__name__)
 
-async def main():
-    async with InMemoryRunner(agent=root_agent) as runner:
-        user_id = f"user_123_{random.random()}_{random.random()}"
-        session_id = f"session_456_{random.random()}_{random.random()}"
+DEFAULT_TICKERS = ["NBIS"]
 
-        ticker = "NBIS"
+USER_ID = "user_123"
 
-        initial_state = {
-            "technical_report": None,
-            "fundamental_report": None,
-            "ticker": ticker,
-            "reqdt":datetime.datetime.now().strftime('%m%d%Y'),
-        }
+# agent name -> session state key its output is saved under
+OUTPUT_KEYS = {
+    config["name"]: config["output_key"]
+    for config in (TECHNICAL_AGENT_CONFIG, FUNDAMENTAL_AGENT_CONFIG, SUMMARY_AGENT_CONFIG, VISUALIZATION_AGENT_CONFIG)
+}
 
 
-        # Create a session
-        await runner.session_service.create_session(
-            app_name=runner.app_name,
-            user_id=user_id,
-            session_id=session_id,
-            state=initial_state
-        )
-        
-        print(f"Starting session {session_id} for user {user_id}...")
-        
-        # Call the agent
-        new_message = types.Content(parts=[types.Part(text="BEGIN")])
-        
-        outputs = {
-            "technical_analysis_agent":[],
-            "fundamental_analysis_agent":[],
-            "summary_recommendation_agent":[],
-            "visualization_agent":[]
-        }
-
-        output_image_name=f"{ticker}_output.png"
+async def run_ticker(runner: Runner, ticker: str, user_id: str, resume: bool = False,
+                     extra_state: dict = None) -> dict:
+    """
+    Runs the full research workflow for one ticker on a shared runner and streams its report.
+
+    Args:
+        runner: The runner shared by every session in the batch.
+        ticker: The stock ticker symbol (e.g., 'AAPL').
+        user_id: The user id the session is created under.
+        resume: Keep the completed sections of an interrupted run and only run the missing stages.
+        extra_state: More initial session state, e.g. backtest results or the ticker's sector group.
+            A "route" entry (tools/routing.py) selects the agents and models, and a "delta"
+            entry (tools/delta.py) the sections carried over from the last report.
+
+    Returns:
+        A dict with the ticker, success flag, total wall time, the run's tracer and
+        the path of the written report.
+    """
+    # runs in its own task, so the tracer is private to this ticker
+    tracer = start_trace(ticker)
+    reqdt = datetime.datetime.now().strftime('%m%d%Y')
+    session_id = f"session_{ticker}_{reqdt}"
+
+    initial_state = {
+        "technical_report": None,
+        "fundamental_report": None,
+        # compact digests the summary and visualization agents read (tools/handoff.py)
+        **{handoff_key: None for _, handoff_key, _ in HANDOFFS.values()},
+        "ticker": ticker,
+        "reqdt": reqdt,
+    }
+    extra_state = dict(extra_state or {})
+    route = extra_state.pop("route", None)
+    delta = extra_state.pop("delta", None)
+    archive = extra_state.pop("archive", None)
+    initial_state.update(extra_state)
+
+    writer = ReportWriter(ticker, initial_state["reqdt"])
+    carried = writer.start(resume=resume)
+    if carried:
+        print(f"Resuming {ticker}: {', '.join(carried)} already done")
+        for agent_name, body in carried.items():
+            if agent_name in OUTPUT_KEYS:
+                initial_state[OUTPUT_KEYS[agent_name]] = body.strip()
+            initial_state.update(handoff_state(agent_name, body))
+        initial_state["completed_sections"] = list(carried)
+
+    if route:
+        initial_state["route_skip"] = route["skip"]
+        initial_state["route_models"] = route["models"]
+
+    # sections whose inputs have not changed since the last report
+    reused = [agent_name for agent_name in (delta["carry"] if delta else {}) if agent_name not in carried]
+    for agent_name in reused:
+        section = delta["carry"][agent_name]
+        writer.carry(agent_name, section["body"])
+        initial_state[OUTPUT_KEYS[agent_name]] = section["body"].strip()
+        initial_state.update(handoff_state(agent_name, section["body"]))
+        initial_state.setdefault("completed_sections", []).append(agent_name)
+        if agent_name == "technical_analysis_agent":
+            # link the chart the carried analysis was written from
+            writer.reqdt = section["reqdt"]
+        if agent_name == "visualization_agent":
+            writer.add_image(section["image"])
+
+    # a session left behind by a crashed run of the same ticker and day
+    if await runner.session_service.get_session(app_name=runner.app_name, user_id=user_id, session_id=session_id):
+        await evict_session(runner, user_id, session_id)
+
+    # Create a session
+    await runner.session_service.create_session(
+        app_name=runner.app_name,
+        user_id=user_id,
+        session_id=session_id,
+        state=initial_state
+    )
+
+    print(f"Starting session {session_id} for {ticker}...")
+
+    # Call the agent
+    new_message = types.Content(parts=[types.Part(text="BEGIN")])
+
+    started = time.perf_counter()
+    ok = True
+    # agents the route leaves out answer with a placeholder, kept out of the report and the archive
+    skipped = set(route["skip"]) if route else set()
+
+    try:
         async for event in runner.run_async(
             user_id=user_id,
             session_id=session_id,
             new_message=new_message
         ):
+            # streamed chunks are repeated in the final aggregated event
+            if event.partial or event.author in skipped:
+                continue
             if event.content and event.content.parts:
                 for part in event.content.parts:
                     if part.text:
-                        outputs[event.author].append(part.text)
-                    if part.inline_data:# and part.inline_data.mime_type == 'image/png':
+                        writer.add_text(event.author, part.text)
+                    if part.inline_data and part.inline_data.data:
                         print(f'Got Image in response {part.inline_data.mime_type}')
-                        if part.inline_data.mime_type == 'image/png':
-                            output_image_name=f"{ticker}_output.png"
-                        if part.inline_data.mime_type == 'image/jpeg':
-                            output_image_name=f"{ticker}_output.jpeg"
-                        part.as_image().save(f'outputs/{output_image_name}')
-
-        # Cleanup the session explicitly before exiting the context
+                        writer.add_image(await save_poster(ticker, part.inline_data.data, part.inline_data.mime_type))
+            # a callback's state-only event also counts as final; the section ends with the agent's reply
+            if event.is_final_response() and event.content and event.content.parts:
+                writer.complete_section(event.author)
+    except Exception:
+        ok = False
+        logger.exception(f"Workflow failed for {ticker}")
+    finally:
+        # Evict the session and its artifacts so a long batch does not keep finished sessions around
         print(f"Cleaning up session {session_id}...")
-        await runner.session_service.delete_session(
-            app_name=runner.app_name,
-            user_id=user_id,
-            session_id=session_id
-        )
-        with open(f"outputs/{ticker}_output.md", "w") as f:
-            f.write(f"# Analysis of {ticker} done on {datetime.datetime.now().strftime('%m/%d/%Y')}\n\n")
-            f.write(f"# Stock chart of {ticker} used for Technical Analysis\n\n")
-            f.write(f"![{ticker} chart](./{ticker}_chart_{initial_state['reqdt']}.png)")
-
-            for key in outputs.keys():
-                f.write(f"\n\n# {key}\n\n")
-                for item in outputs[key]: 
-                    f.write(f"{item}\n\n")
-            f.write(f"![{ticker} Recomendation](./{output_image_name})")
-        
-        # for key in outputs.keys():
-        #     print(f"\n\n# {key}\n\n")
-        #     for item in outputs[key]: 
-        #         print(f"{item}\n\n")
-                
+        await evict_session(runner, user_id, session_id)
+
+    if ok:
+        if delta:
+            save_snapshot(ticker, delta["inputs"], writer.sections, reused, writer.reqdt, writer.image_name,
+                          exclude=route["skip"] if route else None)
+        output_path = writer.finalize()
+        if archive is not None:
+            try:
+                await asyncio.to_thread(archive_run, ticker, writer.sections, writer.reqdt, output_path,
+                                        writer.image_name, archive["metrics"], route, reused)
+            except Exception:
+                logger.exception(f"Could not archive the report of {ticker}")
+    else:
+        output_path = writer.partial_path
+        print(f"Kept completed sections of {ticker} in {output_path}; rerun with --resume to finish it")
+    tracer.write(f"outputs/{ticker}_trace.json")
+
+    return {
+        "ticker": ticker,
+        "ok": ok,
+        "carried": reused,
+        "total": time.perf_counter() - started,
+        "tracer": tracer,
+        "output": output_path,
+    }
+
+
+def configured_models(agent) -> dict:
+    """Model name of every LLM agent under `agent`, keyed by agent name."""
+    models = {}
+    if getattr(agent, "model", None):
+        models[agent.name] = getattr(agent.model, "model", agent.model)
+    for sub_agent in agent.sub_agents:
+        models.update(configured_models(sub_agent))
+    return models
+
+
+def print_summary(results: list, elapsed: float) -> None:
+    """Prints batch throughput plus per-stage wall time, model latency, tokens and image bytes."""
+    succeeded = [r for r in results if r["ok"]]
+    rate = len(results) / (elapsed / 60) if elapsed > 0 else float("nan")
+    print(f"\nProcessed {len(results)} tickers ({len(succeeded)} ok, {len(results) - len(succeeded)} failed) "
+          f"in {elapsed:.1f}s -> {rate:.2f} tickers/min")
+
+    totals = [r["total"] for r in results]
+    print(f"per ticker: p50 {percentile(totals, 50):.1f}s, p95 {percentile(totals, 95):.1f}s")
+    print_aggregate([r["tracer"] for r in results])
+
+
+def load_tickers(tickers: list, ticker_file: str = None) -> list:
+    """
+    Builds the watchlist from CLI arguments and/or a file.
+
+    The file may list symbols one per line or comma separated; '#' starts a comment.
+    Symbols are upper-cased and de-duplicated preserving order.
+    """
+    symbols = list(tickers or [])
+    if ticker_file:
+        with open(ticker_file) as f:
+            for line in f:
+                line = line.split("#", 1)[0]
+                symbols.extend(s for s in line.replace(",", " ").split())
+    seen = {}
+    for symbol in symbols:
+        seen.setdefault(symbol.strip().upper(), None)
+    return [s for s in seen if s] or list(DEFAULT_TICKERS)
+
+
+async def run_batch(tickers: list, concurrency: int = 4, resume: bool = False, in_memory: bool = False,
+                    extra_state: dict = None, runner: Runner = None) -> list:
+    """
+    Fans the tickers out over one shared runner, at most `concurrency` sessions at a time.
+
+    Each ticker's report is written as soon as its session finishes. Sessions and
+    artifacts are kept on disk (tools/sessionstore.py) unless `in_memory` is set.
+    `extra_state` maps tickers to additional initial session state. Pass `runner` to
+    reuse an open runner (the resident worker's) instead of opening one for the batch.
+    """
+    if runner is None:
+        async with create_runner(root_agent, in_memory=in_memory) as runner:
+            return await run_batch(tickers, concurrency, resume, in_memory, extra_state, runner)
+
+    results = []
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    user_id = USER_ID
+
+    async def bounded(ticker):
+        async with semaphore:
+            return await run_ticker(runner, ticker, user_id, resume, (extra_state or {}).get(ticker))
+
+    tasks = [asyncio.create_task(bounded(ticker)) for ticker in tickers]
+    for task in asyncio.as_completed(tasks):
+        result = await task
+        results.append(result)
+        status = "done" if result["ok"] else "FAILED"
+        print(f"[{len(results)}/{len(tickers)}] {result['ticker']} {status} in {result['total']:.1f}s -> {result['output']}")
+
+    if isinstance(runner.artifact_service, ContentAddressedArtifactService):
+        removed = await asyncio.to_thread(runner.artifact_service.collect_garbage)
+        print(f"Removed {removed} unreferenced artifact blobs")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the stock research workflow for one or more tickers.")
+    parser.add_argument("tickers", nargs="*", help="Ticker symbols to analyze (default: NBIS).")
+    parser.add_argument("-f", "--file", dest="ticker_file", help="File with ticker symbols (one per line or comma separated).")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum number of concurrent sessions.")
+    parser.add_argument("--gemini-rpm", type=float, help="Gemini requests per minute (0 disables the limit).")
+    parser.add_argument("--perplexity-rpm", type=float, help="Perplexity requests per minute (0 disables the limit).")
+    parser.add_argument("--llm-cache", choices=LLM_CACHE_MODES, help="LLM response cache: on (default), off, or replay (cache only, offline).")
+    parser.add_argument("--resume", action="store_true", help="Finish partially completed reports instead of starting over.")
+    parser.add_argument("--screen", action="store_true", help="Only analyze tickers that pass the screener rules (trend, RSI, P/S, market cap).")
+    parser.add_argument("--backtest", action="store_true", help="Backtest the technical rules on ~10 years of daily bars and give the results to the summary agent.")
+    parser.add_argument("--no-sector-research", action="store_true", help="Research each ticker's sector separately instead of once per industry.")
+    parser.add_argument("--full", action="store_true", help="Run every agent on every ticker instead of routing weak tickers to lighter paths.")
+    parser.add_argument("--fresh", action="store_true", help="Rewrite every section instead of carrying over the ones whose inputs have not changed.")
+    parser.add_argument("--no-hedging", action="store_true", help="Send each model request once: no duplicate requests for slow responses, deadlines or 429 retries.")
+    parser.add_argument("--no-archive", action="store_true", help="Do not record the runs in the report archive (data/archive.sqlite, see tools/archive.py).")
+    parser.add_argument("--in-memory", action="store_true", help="Keep sessions and artifacts in memory instead of data/sessions.")
+    parser.add_argument("--poster-derivatives", nargs="*", choices=DERIVATIVES, help="Also write a WebP thumbnail and/or WebP copy of every poster, in the background.")
+    parser.add_argument("--no-prerender", action="store_true", help="Skip drawing all charts before the LLM stage.")
+    parser.add_argument("--serve", action="store_true", help="Stay resident and run the batches queued with `python -m tools.jobqueue` (see --queue-dir).")
+    parser.add_argument("--queue-dir", help="Job queue directory for --serve (default: JOB_QUEUE_DIR or data/queue).")
+    parser.add_argument("--drain", action="store_true", help="With --serve, exit once the queue is empty instead of waiting for more jobs.")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between queue checks while --serve is idle.")
+    return parser.parse_args(argv)
+
+
+async def run_job(args, tickers: list, runner: Runner = None) -> list:
+    """
+    Screens, plans and runs one batch with the per-batch options in `args`.
+
+    Returns the run_ticker results ([] when the screen leaves no tickers).
+    """
+    started = time.perf_counter()
+    table = None
+    if args.screen:
+        table = screen(tickers)
+        print_screen(table)
+        tickers = list(table.index[table["passed"]])
+        if not tickers:
+            return []
+
+    extra_state = {ticker: {} for ticker in tickers}
+    if args.backtest:
+        stats, summary = backtest_universe(tickers)
+        print_backtest(summary)
+        if not stats.empty:
+            tested = set(stats.index.get_level_values("ticker"))
+            for ticker in tested.intersection(tickers):
+                extra_state[ticker]["backtest_stats"] = format_backtest(ticker, stats, summary)
+    routes = {}
+    if table is None and not (args.full and args.fresh and args.no_archive):
+        table = screen(tickers)
+    if not args.no_archive:
+        for ticker, metrics in archive_metrics(table.loc[tickers]).items():
+            extra_state[ticker]["archive"] = {"metrics": metrics}
+    if not args.full:
+        routes = plan_routes(tickers, table)
+        print_routes(routes)
+        for ticker, route in routes.items():
+            extra_state[ticker]["route"] = route
+    if not args.fresh:
+        plans = plan_delta(tickers, table)
+        print_delta(plans)
+        for ticker, plan in plans.items():
+            extra_state[ticker]["delta"] = plan
+    if not args.no_sector_research:
+        plan = plan_sector_research(tickers, refresh=not args.screen)
+        print_plan(plan, len(tickers))
+        for ticker, state in plan.items():
+            extra_state[ticker].update(state)
+
+    if not args.no_prerender:
+        failed = await prerender_charts(tickers)
+        for ticker, error in failed.items():
+            logger.warning(f"Could not pre-render chart for {ticker}: {error}")
+        print(f"Pre-rendered charts for {len(tickers) - len(failed)}/{len(tickers)} tickers in {time.perf_counter() - started:.1f}s")
+    results = await run_batch(tickers, args.concurrency, args.resume, args.in_memory, extra_state, runner)
+    await drain_derivatives()
+    print_summary(results, time.perf_counter() - started)
+    print_hedge_stats()
+    if not (args.full and args.fresh):
+        print_route_savings(routes, [r["tracer"] for r in results], configured_models(root_agent),
+                            {r["ticker"]: r["carried"] for r in results})
+    return results
+
+
+def warm_model_clients() -> None:
+    """Imports litellm up front, so the first Perplexity call of the first job does not pay for it."""
+    importlib.import_module("litellm")
+
+
+async def serve(args) -> None:
+    """
+    Resident worker: runs the batches queued in the job queue (tools/jobqueue.py) one
+    after another on one runner, with the imports, model clients and chart workers
+    already warm, so a job's latency is only its own work.
+
+    A job's arguments choose the tickers and per-batch options (--screen, --full,
+    --fresh, ...); concurrency, rate limits and caches are the worker's.
+    """
+    queue = JobQueue(args.queue_dir)
+    recovered = queue.recover()
+    if recovered:
+        print(f"Requeued {recovered} jobs left running by an earlier worker")
+    warm_model_clients()
+    await warm_render_pool()
+
+    async with create_runner(root_agent, in_memory=args.in_memory) as runner:
+        print(f"Worker ready, waiting for jobs in {queue.root}")
+        while True:
+            job = queue.claim()
+            if job is None:
+                if args.drain:
+                    return
+                await asyncio.sleep(args.poll_interval)
+                continue
+
+            started = time.time()
+            print(f"Job {job['id']}: {' '.join(job['argv'])} (queued {started - job['submitted']:.1f}s)")
+            try:
+                job_args = parse_args(job["argv"])
+                job_args.concurrency = args.concurrency
+                results = await run_job(job_args, load_tickers(job_args.tickers, job_args.ticker_file), runner)
+            except (Exception, SystemExit):
+                logger.exception(f"Job {job['id']} failed")
+                queue.finish(job, [], failed=True)
+                continue
+            path = queue.finish(job, [
+                {"ticker": r["ticker"], "ok": r["ok"], "total": r["total"], "output": r["output"]} for r in results
+            ])
+            print(f"Job {job['id']} finished in {time.time() - started:.1f}s -> {path}")
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    configure_rate_limits(gemini=args.gemini_rpm, perplexity=args.perplexity_rpm)
+    configure_llm_cache(mode=args.llm_cache)
+    configure_image_sink(derivatives=args.poster_derivatives)
+    if args.no_hedging:
+        configure_hedging(enabled=False)
+    try:
+        if args.serve:
+            return await serve(args)
+        return await run_job(args, load_tickers(args.tickers, args.ticker_file))
+    finally:
+        shutdown_render_pool()
+
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -4,45 +4,83 @@ from google.genai import types
 
 from google.adk.agents import SequentialAgent
 # from google.adk.tools import google_search
-from tools.customtool import get_stock_data, get_stock_metrics, get_stock_chart,ta_bmc,ta_bac,va_bmc
+from tools.customtool import get_stock_data, get_stock_metrics, get_stock_chart,ta_bac,va_bmc,skip_completed_bac
+from tools.ratelimit import rate_limit_bmc
+from tools.llmcache import llm_cache_bmc, llm_cache_amc
+from tools.tracing import trace_bac, trace_aac, trace_bmc, trace_amc
+from tools.sectorresearch import configure_sector_research, sector_report_bac
+from tools.routing import route_bac, route_bmc
+from tools.hedging import hedged
+from tools.handoff import handoff_aac, handoff_bmc
 import os
 from google.adk.models.lite_llm import LiteLlm  # For multi-model support
 from .prompts import (
     TECHNICAL_AGENT_CONFIG,
     FUNDAMENTAL_AGENT_CONFIG,
+    SECTOR_AGENT_CONFIG,
     SUMMARY_AGENT_CONFIG,
     VISUALIZATION_AGENT_CONFIG
 )
 
 technical_agent = Agent(
-    model='gemini-3-flash-preview',
+    model=hedged('gemini-3-flash-preview', TECHNICAL_AGENT_CONFIG["name"]),
     tools=[get_stock_chart],
-    before_model_callback=ta_bmc,
-    before_agent_callback=ta_bac,
+    before_model_callback=[route_bmc, llm_cache_bmc, rate_limit_bmc, trace_bmc],
+    after_model_callback=[trace_amc, llm_cache_amc],
+    before_agent_callback=[skip_completed_bac, route_bac, trace_bac, ta_bac],
+    after_agent_callback=[handoff_aac, trace_aac],
     **TECHNICAL_AGENT_CONFIG
 )
 
 # Fundamental Analysis Agent
 fundamental_agent = Agent(
-    model=LiteLlm(model="perplexity/sonar-pro",stream=True,
+    model=hedged(LiteLlm(model="perplexity/sonar-pro",stream=True,
     web_search_options={
         "search_type": "pro"
-    }),
-    # tools=[get_stock_metrics],
+    }), FUNDAMENTAL_AGENT_CONFIG["name"]),
+    before_model_callback=[route_bmc, llm_cache_bmc, rate_limit_bmc, trace_bmc],
+    after_model_callback=[trace_amc, llm_cache_amc],
+    before_agent_callback=[skip_completed_bac, route_bac, trace_bac, sector_report_bac],
+    after_agent_callback=[handoff_aac, trace_aac],
     **FUNDAMENTAL_AGENT_CONFIG
 )
 
+# Sector Research Agent: one shared report per industry and day (tools/sectorresearch.py),
+# run outside the per-ticker workflow
+sector_agent = Agent(
+    model=hedged(LiteLlm(model="perplexity/sonar-pro",stream=True,
+    web_search_options={
+        "search_type": "pro"
+    }), SECTOR_AGENT_CONFIG["name"]),
+    before_model_callback=[llm_cache_bmc, rate_limit_bmc, trace_bmc],
+    after_model_callback=[trace_amc, llm_cache_amc],
+    before_agent_callback=trace_bac,
+    after_agent_callback=trace_aac,
+    **SECTOR_AGENT_CONFIG
+)
+configure_sector_research(agent=sector_agent)
+
 # Summary and Recommendation Agent
 summary_agent = Agent(
-    model='gemini-3-flash-preview', #'gemini-3-flash-preview'
+    model=hedged('gemini-3-flash-preview', SUMMARY_AGENT_CONFIG["name"]), #'gemini-3-flash-preview'
+    before_model_callback=[route_bmc, handoff_bmc, llm_cache_bmc, rate_limit_bmc, trace_bmc],
+    after_model_callback=[trace_amc, llm_cache_amc],
+    before_agent_callback=[skip_completed_bac, route_bac, trace_bac],
+    after_agent_callback=[handoff_aac, trace_aac],
+    # reads the analysts' digests from its instruction, not their full answers from the history (handoff_bmc)
+    include_contents='none',
     **SUMMARY_AGENT_CONFIG
 )
 
 # Visualization Agent 
 visualization_agent = Agent(
-    model='gemini-3-pro-image-preview', #'gemini-2.5-flash-image', #'gemini-3-pro-image-preview'
+    model=hedged('gemini-3-pro-image-preview', VISUALIZATION_AGENT_CONFIG["name"]), #'gemini-2.5-flash-image', #'gemini-3-pro-image-preview'
     # generate_content_config= types.GenerateContentConfig(temperature=0.2),
-    before_model_callback=va_bmc,
+    before_model_callback=[route_bmc, va_bmc, handoff_bmc, llm_cache_bmc, rate_limit_bmc, trace_bmc],
+    after_model_callback=[trace_amc, llm_cache_amc],
+    before_agent_callback=[skip_completed_bac, route_bac, trace_bac],
+    after_agent_callback=trace_aac,
+    include_contents='none',
     **VISUALIZATION_AGENT_CONFIG
 )
 
@@ -51,6 +89,8 @@ visualization_agent = Agent(
 analysis_parallel_agent = ParallelAgent(
     sub_agents=[technical_agent,fundamental_agent],
     name='analysis_parallel_agent',
+    before_agent_callback=trace_bac,
+    after_agent_callback=trace_aac,
     description='Runs technical and fundamental analysis in parallel.'
 )
 
@@ -58,6 +98,8 @@ analysis_parallel_agent = ParallelAgent(
 stock_research_workflow = SequentialAgent(
     sub_agents=[analysis_parallel_agent, summary_agent,visualization_agent],
     name='stock_research_workflow',
+    before_agent_callback=trace_bac,
+    after_agent_callback=trace_aac,
     description='Sequential workflow for stock research: Analysis, Summary, and Visualization.'
 )
 
@@ -3,6 +3,11 @@ TECHNICAL_AGENT_CONFIG = {
     "description": "You are a technical financial analyst expert.",
     "instruction": """
         You are a technical financial analyst expert. Look at the provided stock chart of {ticker} and then provide the technical analysis. DO not make up, provided analysis based on attached chart only.
+
+        End your answer with a digest of it for the strategist who writes the recommendation: one JSON object inside <digest> tags, in this shape, with short one-line strings, at most 4 signals, 3 risks and 3 levels each:
+        <digest>
+        {"trend": "uptrend | downtrend | sideways", "momentum": "RSI and MACD reading", "key_levels": {"support": [0.0], "resistance": [0.0]}, "signals": ["..."], "risks": ["..."]}
+        </digest>
     """,
     "output_key": "technical_report"
 }
@@ -18,6 +23,12 @@ Here is the stock to analyze:
 {ticker}
 </stock_symbol>
 
+<sector_report>
+{sector_report?}
+</sector_report>
+
+If <sector_report> is not empty, an overview of this company's sector and industry has already been written and will be read alongside your analysis. Do not repeat it: in the Sector Analysis section only cover the company's competitive position within the sector and anything specific to it that the overview misses, and put your search effort into the company-specific items.
+
 The user already has quantitative metrics (P/E ratio, P/S ratio, Debt/Equity, revenue, net income, margins, ROE, etc.) from other sources. Your task is to provide:
 
 1. **Key Valuation Metrics Context**: Brief qualitative assessment of whether current valuation ratios (P/E, P/S, Debt/Equity) are high, low, or fair relative to historical averages and industry peers
@@ -38,28 +49,79 @@ Your output should be:
 - Limit the entire analysis to what can be read in 2-3 minutes
 
 Format your final response inside <analysis> tags with clear section headers and bullet points.
+
+After the </analysis> tag, add a digest of your analysis for the strategist who writes the recommendation: one JSON object inside <digest> tags, in this shape, with short one-line strings and at most 3 catalysts and 3 risks:
+<digest>
+{"valuation": "undervalued | fair | overvalued", "valuation_note": "...", "growth": "accelerating | stable | decelerating", "analyst_consensus": "ratings and 12-month target", "catalysts": ["..."], "risks": ["..."]}
+</digest>
     """,
     "output_key": "fundamental_report"
 }
 
+SECTOR_AGENT_CONFIG = {
+    "name": "sector_research_agent",
+    "description": "Writes one shared sector and industry overview for all covered companies in it.",
+    "instruction": """
+You are writing a sector briefing that will be given to analysts covering several companies in the same industry, so it must not focus on any single company.
+
+<sector>
+{sector}
+</sector>
+
+<industry>
+{industry}
+</industry>
+
+Cover, concisely:
+
+1. **Current Conditions**: Demand, pricing, margins and the stage of the cycle for this industry right now
+2. **Key Trends and Drivers**: Technology, regulation, macro and customer trends shaping the next 12 months
+3. **Competitive Landscape**: Who leads, how concentrated the industry is, and what separates winners from laggards
+4. **Valuation Context**: Whether the group trades rich or cheap versus its own history and the broader market, and typical P/E and P/S ranges
+5. **Risks and Catalysts**: Industry-wide risks and upcoming events (earnings season themes, policy decisions, product cycles) to watch
+
+Your output should:
+- Use clear section headers and very short bullet points
+- Focus on qualitative insight and context rather than raw numbers
+- Be readable in 2 minutes
+    """,
+    "output_key": "sector_report"
+}
+
 SUMMARY_AGENT_CONFIG = {
     "name": "summary_recommendation_agent",
     "description": "Synthesizes technical and fundamental analysis into a final recommendation.",
     "instruction": """
     You are a Senior Investment Strategist.
-    Your goal is to synthesize the reports from the Technical Analysis Agent and the Fundamental Analysis Agent.
-    1. Review both reports carefully .
+    Your goal is to synthesize the findings of the Technical Analysis Agent and the Fundamental Analysis Agent.
+    1. Review both digests carefully. Each is the analyst's own JSON digest of their report, or the report itself if they gave none.
+
+    <technical_digest>
+    {technical_handoff}
+    </technical_digest>
+
+    <fundamental_digest>
+    {fundamental_handoff}
+    </fundamental_digest>
+
+    Overview of the company's sector and industry, shared by every company in it (may be empty, in which case the fundamental digest covers the sector):
+
+    <sector_report>
+    {sector_report?}
+    </sector_report>
 
-    <technical_report>
-    {technical_report}
-    </technical_report>
+    If the block below is not empty, it holds a historical backtest of the technical setups (moving-average trend, RSI) on this stock. Use it to judge how much weight the technical signals deserve; it is not a forecast.
 
-    <fundamental_report>
-    {fundamental_report}
-    </fundamental_report>
+    <backtest_stats>
+    {backtest_stats?}
+    </backtest_stats>
 
     2. Provide a final investment recommendation (Buy, Sell, or Hold).
     3. Include short-term and long-term predictions with clear reasoning.
+    4. End your answer with a digest of it for the designer of the summary poster: one JSON object inside <digest> tags, in this shape, with short one-line strings and at most 4 key points:
+    <digest>
+    {"recommendation": "Buy | Hold | Sell", "short_term": {"rating": "Buy | Hold | Sell", "reason": "..."}, "long_term": {"rating": "Buy | Hold | Sell", "reason": "..."}, "key_points": ["..."]}
+    </digest>
     """,
     "output_key": "summary_report"
 }
@@ -82,8 +144,8 @@ SUMMARY_AGENT_CONFIG = {
 
 VISUALIZATION_AGENT_CONFIG = {
     "name": "visualization_agent",
-    "description": "Expert in creating consistent, high-quality visual stock analysis reports using a modern dashboard layout, specific typography, and a professional color palette based on the information provided in <summary_report>.",
-    "static_instruction":""" Generates visual poster for the stock analysis from the information provided in <summary_report>. 
+    "description": "Expert in creating consistent, high-quality visual stock analysis reports using a modern dashboard layout, specific typography, and a professional color palette based on the information provided in <summary_digest>, <technical_digest> and <fundamental_digest>.",
+    "static_instruction":""" Generates visual poster for the stock analysis from the information provided in <summary_digest>, <technical_digest> and <fundamental_digest>. 
     
     Design Specifications:
     1. **Layout (3-Section Dashboard)**:
@@ -103,10 +165,20 @@ VISUALIZATION_AGENT_CONFIG = {
     """,
     "instruction": """
     Ticker symbol {ticker}.
-    Summary report :
-    <summary_report>
-    {summary_report}
-    </summary_report>
+    Recommendation :
+    <summary_digest>
+    {summary_handoff}
+    </summary_digest>
+
+    Technical analysis :
+    <technical_digest>
+    {technical_handoff}
+    </technical_digest>
+
+    Fundamental analysis :
+    <fundamental_digest>
+    {fundamental_handoff}
+    </fundamental_digest>
 
     """,
     "output_key": "visualization_report"
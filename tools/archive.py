@@ -0,0 +1,439 @@
+"""
+Report archive: every finished run, indexed for history and full-text queries.
+
+The files in outputs/ are overwritten by each run of a ticker, so after a run
+`archive_run` records it in SQLite: the recommendation and short/long-term ratings
+(from the summary's digest, see tools/handoff.py), the market data the run saw,
+each section's text and digest, and the SHA-256 of the chart, poster and report
+files. Runs are indexed by ticker, recommendation and time, and section texts by an
+FTS5 full-text index. A section carried over unchanged from an earlier run
+(tools/delta.py) is stored once and referenced by both runs. Queries:
+
+    python -m tools.archive history NBIS --since 6m
+    python -m tools.archive runs --recommendation buy --since 7d
+    python -m tools.archive changes --since 30d
+    python -m tools.archive search "NEAR(hyperscaler capex)" --agent fundamental_analysis_agent
+    python -m tools.archive show 1234
+"""
+import argparse
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from typing import Iterator, Optional
+
+# Columns of a screen() table kept with each run, mapped to column names.
+METRIC_COLUMNS = {
+    "close": "close",
+    "SMA_50": "sma_50",
+    "SMA_200": "sma_200",
+    "RSI": "rsi",
+    "volatility": "volatility",
+    "ps_ratio": "ps_ratio",
+    "market_cap": "market_cap",
+}
+
+RECOMMENDATIONS = ("Buy", "Hold", "Sell")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    run_at REAL NOT NULL,
+    reqdt TEXT,
+    recommendation TEXT,
+    short_term TEXT,
+    long_term TEXT,
+    route TEXT,
+    {", ".join(f"{column} REAL" for column in METRIC_COLUMNS.values())}
+);
+CREATE INDEX IF NOT EXISTS runs_ticker ON runs (ticker, run_at);
+CREATE INDEX IF NOT EXISTS runs_recommendation ON runs (recommendation, run_at);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (run_at);
+CREATE TABLE IF NOT EXISTS texts (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    body TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS text_index USING fts5(
+    body, content='texts', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS sections (
+    run_id INTEGER NOT NULL,
+    agent TEXT NOT NULL,
+    text_id INTEGER NOT NULL,
+    digest TEXT,
+    carried INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, agent)
+);
+CREATE INDEX IF NOT EXISTS sections_text ON sections (text_id);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sha256 TEXT,
+    bytes INTEGER,
+    PRIMARY KEY (run_id, kind)
+);
+CREATE INDEX IF NOT EXISTS artifacts_sha ON artifacts (sha256);
+"""
+
+_RUN_COLUMNS = ("ticker", "run_at", "reqdt", "recommendation", "short_term", "long_term", "route",
+                *METRIC_COLUMNS.values())
+
+# "Recommendation: Hold", "## Investment Recommendation: **Buy**", ...
+_RECOMMENDATION_RE = re.compile(r"recommendation\W{0,12}(buy|hold|sell)\b", re.I)
+
+_settings = {
+    "path": os.environ.get("ARCHIVE_DB", "data/archive.sqlite"),
+    "output_dir": "outputs",
+}
+
+
+def configure_archive(path: Optional[str] = None) -> None:
+    global _archive
+    if path is not None and path != _settings["path"]:
+        _settings["path"] = path
+        _archive = None
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: str) -> tuple[Optional[str], Optional[int]]:
+    """SHA-256 and size of a file, or (None, None) if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None, None
+    return _sha256(data), len(data)
+
+
+def parse_since(text: Optional[str]) -> Optional[float]:
+    """A time bound as epoch seconds from "7d", "2w", "6m", "1y" (ago) or an ISO date."""
+    if not text:
+        return None
+    match = re.fullmatch(r"(\d+)([dwmy])", text.strip().lower())
+    if match:
+        days = int(match.group(1)) * {"d": 1, "w": 7, "m": 30, "y": 365}[match.group(2)]
+        return time.time() - days * 24 * 3600
+    return datetime.datetime.fromisoformat(text).timestamp()
+
+
+def recommendation_of(summary: Optional[str]) -> dict:
+    """Recommendation and short/long-term ratings of a summary section (None where not found)."""
+    from tools.handoff import SummaryDigest, parse_digest  # pulls in ADK; not needed by the query CLI
+
+    digest = parse_digest(summary or "", SummaryDigest)
+    if digest is not None:
+        return {"recommendation": digest.recommendation, "short_term": digest.short_term.rating,
+                "long_term": digest.long_term.rating}
+    match = _RECOMMENDATION_RE.search(summary or "")
+    return {"recommendation": match.group(1).capitalize() if match else None, "short_term": None, "long_term": None}
+
+
+def archive_metrics(table) -> dict[str, dict]:
+    """The METRIC_COLUMNS of a screen() table per ticker, NaN as None."""
+    metrics = {}
+    for ticker, row in table.iterrows():
+        values = {}
+        for column, name in METRIC_COLUMNS.items():
+            value = row.get(column)
+            values[name] = None if value is None or value != value else float(value)
+        metrics[ticker] = values
+    return metrics
+
+
+class ReportArchive:
+    """SQLite archive of finished runs."""
+
+    def __init__(self, path: str = "data/archive.sqlite"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection for one transaction: committed (or rolled back) and closed on exit."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, run: dict, sections: list[dict], artifacts: list[dict]) -> int:
+        """
+        Stores one run in a single transaction; returns its id.
+
+        Args:
+            run: Values for the runs table (ticker, run_at, recommendation, metrics, ...).
+            sections: Dicts with agent, body, digest (JSON or None) and carried.
+            artifacts: Dicts with kind, name, sha256 and bytes.
+        """
+        with self._connect() as conn:
+            values = [run.get(column) for column in _RUN_COLUMNS]
+            run_id = conn.execute(f"INSERT INTO runs ({', '.join(_RUN_COLUMNS)}) "
+                                  f"VALUES ({', '.join('?' * len(values))})", values).lastrowid
+            for section in sections:
+                sha = _sha256(section["body"].encode())
+                row = conn.execute("SELECT id FROM texts WHERE sha256 = ?", (sha,)).fetchone()
+                if row is None:
+                    text_id = conn.execute("INSERT INTO texts (sha256, body) VALUES (?, ?)",
+                                           (sha, section["body"])).lastrowid
+                    conn.execute("INSERT INTO text_index (rowid, body) VALUES (?, ?)", (text_id, section["body"]))
+                else:
+                    text_id = row["id"]
+                conn.execute("INSERT INTO sections VALUES (?, ?, ?, ?, ?)",
+                             (run_id, section["agent"], text_id, section.get("digest"), int(section.get("carried", False))))
+            conn.executemany("INSERT INTO artifacts VALUES (?, ?, ?, ?, ?)",
+                             [(run_id, a["kind"], a["name"], a.get("sha256"), a.get("bytes")) for a in artifacts])
+        return run_id
+
+    def _query(self, sql: str, params: list) -> list[dict]:
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    @staticmethod
+    def _bounds(since: Optional[float], until: Optional[float], column: str = "run_at") -> tuple[str, list]:
+        clauses, params = [], []
+        if since is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append(f"{column} < ?")
+            params.append(until)
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def history(self, ticker: str, since: Optional[float] = None, until: Optional[float] = None) -> list[dict]:
+        """A ticker's runs, oldest first."""
+        where, params = self._bounds(since, until)
+        return self._query(f"SELECT * FROM runs WHERE ticker = ?{where} ORDER BY run_at",
+                           [ticker.upper(), *params])
+
+    def runs(self, recommendation: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None, latest: bool = False, limit: int = 1000) -> list[dict]:
+        """
+        Runs in a time window, newest first, optionally only those with `recommendation`.
+
+        With `latest`, only each ticker's newest run in the window counts, so a ticker
+        rated Buy on Monday and Sell on Friday is not listed as a Buy.
+        """
+        where, params = self._bounds(since, until)
+        sql = f"SELECT * FROM runs WHERE 1 = 1{where}"
+        if latest:
+            # SQLite takes the bare id from the row with the MAX
+            sql = f"SELECT * FROM runs WHERE id IN (SELECT id FROM (SELECT id, MAX(run_at) FROM runs WHERE 1 = 1{where} GROUP BY ticker))"
+        if recommendation:
+            sql += " AND recommendation = ?"
+            params.append(recommendation.capitalize())
+        return self._query(f"{sql} ORDER BY run_at DESC LIMIT ?", [*params, limit])
+
+    def changes(self, ticker: Optional[str] = None, since: Optional[float] = None,
+                until: Optional[float] = None) -> list[dict]:
+        """Runs whose recommendation differs from the ticker's previous run, oldest first."""
+        where, params = self._bounds(since, until)
+        if ticker:
+            where += " AND ticker = ?"
+            params.append(ticker.upper())
+        # the previous run may predate the window; each lookup is one step on runs_ticker
+        return self._query(
+            "SELECT * FROM (SELECT runs.*, (SELECT recommendation FROM runs AS earlier "
+            "WHERE earlier.ticker = runs.ticker AND earlier.run_at < runs.run_at AND earlier.recommendation IS NOT NULL "
+            "ORDER BY earlier.run_at DESC LIMIT 1) AS previous "
+            f"FROM runs WHERE recommendation IS NOT NULL{where}) "
+            "WHERE previous != recommendation ORDER BY run_at", params)
+
+    def search(self, query: str, ticker: Optional[str] = None, agent: Optional[str] = None,
+               since: Optional[float] = None, until: Optional[float] = None, limit: int = 20) -> list[dict]:
+        """
+        Full-text search over section texts (FTS5 query syntax).
+
+        Returns run rows with the matching agent and a snippet around the match, most
+        recently written texts first (a carried section counts from the run that wrote it).
+        """
+        where, params = self._bounds(since, until, "runs.run_at")
+        if agent:
+            where += " AND sections.agent = ?"
+            params.append(agent)
+        columns = ("runs.id, runs.ticker, runs.run_at, runs.recommendation, sections.agent, "
+                   "snippet(text_index, 0, '[', ']', '...', 12) AS snippet")
+        if ticker:
+            # a ticker has few runs: walk them newest first and match each text (CROSS JOIN keeps that order)
+            return self._query(
+                f"SELECT {columns} FROM runs CROSS JOIN sections ON sections.run_id = runs.id "
+                "CROSS JOIN text_index ON text_index.rowid = sections.text_id "
+                f"WHERE runs.ticker = ? AND text_index MATCH ?{where} ORDER BY runs.run_at DESC LIMIT ?",
+                [ticker.upper(), query, *params, limit])
+        # FTS5 yields matches by descending rowid, so the scan stops after `limit` hits
+        return self._query(
+            f"SELECT {columns} FROM text_index JOIN sections ON sections.text_id = text_index.rowid "
+            "JOIN runs ON runs.id = sections.run_id "
+            f"WHERE text_index MATCH ?{where} ORDER BY text_index.rowid DESC LIMIT ?",
+            [query, *params, limit])
+
+    def run(self, run_id: int) -> Optional[dict]:
+        """One run with its sections and artifacts, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if row is None:
+                return None
+            run = dict(row)
+            run["sections"] = [dict(r) for r in conn.execute(
+                "SELECT agent, body, digest, carried FROM sections JOIN texts ON texts.id = sections.text_id "
+                "WHERE run_id = ? ORDER BY sections.rowid", (run_id,))]
+            run["artifacts"] = [dict(r) for r in conn.execute(
+                "SELECT kind, name, sha256, bytes FROM artifacts WHERE run_id = ?", (run_id,))]
+        return run
+
+
+_archive: Optional[ReportArchive] = None
+
+
+def get_report_archive() -> ReportArchive:
+    """Returns the shared archive (database from the ARCHIVE_DB env var, default data/archive.sqlite)."""
+    global _archive
+    if _archive is None:
+        _archive = ReportArchive(_settings["path"])
+    return _archive
+
+
+def set_report_archive(archive: Optional[ReportArchive]) -> None:
+    global _archive
+    _archive = archive
+
+
+def archive_run(ticker: str, sections: dict[str, str], reqdt: str, report_path: str,
+                image_name: Optional[str] = None, metrics: Optional[dict] = None,
+                route: Optional[dict] = None, carried: Optional[list[str]] = None) -> int:
+    """
+    Records a finished run in the shared archive; returns its id.
+
+    Args:
+        ticker: The stock ticker symbol.
+        sections: The report's section bodies, keyed by agent name.
+        reqdt: The run's date stamp, which names its chart file.
+        report_path: The final markdown report.
+        image_name: The poster written or carried by this run, if any.
+        metrics: The run's market data (see archive_metrics).
+        route: The ticker's route (tools/routing.py), if it was routed.
+        carried: Sections carried over from an earlier run.
+    """
+    from tools.handoff import HANDOFFS, parse_digest, strip_digest
+
+    summary = sections.get("summary_recommendation_agent")
+    run = {"ticker": ticker.upper(), "run_at": time.time(), "reqdt": reqdt,
+           "route": route["tier"] if route else None, **recommendation_of(summary), **(metrics or {})}
+
+    rows = []
+    for agent, body in sections.items():
+        if not body.strip():
+            continue
+        digest = parse_digest(body, HANDOFFS[agent][2]) if agent in HANDOFFS else None
+        rows.append({"agent": agent, "body": strip_digest(body) if "<digest>" in body else body,
+                     "digest": digest.model_dump_json() if digest is not None else None,
+                     "carried": agent in (carried or [])})
+
+    files = {"report": report_path,
+             "chart": os.path.join(_settings["output_dir"], f"{ticker}_chart_{reqdt}.png")}
+    if image_name:
+        files["poster"] = os.path.join(_settings["output_dir"], image_name)
+    artifacts = []
+    for kind, path in files.items():
+        sha, size = file_digest(path)
+        artifacts.append({"kind": kind, "name": os.path.basename(path), "sha256": sha, "bytes": size})
+    return get_report_archive().record(run, rows, artifacts)
+
+
+def _when(run_at: float) -> str:
+    return datetime.datetime.fromtimestamp(run_at).strftime("%Y-%m-%d %H:%M")
+
+
+def _print_runs(rows: list[dict]) -> None:
+    print(f"{'id':>8}  {'ticker':<8}{'run':<18}{'rating':<8}{'short':<7}{'long':<7}{'close':>10}{'RSI':>6}  route")
+    for r in rows:
+        close = f"{r['close']:.2f}" if r.get("close") is not None else "-"
+        rsi = f"{r['rsi']:.0f}" if r.get("rsi") is not None else "-"
+        print(f"{r['id']:>8}  {r['ticker']:<8}{_when(r['run_at']):<18}{r['recommendation'] or '-':<8}"
+              f"{r['short_term'] or '-':<7}{r['long_term'] or '-':<7}{close:>10}{rsi:>6}  {r['route'] or '-'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the report archive.")
+    parser.add_argument("--db", default=_settings["path"], help="Archive database (default: ARCHIVE_DB or data/archive.sqlite).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    window = argparse.ArgumentParser(add_help=False)
+    window.add_argument("--since", help="Start of the window: 7d, 2w, 6m, 1y ago or an ISO date.")
+    window.add_argument("--until", help="End of the window (exclusive), same formats.")
+
+    history = commands.add_parser("history", parents=[window], help="A ticker's runs over time.")
+    history.add_argument("ticker")
+    runs = commands.add_parser("runs", parents=[window], help="Runs in a window, optionally by recommendation.")
+    runs.add_argument("--recommendation", type=str.capitalize, choices=RECOMMENDATIONS)
+    runs.add_argument("--latest", action="store_true", help="Only each ticker's newest run in the window.")
+    runs.add_argument("--limit", type=int, default=1000)
+    changes = commands.add_parser("changes", parents=[window], help="Runs whose recommendation changed.")
+    changes.add_argument("ticker", nargs="?")
+    search = commands.add_parser("search", parents=[window], help="Full-text search over the sections.")
+    search.add_argument("query", help="FTS5 query, e.g. 'NEAR(hyperscaler capex)' or '\"death cross\"'.")
+    search.add_argument("--ticker")
+    search.add_argument("--agent")
+    search.add_argument("--limit", type=int, default=20)
+    show = commands.add_parser("show", help="One run's sections and artifacts.")
+    show.add_argument("run_id", type=int)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        sys.exit(f"No archive at {args.db}")
+    archive = ReportArchive(args.db)
+    since, until = parse_since(getattr(args, "since", None)), parse_since(getattr(args, "until", None))
+    started = time.perf_counter()
+    if args.command == "history":
+        rows = archive.history(args.ticker, since, until)
+    elif args.command == "runs":
+        rows = archive.runs(args.recommendation, since, until, args.latest, args.limit)
+    elif args.command == "changes":
+        rows = archive.changes(args.ticker, since, until)
+    elif args.command == "search":
+        rows = archive.search(args.query, args.ticker, args.agent, since, until, args.limit)
+    else:
+        run = archive.run(args.run_id)
+        if run is None:
+            sys.exit(f"No run {args.run_id}")
+        elapsed = time.perf_counter() - started
+        for section in run.pop("sections"):
+            print(f"\n# {section['agent']}{' (carried)' if section['carried'] else ''}\n\n{section['body'].strip()}")
+            if section["digest"]:
+                print(f"\ndigest: {section['digest']}")
+        print()
+        for artifact in run.pop("artifacts"):
+            print(f"{artifact['kind']:<8}{artifact['name']:<40}{artifact['sha256'] or 'missing'}")
+        print(json.dumps(run, indent=2))
+        print(f"({elapsed * 1000:.1f} ms)")
+        return
+    elapsed = time.perf_counter() - started
+
+    if args.command == "search":
+        for r in rows:
+            print(f"{r['id']:>8}  {r['ticker']:<8}{_when(r['run_at']):<18}{r['recommendation'] or '-':<6}"
+                  f"{r['agent']:<30}{r['snippet']}")
+    elif args.command == "changes":
+        for r in rows:
+            print(f"{r['id']:>8}  {r['ticker']:<8}{_when(r['run_at']):<18}{r['previous']} -> {r['recommendation']}")
+    else:
+        _print_runs(rows)
+    print(f"({len(rows)} rows in {elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
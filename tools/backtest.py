@@ -0,0 +1,268 @@
+"""
+Vectorized backtest of the technical setups the agents comment on.
+
+Each rule turns the indicator panel (tools/indicators.py) into entry/exit signals for
+every ticker and bar at once; positions, returns, costs and trade statistics are then
+computed with whole-panel NumPy operations, so a few thousand tickers over ten years
+of daily bars take seconds. Signals are acted on at the close they are computed on
+and earn the next bar's return, so there is no look-ahead.
+"""
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from tools.indicators import on_own_bars, rolling_std, rsi, sma
+from tools.screener import load_closes
+
+# Calendar days of daily bars loaded for a backtest.
+BACKTEST_DAYS = 3653
+
+BARS_PER_YEAR = 252
+
+
+def _trend(ind):
+    up = ind["SMA_50"] > ind["SMA_200"]
+    return up, ~up
+
+
+def _rsi_reversion(ind):
+    return ind["RSI"] < 30, ind["RSI"] > 50
+
+
+def _trend_pullback(ind):
+    up = ind["SMA_50"] > ind["SMA_200"]
+    return up & (ind["RSI"] < 40), (ind["RSI"] > 60) | ~up
+
+
+def _screen(ind):
+    held = (ind["SMA_50"] > ind["SMA_200"]) & (ind["RSI"] >= 30) & (ind["RSI"] <= 70)
+    return held, ~held
+
+
+# name -> (description, rule); a rule maps the indicator dict to (entry, exit) boolean
+# panels. Warm-up NaNs compare False, so nothing is entered before the indicators exist.
+BACKTEST_RULES: dict[str, tuple[str, Callable]] = {
+    "trend": ("long while SMA_50 > SMA_200", _trend),
+    "rsi_reversion": ("buy RSI < 30, sell RSI > 50", _rsi_reversion),
+    "trend_pullback": ("buy RSI < 40 in an uptrend, sell RSI > 60 or trend break", _trend_pullback),
+    "screen": ("long while the screener rules hold (uptrend, RSI 30-70)", _screen),
+}
+
+
+def _forward_fill(x: np.ndarray) -> np.ndarray:
+    """Carries the last non-NaN value of each row forward along the time axis."""
+    valid = ~np.isnan(x)
+    last = np.where(valid, np.arange(x.shape[1]), 0)
+    np.maximum.accumulate(last, axis=1, out=last)
+    return x[np.arange(x.shape[0])[:, np.newaxis], last]
+
+
+def positions(entry: np.ndarray, exit: np.ndarray) -> np.ndarray:
+    """
+    Long/flat state from entry and exit signals (exit wins when both fire on a bar).
+
+    Returns:
+        A float panel of 1.0 (holding at that bar's close) or 0.0.
+    """
+    events = np.where(exit, 0.0, np.where(entry, 1.0, np.nan))
+    return np.nan_to_num(_forward_fill(events), nan=0.0)
+
+
+def position_sizes(close: np.ndarray, sizing: str = "vol_target", target_vol: float = 0.15,
+                   max_leverage: float = 1.0, window: int = 20) -> np.ndarray:
+    """
+    Capital fraction a position would be opened with at each bar.
+
+    "equal" puts `max_leverage` into every trade; "vol_target" scales it to
+    `target_vol` annualized using the trailing `window`-bar volatility of the
+    ticker's own bars, capped at `max_leverage`. NaN where the volatility is not
+    warmed up or the ticker has no bar.
+    """
+    if sizing == "equal":
+        return np.full_like(close, max_leverage)
+    if sizing != "vol_target":
+        raise ValueError(f"Unknown sizing: {sizing}")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol = on_own_bars(lambda c: rolling_std(np.diff(np.log(c), axis=1, prepend=np.nan), window), close)
+        return np.minimum(target_vol / (vol * np.sqrt(BARS_PER_YEAR)), max_leverage)
+
+
+def _trade_returns(held: np.ndarray, log_equity: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Net return of every round trip, with the row it belongs to.
+
+    A trade opened at the close of bar s and closed at the close of bar e returns
+    equity[e] / equity[s - 1] - 1, which includes both commissions. Trades still open
+    at the last bar are marked to market.
+    """
+    n_rows, n_bars = held.shape
+    before = np.zeros_like(held)
+    before[:, 1:] = held[:, :-1]
+    starts = np.nonzero(held & ~before)
+    closed = ~held & before
+    closed[:, -1] |= held[:, -1]
+    ends = np.nonzero(closed)
+    # row-major nonzero order pairs each start with the end that follows it
+    padded = np.hstack([np.zeros((n_rows, 1)), log_equity])
+    returns = np.expm1(padded[ends[0], ends[1] + 1] - padded[starts[0], starts[1]])
+    return starts[0], returns
+
+
+def run_backtest(tickers: list[str], close: np.ndarray, rules: Optional[list[str]] = None,
+                 cost_bps: float = 10.0, sizing: str = "vol_target", target_vol: float = 0.15,
+                 max_leverage: float = 1.0) -> pd.DataFrame:
+    """
+    Backtests each rule on every ticker of a (tickers, bars) close panel.
+
+    Args:
+        tickers: Row labels of `close`.
+        close: Daily closes, oldest bar first, NaN where a ticker has no bar.
+        rules: Names from BACKTEST_RULES (default: all).
+        cost_bps: Commission plus slippage per side, in basis points of the traded notional.
+        sizing: "vol_target" or "equal" (see position_sizes).
+        target_vol: Annualized volatility a vol-targeted position is sized to.
+        max_leverage: Largest capital fraction put into one position.
+
+    Returns:
+        A frame indexed by (rule, ticker) with trades, win_rate, avg_trade, exposure,
+        total_return, cagr, sharpe, max_drawdown and the buy-and-hold total_return and cagr
+        over the same bars.
+    """
+    close = np.asarray(close, dtype="f8")
+    valid = ~np.isnan(close)
+    with np.errstate(invalid="ignore"):
+        bar_returns = np.nan_to_num(close / _forward_fill(np.hstack([np.full((close.shape[0], 1), np.nan), close[:, :-1]])) - 1)
+    # on each ticker's own bars, so a missing date does not blank SMA_200 for 200 bars
+    indicators = {
+        "SMA_50": on_own_bars(lambda c: sma(c, 50), close),
+        "SMA_200": on_own_bars(lambda c: sma(c, 200), close),
+        "RSI": on_own_bars(rsi, close),
+    }
+    sizes = position_sizes(close, sizing, target_vol, max_leverage)
+
+    years = valid.sum(axis=1) / BARS_PER_YEAR
+    first = np.argmax(valid, axis=1)
+    last = close.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    rows = np.arange(close.shape[0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hold_return = close[rows, last] / close[rows, first] - 1
+        hold_cagr = (1 + hold_return) ** (1 / years) - 1
+
+    frames = []
+    for name in rules or list(BACKTEST_RULES):
+        entry, exit = BACKTEST_RULES[name][1](indicators)
+        # no trade opens before the volatility estimate has warmed up, and a day
+        # without a bar neither opens nor closes one
+        held = positions(entry & valid & ~np.isnan(sizes), exit & valid) > 0
+        # the size is fixed when the trade opens
+        opened = held & ~np.hstack([np.zeros((close.shape[0], 1), dtype=bool), held[:, :-1]])
+        weight = np.nan_to_num(_forward_fill(np.where(opened, sizes, np.nan)) * held)
+
+        previous = np.hstack([np.zeros((close.shape[0], 1)), weight[:, :-1]])
+        net = previous * bar_returns - cost_bps / 1e4 * np.abs(weight - previous)
+        log_equity = np.cumsum(np.log1p(net), axis=1)
+        drawdown = np.expm1(log_equity - np.maximum.accumulate(np.maximum(log_equity, 0), axis=1))
+
+        trade_rows, trade_returns = _trade_returns(held, log_equity)
+        trades = np.bincount(trade_rows, minlength=len(rows))
+        wins = np.bincount(trade_rows, weights=trade_returns > 0, minlength=len(rows))
+        trade_sum = np.bincount(trade_rows, weights=trade_returns, minlength=len(rows))
+
+        daily = np.where(valid, net, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            total = np.expm1(log_equity[:, -1])
+            frames.append(pd.DataFrame({
+                "rule": name,
+                "ticker": tickers,
+                "trades": trades,
+                "win_rate": wins / trades,
+                "avg_trade": trade_sum / trades,
+                "exposure": (held & valid).sum(axis=1) / valid.sum(axis=1),
+                "total_return": total,
+                "cagr": (1 + total) ** (1 / years) - 1,
+                "sharpe": np.nanmean(daily, axis=1) / np.nanstd(daily, axis=1) * np.sqrt(BARS_PER_YEAR),
+                "max_drawdown": drawdown.min(axis=1),
+                "hold_return": hold_return,
+                "hold_cagr": hold_cagr,
+            }))
+    return pd.concat(frames).set_index(["rule", "ticker"])
+
+
+def summarize_rules(stats: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pools per-ticker results into one row per rule.
+
+    Returns:
+        A frame indexed by rule with tickers, trades, pooled win_rate and avg_trade,
+        median cagr, sharpe and max_drawdown, and beat_hold (share of tickers whose
+        CAGR beat buy-and-hold).
+    """
+    grouped = stats.groupby(level="rule", sort=False)
+    weighted = stats.assign(wins=stats["win_rate"].fillna(0) * stats["trades"],
+                            trade_sum=stats["avg_trade"].fillna(0) * stats["trades"]).groupby(level="rule", sort=False)
+    trades = grouped["trades"].sum()
+    return pd.DataFrame({
+        "tickers": grouped.size(),
+        "trades": trades,
+        "win_rate": weighted["wins"].sum() / trades,
+        "avg_trade": weighted["trade_sum"].sum() / trades,
+        "cagr": grouped["cagr"].median(),
+        "sharpe": grouped["sharpe"].median(),
+        "max_drawdown": grouped["max_drawdown"].median(),
+        "beat_hold": (stats["cagr"] > stats["hold_cagr"]).groupby(level="rule", sort=False).mean(),
+    })
+
+
+def _pct(value) -> str:
+    return "N/A" if pd.isna(value) else f"{value * 100:.1f}%"
+
+
+def _ratio(value) -> str:
+    return "N/A" if not np.isfinite(value) else f"{value:.2f}"
+
+
+def format_backtest(ticker: str, stats: pd.DataFrame, summary: Optional[pd.DataFrame] = None) -> str:
+    """
+    Renders one ticker's backtest results (and the universe-wide rule summary) as text for the agents.
+    """
+    lines = [f"Backtest of the technical rules on {ticker} daily closes (next-bar fills, costs included):"]
+    for rule, row in stats.xs(ticker, level="ticker").iterrows():
+        lines.append(
+            f"- {rule} ({BACKTEST_RULES[rule][0]}): {int(row['trades'])} trades, win rate {_pct(row['win_rate'])}, "
+            f"avg trade {_pct(row['avg_trade'])}, CAGR {_pct(row['cagr'])} vs buy-and-hold {_pct(row['hold_cagr'])}, "
+            f"Sharpe {_ratio(row['sharpe'])}, max drawdown {_pct(row['max_drawdown'])}, in market {_pct(row['exposure'])}"
+        )
+    if summary is not None and summary["tickers"].max() > 1:
+        lines.append(f"Same rules across the {int(summary['tickers'].max())} tickers analyzed today:")
+        for rule, row in summary.iterrows():
+            lines.append(
+                f"- {rule}: median CAGR {_pct(row['cagr'])}, median Sharpe {_ratio(row['sharpe'])}, "
+                f"win rate {_pct(row['win_rate'])}, beat buy-and-hold on {_pct(row['beat_hold'])} of tickers"
+            )
+    return "\n".join(lines)
+
+
+def backtest_universe(tickers: list[str], **kwargs) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Loads ~10 years of daily closes for `tickers` from the price store and backtests every rule.
+
+    Returns:
+        (stats, summary) from run_backtest and summarize_rules; tickers without prices are left out.
+    """
+    loaded, closes, errors = load_closes(tickers, number_of_days=BACKTEST_DAYS)
+    for ticker, error in errors.items():
+        print(f"Backtest: no prices for {ticker}: {error}")
+    if not loaded:
+        return pd.DataFrame(), pd.DataFrame()
+    stats = run_backtest(loaded, closes, **kwargs)
+    return stats, summarize_rules(stats)
+
+
+def print_backtest(summary: pd.DataFrame) -> None:
+    if summary.empty:
+        return
+    print(f"\n{'rule':<16}{'tickers':>8}{'trades':>8}{'win rate':>10}{'avg trade':>11}{'CAGR p50':>10}{'Sharpe p50':>12}{'maxDD p50':>11}{'beat hold':>11}")
+    for rule, r in summary.iterrows():
+        print(f"{rule:<16}{int(r['tickers']):>8}{int(r['trades']):>8}{_pct(r['win_rate']):>10}{_pct(r['avg_trade']):>11}"
+              f"{_pct(r['cagr']):>10}{_ratio(r['sharpe']):>12}{_pct(r['max_drawdown']):>11}{_pct(r['beat_hold']):>11}")
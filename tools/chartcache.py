@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def chart_key(df: pd.DataFrame, style: dict) -> str:
+    """
+    Content hash of the bars being drawn plus the chart style.
+
+    Two renders with the same key produce the same image, so the key only changes when
+    a new bar arrives (or the last bar moves), never just because the date did.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(style, sort_keys=True, default=str).encode())
+    digest.update(np.ascontiguousarray(df.index.asi8).tobytes())
+    for column in sorted(df.columns):
+        digest.update(column.encode())
+        digest.update(np.ascontiguousarray(df[column].to_numpy(dtype="f8")).tobytes())
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """
+    Two-level cache of rendered chart bytes keyed by chart_key.
+
+    An in-memory LRU bounded by total bytes sits in front of a directory of
+    `{key}.png` files, which is also bounded by total bytes and evicts the least
+    recently used files first (reads refresh a file's mtime).
+    """
+
+    def __init__(self, root: str = "data/charts", max_memory_bytes: int = 64 * 2**20,
+                 max_disk_bytes: int = 512 * 2**20):
+        self.root = root
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.png")
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        existed = os.path.exists(path)
+        os.replace(tmp, path)
+        with self._lock:
+            self._remember(key, data)
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()
+            elif not existed:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _remember(self, key: str, data: bytes) -> None:
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _scan_disk(self) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(self.root) if entry.name.endswith(".png"))
+
+    def _evict_disk(self) -> None:
+        entries = sorted(
+            (entry for entry in os.scandir(self.root) if entry.name.endswith(".png")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        total = sum(entry.stat().st_size for entry in entries)
+        # keep the newest file even if it alone exceeds the budget
+        for entry in entries[:-1]:
+            if total <= self.max_disk_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+        self._disk_bytes = total
+
+
+_cache: Optional[ChartCache] = None
+
+
+def get_chart_cache() -> ChartCache:
+    """Returns the process-wide chart cache used by get_stock_chart."""
+    global _cache
+    if _cache is None:
+        _cache = ChartCache(root=os.environ.get("CHART_CACHE_DIR", "data/charts"))
+    return _cache
@@ -0,0 +1,195 @@
+"""
+Chart rendering that runs in a warm process pool.
+
+mplfinance rendering is CPU-bound, so drawing a chart inside the asyncio loop stalls
+every other session. The functions here are top-level and import only matplotlib
+(Agg backend), mplfinance and pandas, so they can be shipped to worker processes
+that were warmed up once by `_init_worker`. matplotlib and mplfinance are imported on
+first render (`_plotting`), so importing this module costs a process that never draws
+a chart nothing; the forkserver preloads them for the workers.
+"""
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Everything that affects the rendered pixels; part of the chart cache key.
+CHART_STYLE = {
+    "type": "candle",
+    "style": "charles",
+    "figsize": (12, 6),
+    "panel_ratios": (6, 2, 2),
+    "dpi": 100,
+}
+
+
+def _plotting():
+    """Imports and returns (pyplot, mplfinance) on the Agg backend."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import mplfinance as mpf
+    return plt, mpf
+
+
+def render_chart_png(df: pd.DataFrame, ticker: str) -> bytes:
+    """
+    Renders the candlestick/volume/RSI chart used by the technical agent and returns PNG bytes.
+
+    The figure is rendered once and closed afterwards so long batch runs do not
+    accumulate matplotlib figures.
+    """
+    plt, mpf = _plotting()
+    # Create addplots
+    apds = [
+        # mpf.make_addplot(df['SMA_21'], color='blue', width=1.0),
+        mpf.make_addplot(df['SMA_50'], color='orange', label='SMA_50',width=1.0),
+        mpf.make_addplot(df['SMA_200'], color='red', label='SMA_200', width=1.0),
+        mpf.make_addplot(df['RSI'], panel=2, color='purple', ylabel='RSI', width=1.0)
+    ]
+
+    # Generate the candlestick chart with volume and indicators
+    fig, axes = mpf.plot(
+        df,
+        type=CHART_STYLE['type'],
+        style=CHART_STYLE['style'],
+        volume=True,
+        addplot=apds,
+        title=f'{ticker} Stock Chart',
+        returnfig=True,
+        figsize=CHART_STYLE['figsize'],
+        panel_ratios=CHART_STYLE['panel_ratios']
+    )
+    try:
+        # Add legends
+        # axes[0] is the main chart primary axis
+        axes[0].legend()
+
+        # axes[4] is the RSI chart primary axis (Panel 2)
+        # Structure is [Main Pri, Main Sec, Vol Pri, Vol Sec, RSI Pri, RSI Sec]
+        if len(axes) > 4:
+            axes[4].legend(['RSI'], loc='upper left')
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=CHART_STYLE['dpi'], metadata={"Panels": json.dumps(_panel_bands(axes))})
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def _panel_bands(axes) -> dict:
+    """Vertical extent of each panel as fractions of the image height from the top, for cropping."""
+    panels = {"price": axes[0], "volume": axes[2]}
+    if len(axes) > 4:
+        panels["rsi"] = axes[4]
+    bands = {}
+    for name, ax in panels.items():
+        box = ax.get_position()
+        bands[name] = [round(1 - box.y1, 4), round(1 - box.y0, 4)]
+    return bands
+
+
+def render_overview_chart(df: pd.DataFrame, ticker: str, output_path: str) -> None:
+    """Renders the 50-bar candlestick + moving average chart of generate_stock_chart to `output_path`."""
+    plt, mpf = _plotting()
+    df = df.tail(50)
+    # Create addplots
+    apds = [
+        # mpf.make_addplot(df['SMA_21'], color='blue', width=1.0),
+        mpf.make_addplot(df['SMA_50'], color='orange', label='SMA_50',width=1.0),
+        mpf.make_addplot(df['SMA_200'], color='red', label='SMA_200', width=1.0),
+        # mpf.make_addplot(df['RSI'], panel=2, color='purple', ylabel='RSI', width=1.0)
+    ]
+
+    # Generate the candlestick chart with volume and indicators
+    fig, axes = mpf.plot(
+        df,
+        type='candle',
+        style='charles',
+        # volume=True,
+        addplot=apds,
+        title=f'{ticker} Stock Chart',
+        returnfig=True,
+        figsize=(12,6),
+        # panel_ratios=(6, 2, 2)
+    )
+    try:
+        # Add legends
+        # axes[0] is the main chart primary axis
+        axes[0].legend()
+
+        # Save the chart
+        fig.savefig(output_path)
+    finally:
+        plt.close(fig)
+
+
+def _init_worker() -> None:
+    """Pays the import, font-cache and first-draw cost once per worker process."""
+    index = pd.bdate_range(end="2025-01-31", periods=30)
+    close = np.linspace(100, 110, len(index))
+    df = pd.DataFrame({
+        "Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+        "Volume": np.full(len(index), 1000), "SMA_50": close, "SMA_200": close, "RSI": np.full(len(index), 50.0),
+    }, index=index)
+    render_chart_png(df, "WARMUP")
+
+
+def _mp_context():
+    """
+    Workers are forked from a clean forkserver that has this module and the plotting
+    libraries preloaded, rather than from the (threaded, event-loop running) parent;
+    spawn where forkserver is missing.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__, "matplotlib.pyplot", "mplfinance"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+
+def get_render_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Returns the shared render pool, creating it on first use.
+
+    Args:
+        workers: Pool size; defaults to the CHART_WORKERS env var or the CPU count.
+            Asking for a different size replaces the pool.
+    """
+    global _pool, _pool_workers
+    workers = workers or int(os.environ.get("CHART_WORKERS", 0)) or os.cpu_count() or 1
+    if _pool is None or workers != _pool_workers:
+        shutdown_render_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(), initializer=_init_worker)
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_render_pool() -> None:
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+    _pool, _pool_workers = None, 0
+
+
+async def warm_render_pool() -> None:
+    """Starts and warms every worker now rather than on the first charts of a batch."""
+    pool = get_render_pool(_pool_workers or None)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(pool, int) for _ in range(_pool_workers)))
+
+
+async def render_in_pool(func, *args):
+    """Runs a render function in the pool and awaits it without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_render_pool(_pool_workers or None), func, *args)
@@ -1,24 +1,37 @@
-import yfinance as yf
 import pandas as pd
 from typing import Literal
-import mplfinance as mpf
 from google.adk.tools import ToolContext
-import io,os,datetime
+import asyncio,io,os,datetime
 from google.genai import types
-import PIL.Image
 from google.adk.agents.callback_context import CallbackContext
 from google.adk.models import LlmResponse, LlmRequest
 from typing import Optional
 from google.genai.types import Part
 from pathlib import Path
-
+from tools.pricestore import get_price_store
+from tools.metricsstore import get_metrics_store
+from tools.indicators import add_indicators
+from tools.panel import PANEL_DAYS, get_universe_panel, universe_panel
+from tools.chartcache import chart_key, get_chart_cache
+from tools.tracing import span, traced
+from tools.singleflight import SingleFlight
+from tools.imagepipe import prepare_chart
+from tools.chartrender import CHART_STYLE, get_render_pool, render_chart_png, render_in_pool, render_overview_chart
+
+@traced("data")
 def get_stock_data(
     ticker: str, 
     number_of_days: int=500, 
     timeframe_unit: Literal["day", "hour", "15min"] = "day"
 ) -> pd.DataFrame:
     """
-    Retrieves historical stock data for a given ticker using yfinance.
+    Retrieves historical stock data for a given ticker from the local price store.
+
+    The store (tools/pricestore.py) only fetches the bars missing since the last run
+    from yfinance, so repeated calls move a few bars instead of the full history.
+    Hourly and 15-minute candles are aggregated from the stored 1-minute bars, and
+    intraday requests are clamped to the history the source serves (60 days of 15m,
+    730 days of 1h).
 
     Args:
         ticker: The stock ticker symbol (e.g., 'AAPL', 'MSFT').
@@ -39,42 +52,47 @@ def get_stock_data(
     }
     
     interval = interval_map.get(timeframe_unit, "1d")
-    period = f"{number_of_days}d"
-    
-    stock = yf.Ticker(ticker)
-    df = stock.history(period=period, interval=interval)
 
-    # Calculate Moving Averages
-    # df['SMA_21'] = df['Close'].rolling(window=21).mean()
-    df['SMA_50'] = df['Close'].rolling(window=50).mean()
-    df['SMA_200'] = df['Close'].rolling(window=200).mean()
-
-    # Calculate RSI (14 periods)
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0))
-    loss = (-delta.where(delta < 0, 0))
-    avg_gain = gain.rolling(window=14).mean()
-    avg_loss = loss.rolling(window=14).mean()
-    rs = avg_gain / avg_loss
-    df['RSI'] = 100 - (100 / (1 + rs))
+    df = get_price_store().get(ticker, interval, number_of_days)
 
+    # SMA_50, SMA_200 and Wilder RSI(14) from the vectorized indicator engine
+    df = add_indicators(df)
 
     return df
 
-async def ta_bac(callback_context: CallbackContext) -> Optional[LlmResponse]:
+# coalesces concurrent fetches/renders of the same ticker across sessions
+_flights = SingleFlight()
 
-    return None
 
-async def ta_bmc(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+async def get_stock_data_async(
+    ticker: str,
+    number_of_days: int = 500,
+    timeframe_unit: Literal["day", "hour", "15min"] = "day"
+) -> pd.DataFrame:
+    """
+    get_stock_data without blocking the event loop.
+
+    The store read runs in a worker thread, and concurrent calls for the same ticker,
+    length and timeframe share one call. The returned frame may be shared between
+    callers, so treat it as read-only.
+    """
+    key = ("data", ticker.upper(), number_of_days, timeframe_unit)
+    return await _flights.run_in_thread(key, get_stock_data, ticker, number_of_days, timeframe_unit)
 
-    if("saved_chart" in callback_context.state):
-        artifact = await callback_context.load_artifact(f"{callback_context.state['saved_chart']}")
-        llm_request.contents[0].parts = llm_request.contents[0].parts + [artifact]
+async def ta_bac(callback_context: CallbackContext) -> Optional[LlmResponse]:
 
-    # print(f""" Before Model callback 
-    #         context {callback_context}
-    #         request {llm_request} """)
+    return None
+
+async def skip_completed_bac(callback_context: CallbackContext) -> Optional[types.Content]:
+    """
+    Skips an agent whose section is listed in state['completed_sections'].
 
+    Used when a run is resumed: the carried-over output is already in state under the
+    agent's output_key, so only the missing stages call a model.
+    """
+    if callback_context.agent_name in (callback_context.state.get("completed_sections") or []):
+        print(f"Skipping {callback_context.agent_name}, carried over from an earlier run")
+        return types.Content(role="model", parts=[Part(text=f"{callback_context.agent_name} output carried over from an earlier run.")])
     return None
 
 async def va_bmc(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
@@ -85,76 +103,110 @@ async def va_bmc(callback_context: CallbackContext, llm_request: LlmRequest) ->
 
     return None
 
-async def get_stock_chart(ticker: str, tool_context: ToolContext) -> str:
+# Calendar days loaded per chart timeframe: the 200 drawn bars plus 200 more to warm up SMA_200.
+CHART_DAYS = {"day": 500, "hour": 120, "15min": 30}
+
+
+async def _chart_png(ticker: str, timeframe_unit: str = "day") -> bytes:
+    """Returns the technical chart PNG for `ticker`, from the chart cache or rendered in the render pool."""
+    return await _flights.do(("chart", ticker.upper(), timeframe_unit), lambda: _load_or_render_chart(ticker, timeframe_unit))
+
+
+def _chart_bars(ticker: str, timeframe_unit: str, bars: int = 200) -> Optional[pd.DataFrame]:
+    """
+    The drawn bars as a view of the batch's universe panel (tools/panel.py), if it
+    holds the ticker and is still fresh; a panel left by an earlier job is not used.
+    """
+    panel = get_universe_panel()
+    if timeframe_unit != "day" or panel is None or ticker not in panel or panel.number_of_days < CHART_DAYS["day"]:
+        return None
+    if not panel.is_fresh():
+        return None
+    return panel.view(ticker, bars)
+
+
+async def _load_or_render_chart(ticker: str, timeframe_unit: str) -> bytes:
+    df = _chart_bars(ticker, timeframe_unit)
+    if df is None:
+        df = await get_stock_data_async(ticker, CHART_DAYS[timeframe_unit], timeframe_unit)
+        required_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+        if not all(col in df.columns for col in required_columns):
+            raise ValueError(f"DataFrame must contain the following columns: {required_columns}")
+        df = df.tail(200)
+
+    # keyed on the bars actually drawn, so an unchanged chart is never re-rendered
+    # and a new bar always is
+    cache = get_chart_cache()
+    key = chart_key(df, {**CHART_STYLE, "ticker": ticker})
+    image_bytes = cache.get(key)
+    if image_bytes is None:
+        print(f'Generetaing {ticker} {timeframe_unit} chart')
+        with span("render_chart", "chart", ticker=ticker, timeframe=timeframe_unit):
+            title = ticker if timeframe_unit == "day" else f"{ticker} {timeframe_unit}"
+            image_bytes = await render_in_pool(render_chart_png, df, title)
+        cache.put(key, image_bytes)
+    else:
+        print(f'Got cached chart for {ticker}')
+    return image_bytes
+
+
+async def prerender_charts(tickers: list) -> dict:
+    """
+    Draws the technical chart for a whole watchlist ahead of the LLM calls.
+
+    Charts are rendered concurrently in the render pool and land in the chart cache,
+    so get_stock_chart only has to read them when the technical agent asks. The daily
+    bars come from the universe panel, loaded here unless the screener already did.
+
+    Returns:
+        A dict mapping each ticker that failed to the exception raised.
+    """
+    await asyncio.to_thread(universe_panel, tickers, PANEL_DAYS)
+    results = await asyncio.gather(*(_chart_png(ticker) for ticker in tickers), return_exceptions=True)
+    return {ticker: result for ticker, result in zip(tickers, results) if isinstance(result, Exception)}
+
+
+@traced("tool")
+async def get_stock_chart(
+    ticker: str,
+    tool_context: ToolContext,
+    timeframe_unit: Literal["day", "hour", "15min"] = "day"
+) -> dict:
     """
     Get a stock price chart for a given ticker and saves it as an artifact.
+    Call it again with another timeframe_unit to also look at the intraday trend.
     Args:
         ticker: The stock ticker symbol (e.g., 'AAPL').
+        timeframe_unit: Candle size of the chart: 'day' (default), 'hour' or '15min'.
     """
-
-    artifact_name = f"{ticker}_chart_{tool_context.state['reqdt']}.png"
+    if timeframe_unit not in CHART_DAYS:
+        timeframe_unit = "day"
+    suffix = "" if timeframe_unit == "day" else f"_{timeframe_unit}"
+    artifact_name = f"{ticker}_chart{suffix}_{tool_context.state['reqdt']}.png"
     image_path = f"outputs/{artifact_name}"
 
-    #if image_path exists read its bytes
-    if os.path.exists(image_path):
-        with open(image_path, "rb") as image_file:
-            image_bytes = image_file.read()
-        print(f'Got existing {image_path}')
-    else :
-        print(f'Generetaing {image_path}')
-        df = get_stock_data(ticker)
-        required_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-        if not all(col in df.columns for col in required_columns):
-            raise ValueError(f"DataFrame must contain the following columns: {required_columns}")
+    image_bytes = await _chart_png(ticker, timeframe_unit)
 
+    # the markdown report links to this file
+    with open(image_path, "wb") as image_file:
+        image_file.write(image_bytes)
 
-        df = df.tail(200)
-        # Create addplots
-        apds = [
-            # mpf.make_addplot(df['SMA_21'], color='blue', width=1.0),
-            mpf.make_addplot(df['SMA_50'], color='orange', label='SMA_50',width=1.0),
-            mpf.make_addplot(df['SMA_200'], color='red', label='SMA_200', width=1.0),
-            mpf.make_addplot(df['RSI'], panel=2, color='purple', ylabel='RSI', width=1.0)
-        ]
-
-        # Generate the candlestick chart with volume and indicators
-        fig, axes = mpf.plot(
-            df,
-            type='candle',
-            style='charles',
-            volume=True,
-            addplot=apds,
-            title=f'{ticker} Stock Chart',
-            returnfig=True,
-            figsize=(12,6),
-            panel_ratios=(6, 2, 2)
-        )
-        
-        # Add legends
-        # axes[0] is the main chart primary axis
-        axes[0].legend()
-        
-        # axes[4] is the RSI chart primary axis (Panel 2)
-        # Structure is [Main Pri, Main Sec, Vol Pri, Vol Sec, RSI Pri, RSI Sec]
-        if len(axes) > 4:
-            axes[4].legend(['RSI'], loc='upper left')
-
-        fig.savefig(image_path) ## for debugging
-
-        buffer = io.BytesIO()
-        fig.savefig(buffer, format='png', dpi=100) 
-        image_bytes = buffer.getvalue()
-    
-    image_part = types.Part.from_bytes(data=image_bytes, mime_type='image/png')
+    # the model gets a cropped, downscaled and re-encoded copy (tools/imagepipe.py),
+    # prepared once here rather than on every model turn
+    with span("prepare_chart", "chart", ticker=ticker):
+        llm_bytes, mime_type = await asyncio.to_thread(prepare_chart, image_bytes)
+    image_part = types.Part.from_bytes(data=llm_bytes, mime_type=mime_type)
 
-    # Save as an artifact so the Agent can "see" it
-    # print(f'saving artifact {artifact_name}')
     await tool_context.save_artifact(artifact_name, image_part)
-    # print(f'saving artifact DONE {artifact_name} {await tool_context.list_artifacts()}')
-
     tool_context.state["saved_chart"]=artifact_name
 
-    return f"Successfully generated chart for {ticker} and saved as artifactid {artifact_name}. Please analyze the visual trends in this artifactid {artifact_name}."
+    # ADK moves the image into the function response, so the chart enters the
+    # session history once, with the call that asked for it, and later model turns
+    # carry it from there instead of having it appended again
+    return {
+        "result": f"Successfully generated {timeframe_unit} chart for {ticker} and saved as artifactid {artifact_name}. Please analyze the visual trends in the attached chart.",
+        "chart": image_part,
+    }
 
 
 
@@ -189,39 +241,16 @@ def generate_stock_chart(df: pd.DataFrame, ticker: str, output_path: str) -> Non
         raise ValueError(f"DataFrame must contain the following columns: {required_columns}")
 
 
-    df = df.tail(50)
-    # Create addplots
-    apds = [
-        # mpf.make_addplot(df['SMA_21'], color='blue', width=1.0),
-        mpf.make_addplot(df['SMA_50'], color='orange', label='SMA_50',width=1.0),
-        mpf.make_addplot(df['SMA_200'], color='red', label='SMA_200', width=1.0),
-        # mpf.make_addplot(df['RSI'], panel=2, color='purple', ylabel='RSI', width=1.0)
-    ]
-
-    # Generate the candlestick chart with volume and indicators
-    fig, axes = mpf.plot(
-        df,
-        type='candle',
-        style='charles',
-        # volume=True,
-        addplot=apds,
-        title=f'{ticker} Stock Chart',
-        returnfig=True,
-        figsize=(12,6),
-        # panel_ratios=(6, 2, 2)
-    )
-    
-    # Add legends
-    # axes[0] is the main chart primary axis
-    axes[0].legend()
-    
-    # axes[4] is the RSI chart primary axis (Panel 2)
-    # Structure is [Main Pri, Main Sec, Vol Pri, Vol Sec, RSI Pri, RSI Sec]
-    # if len(axes) > 4:
-    #     axes[4].legend(['RSI'], loc='upper left')
+    # rendered in the warm render pool; blocks the caller until the file is written
+    get_render_pool().submit(render_overview_chart, df, ticker, output_path).result()
+
 
-    # Save the chart
-    fig.savefig(output_path)
+async def generate_stock_chart_async(df: pd.DataFrame, ticker: str, output_path: str) -> None:
+    """Same as generate_stock_chart, but awaits the render pool instead of blocking the event loop."""
+    required_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    if not all(col in df.columns for col in required_columns):
+        raise ValueError(f"DataFrame must contain the following columns: {required_columns}")
+    await render_in_pool(render_overview_chart, df, ticker, output_path)
 
 
 def _format_large_number(value):
@@ -238,13 +267,44 @@ def _format_large_number(value):
         return f"${value:,.2f}"
 
 
+def _format_ratio(value):
+    return value if pd.notna(value) else 'N/A'
+
+
+def _format_percent(value):
+    return f"{value * 100:.2f}%" if pd.notna(value) else 'N/A'
+
+
+def format_metrics(ticker: str, row: pd.Series) -> str:
+    """Formats one row of MetricsStore.metrics_table as the summary string returned by get_stock_metrics."""
+    def large(column):
+        return _format_large_number(float(row[column])) if pd.notna(row.get(column)) else 'N/A'
+
+    return f"""
+        Stock Metrics for {ticker.upper()}:
+
+        Market Cap: {large('market_cap')}
+        P/E Ratio: {_format_ratio(row.get('trailing_pe'))}
+        P/S Ratio: {_format_ratio(row.get('ps_ratio'))}
+        Total Debt: {large('total_debt')}
+        Debt to Equity: {_format_ratio(row.get('debt_to_equity'))}
+        Latest Annual Revenue: {large('revenue')}
+        Latest Annual Net Income: {large('net_income')}
+        Revenue Growth (YoY): {_format_percent(row.get('revenue_growth'))}
+        Revenue CAGR (4 Quarters): {_format_percent(row.get('revenue_cagr'))}
+        Net Income CAGR (4 Quarters): {_format_percent(row.get('net_income_cagr'))}
+        """
+
+
+@traced("data")
 def get_stock_metrics(ticker: str, tool_context: ToolContext) -> str:
     """
-    Retrieves and summarizes key financial metrics for a given stock ticker using yfinance.
+    Retrieves and summarizes key financial metrics for a given stock ticker.
 
-    This function fetches earnings data for the last 4 quarters and last 2 years, along with
-    key financial metrics from the stock's info. It calculates CAGR for revenue and net income
-    over the last 4 quarters and formats and returns a summary string.
+    Metrics come from the local metrics store (tools/metricsstore.py), which keeps the
+    quarterly and annual income statements plus valuation fields from yfinance and only
+    re-fetches statements when a new quarter is likely to have been reported. CAGR for
+    revenue and net income is computed over the last 4 quarters.
 
     Args:
         ticker: The stock ticker symbol (e.g., 'AAPL', 'MSFT').
@@ -254,113 +314,27 @@ def get_stock_metrics(ticker: str, tool_context: ToolContext) -> str:
         growth, CAGR for revenue and net income, P/E ratio, P/S ratio, market cap, debt,
         debt-to-equity ratio, and earnings data.
     """
-
-    metrics_path = f"outputs/{ticker}_metrics_{tool_context.state['reqdt']}.txt"
-    #if metrics_path exists return its content
-    if os.path.exists(metrics_path):
-        with open(metrics_path, 'r') as f:
-            return f.read()
-
-    print(f"Generating {ticker} metrics")
-    stock = yf.Ticker(ticker)
-
-    # Get quarterly income statement for the last 4 quarters
-    quarterly_income_stmt = stock.quarterly_income_stmt
-    last_4_quarters = quarterly_income_stmt.iloc[:, :4] if quarterly_income_stmt is not None and not quarterly_income_stmt.empty and quarterly_income_stmt.shape[1] >= 4 else quarterly_income_stmt
-    # Get annual income statement for the last 2 years
-    annual_income_stmt = stock.income_stmt
-    last_2_years = annual_income_stmt.iloc[:, :2] if annual_income_stmt is not None and not annual_income_stmt.empty and annual_income_stmt.shape[1] >= 2 else annual_income_stmt
-
-    # Calculate CAGR for revenue and net income from last 4 quarters
-    if last_4_quarters is not None and not last_4_quarters.empty and last_4_quarters.shape[1] >= 4:
-        # Revenue CAGR
-        if 'Total Revenue' in last_4_quarters.index:
-            rev_series = last_4_quarters.loc['Total Revenue']
-            beginning_rev = rev_series.iloc[-1]  # oldest quarter
-            ending_rev = rev_series.iloc[0]      # newest quarter
-            if beginning_rev > 0 and ending_rev > 0:
-                cagr_rev = (ending_rev / beginning_rev)**(1/4) - 1
-                cagr_rev_str = f"{cagr_rev * 100:.2f}%"
-            else:
-                cagr_rev_str = 'N/A'
-        else:
-            cagr_rev_str = 'N/A'
-        # Net Income CAGR
-        if 'Net Income' in last_4_quarters.index:
-            inc_series = last_4_quarters.loc['Net Income']
-            beginning_inc = inc_series.iloc[-1]  # oldest quarter
-            ending_inc = inc_series.iloc[0]      # newest quarter
-            if beginning_inc != 0 and ending_inc != 0:  # allow negative, but not zero
-                cagr_inc = (ending_inc / beginning_inc)**(1/4) - 1
-                cagr_inc_str = f"{cagr_inc * 100:.2f}%"
-            else:
-                cagr_inc_str = 'N/A'
-        else:
-            cagr_inc_str = 'N/A'
-    else:
-        cagr_rev_str = 'N/A'
-        cagr_inc_str = 'N/A'
-
-
-
-    # Get key metrics from info
-    info = stock.info
-    market_cap = _format_large_number(info.get('marketCap', 'N/A'))
-    pe_ratio = info.get('trailingPE', 'N/A')
-    ps_ratio = info.get('priceToSalesTrailing12Months', 'N/A')
-    total_debt = _format_large_number(info.get('totalDebt', 'N/A'))
-    debt_to_equity = info.get('debtToEquity', 'N/A')
-
-    # Extract revenue, net income, and growth from annual income statement
-    if last_2_years is not None and not last_2_years.empty:
-        if 'Total Revenue' in last_2_years.index:
-            revenue_series = last_2_years.loc['Total Revenue']
-            revenue = _format_large_number(revenue_series.iloc[0] if len(revenue_series) > 0 else 'N/A')
-            if len(revenue_series) >= 2:
-                rev_curr = revenue_series.iloc[0]
-                rev_prev = revenue_series.iloc[1]
-                growth = f"{((rev_curr - rev_prev) / rev_prev * 100):.2f}%" if rev_prev != 0 else 'N/A'
-            else:
-                growth = 'N/A'
-        else:
-            revenue = 'N/A'
-            growth = 'N/A'
-        if 'Net Income' in last_2_years.index:
-            net_income_series = last_2_years.loc['Net Income']
-            net_income = _format_large_number(net_income_series.iloc[0] if len(net_income_series) > 0 else 'N/A')
-        else:
-            net_income = 'N/A'
-    else:
-        revenue = 'N/A'
-        net_income = 'N/A'
-        growth = 'N/A'
-
-    # Format the summary string
-    summary = f"""
-        Stock Metrics for {ticker.upper()}:
-
-        Market Cap: {market_cap}
-        P/E Ratio: {pe_ratio}
-        P/S Ratio: {ps_ratio}
-        Total Debt: {total_debt}
-        Debt to Equity: {debt_to_equity}
-        Latest Annual Revenue: {revenue}
-        Latest Annual Net Income: {net_income}
-        Revenue Growth (YoY): {growth}
-        Revenue CAGR (4 Quarters): {cagr_rev_str}
-        Net Income CAGR (4 Quarters): {cagr_inc_str}
-        """
-
-    #write summary to a file
-    with open(metrics_path, "w") as f:
-        f.write(summary)
+    ticker = ticker.upper()
+    store = get_metrics_store()
+    store.refresh([ticker])
+    table = store.metrics_table([ticker])
+    row = table.loc[ticker] if ticker in table.index else pd.Series(dtype=float)
+    return format_metrics(ticker, row)
 
 
+async def get_stock_metrics_async(ticker: str, tool_context: ToolContext) -> str:
+    """
+    Retrieves and summarizes key financial metrics for a given stock ticker, without blocking the event loop.
 
-# Quarterly Earnings (Last 4 Quarters):
-# {last_4_quarters.to_string(index=True) if last_4_quarters is not None else 'N/A'}
+    Same output as get_stock_metrics; concurrent calls for the same ticker share one
+    metrics store refresh.
 
-# Annual Earnings (Last 2 Years):
-# {last_2_years.to_string(index=True) if last_2_years is not None else 'N/A'}
+    Args:
+        ticker: The stock ticker symbol (e.g., 'AAPL', 'MSFT').
 
-    return summary
+    Returns:
+        A formatted string containing summarized financial metrics including revenue, net profit,
+        growth, CAGR for revenue and net income, P/E ratio, P/S ratio, market cap, debt and
+        debt-to-equity ratio.
+    """
+    return await _flights.run_in_thread(("metrics", ticker.upper()), get_stock_metrics, ticker, tool_context)
@@ -0,0 +1,191 @@
+"""
+Delta re-analysis: carry report sections forward while their inputs are unchanged.
+
+After each successful run the ticker's sections are saved to a snapshot
+(`{root}/{TICKER}.json`) together with the market data each one was written from.
+Before the next run, `plan_delta` compares today's close, indicators and latest filed
+quarter with that snapshot. Sections whose inputs are still within DELTA_RULES are
+put back into session state and skipped by the workflow, so only the stages whose
+inputs changed call a model. A section is always compared with the data it was
+written from, not with the last run, so small daily moves cannot add up unnoticed.
+"""
+import datetime
+import json
+import os
+from typing import Optional
+
+import pandas as pd
+
+from tools.metricsstore import get_metrics_store
+
+# Per section: the oldest it may be, and how far its inputs may drift, to be carried.
+DELTA_RULES = {
+    "technical_analysis_agent": {"max_age_days": 5, "price_move": 0.02, "rsi_change": 5.0},
+    "fundamental_analysis_agent": {"max_age_days": 1, "price_move": 0.03},
+    "summary_recommendation_agent": {"max_age_days": 5},
+    "visualization_agent": {"max_age_days": 5},
+}
+
+# Sections written from other sections; they are only carried if those are too.
+SECTION_INPUTS = {
+    "summary_recommendation_agent": ["technical_analysis_agent", "fundamental_analysis_agent"],
+    "visualization_agent": ["summary_recommendation_agent"],
+}
+
+_settings = {
+    "root": os.environ.get("SNAPSHOT_DIR", "data/snapshots"),
+    "output_dir": "outputs",
+}
+
+
+def configure_delta(root: Optional[str] = None) -> None:
+    if root is not None:
+        _settings["root"] = root
+
+
+def _path(ticker: str) -> str:
+    return os.path.join(_settings["root"], f"{ticker.upper()}.json")
+
+
+def load_snapshot(ticker: str) -> dict:
+    """The ticker's saved sections, keyed by agent name ({} if it was never analyzed)."""
+    try:
+        with open(_path(ticker)) as f:
+            return json.load(f).get("sections", {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_snapshot(ticker: str, inputs: dict, sections: dict[str, str], carried: list[str], reqdt: str,
+                  image_name: Optional[str] = None, exclude: Optional[list[str]] = None) -> None:
+    """
+    Records a finished run.
+
+    Args:
+        ticker: The stock ticker symbol.
+        inputs: The market data the run saw (see current_inputs).
+        sections: The report's section bodies, keyed by agent name.
+        carried: Sections carried over from the snapshot; their original entry is kept.
+        reqdt: The run's date stamp, which names its chart files.
+        image_name: The poster written by this run, if any.
+        exclude: Sections not to save, e.g. stages the router skipped.
+    """
+    previous = load_snapshot(ticker)
+    today = datetime.date.today().isoformat()
+    saved = {}
+    for agent, body in sections.items():
+        if agent in (exclude or []) or not body.strip():
+            continue
+        if agent in carried and agent in previous:
+            saved[agent] = previous[agent]
+            continue
+        saved[agent] = {"date": today, "reqdt": reqdt, "inputs": inputs, "body": body}
+        if agent == "visualization_agent":
+            if not image_name:
+                del saved[agent]
+                continue
+            saved[agent]["image"] = image_name
+
+    path = _path(ticker)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"sections": saved}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _float(value) -> Optional[float]:
+    return None if value is None or pd.isna(value) else float(value)
+
+
+def current_inputs(tickers: list[str], table: pd.DataFrame) -> dict[str, dict]:
+    """
+    Today's inputs per ticker: close, SMA_50, SMA_200 and RSI from a screen() table,
+    plus the latest quarter in the metrics store.
+    """
+    stmts = get_metrics_store().statements("quarterly", tickers)
+    quarters = stmts.groupby("ticker")["period_end"].max().to_dict() if not stmts.empty else {}
+    inputs = {}
+    for ticker in tickers:
+        row = table.loc[ticker] if ticker in table.index else {}
+        inputs[ticker] = {column: _float(row.get(column)) for column in ("close", "SMA_50", "SMA_200", "RSI")}
+        inputs[ticker]["quarter"] = quarters.get(ticker)
+    return inputs
+
+
+def section_change(agent: str, inputs: dict, section: dict, today: Optional[datetime.date] = None) -> Optional[str]:
+    """
+    Why a saved section can no longer be carried, or None if it can.
+
+    Args:
+        agent: The section's agent name.
+        inputs: Today's inputs for the ticker.
+        section: The saved section, with the inputs it was written from.
+    """
+    rules = DELTA_RULES.get(agent, {})
+    today = today or datetime.date.today()
+    age = (today - datetime.date.fromisoformat(section["date"])).days
+    if age > rules.get("max_age_days", 0):
+        return f"{age} days old"
+
+    then = section.get("inputs") or {}
+    if "price_move" in rules:
+        if not inputs.get("close") or not then.get("close"):
+            return "no price data"
+        move = inputs["close"] / then["close"] - 1
+        if abs(move) > rules["price_move"]:
+            return f"close moved {move:+.1%}"
+    if "rsi_change" in rules and inputs.get("RSI") is not None and then.get("RSI") is not None:
+        if abs(inputs["RSI"] - then["RSI"]) > rules["rsi_change"]:
+            return f"RSI {then['RSI']:.0f} -> {inputs['RSI']:.0f}"
+    if agent == "technical_analysis_agent":
+        trend_then = None if then.get("SMA_50") is None or then.get("SMA_200") is None else then["SMA_50"] > then["SMA_200"]
+        trend_now = None if inputs.get("SMA_50") is None or inputs.get("SMA_200") is None else inputs["SMA_50"] > inputs["SMA_200"]
+        if trend_then != trend_now:
+            return "SMA_50/SMA_200 crossed"
+    if agent == "fundamental_analysis_agent" and inputs.get("quarter") != then.get("quarter"):
+        return f"new quarter {inputs.get('quarter')}"
+    if agent == "visualization_agent" and not os.path.exists(os.path.join(_settings["output_dir"], section.get("image") or "")):
+        return "poster missing"
+    return None
+
+
+def plan_delta(tickers: list[str], table: pd.DataFrame) -> dict[str, dict]:
+    """
+    Decides per ticker which saved sections can be carried into today's run.
+
+    Args:
+        tickers: The batch.
+        table: A screen() result covering the tickers.
+
+    Returns:
+        For each ticker: inputs (today's market data), carry (agent -> saved section)
+        and changed (agent -> reason the section has to be rewritten).
+    """
+    all_inputs = current_inputs(tickers, table)
+    plans = {}
+    for ticker in tickers:
+        inputs, snapshot = all_inputs[ticker], load_snapshot(ticker)
+        carry, changed = {}, {}
+        for agent in DELTA_RULES:
+            if agent not in snapshot:
+                changed[agent] = "no earlier report"
+                continue
+            stale = [a for a in SECTION_INPUTS.get(agent, []) if a not in carry]
+            reason = f"{', '.join(stale)} rewritten" if stale else section_change(agent, inputs, snapshot[agent])
+            if reason:
+                changed[agent] = reason
+            else:
+                carry[agent] = snapshot[agent]
+        plans[ticker] = {"inputs": inputs, "carry": carry, "changed": changed}
+    return plans
+
+
+def print_delta(plans: dict[str, dict]) -> None:
+    carried = sum(len(p["carry"]) for p in plans.values())
+    total = sum(len(p["carry"]) + len(p["changed"]) for p in plans.values())
+    print(f"Delta: carrying {carried}/{total} sections forward")
+    for ticker, plan in plans.items():
+        if plan["carry"]:
+            kept = ", ".join(a.replace("_agent", "") for a in plan["carry"])
+            redo = "; ".join(f"{a.replace('_agent', '')}: {r}" for a, r in plan["changed"].items())
+            print(f"  {ticker:<8} kept {kept}" + (f" | rerun {redo}" if redo else ""))
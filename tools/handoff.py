@@ -0,0 +1,149 @@
+"""
+Compact hand-off between the workflow's agents.
+
+The technical, fundamental and summary agents end their answer with a <digest> JSON
+block in the shape of the schemas below. `handoff_aac` validates it once the agent is
+done and stores it as compact JSON under the agent's hand-off key; the summary and
+visualization prompts read only those keys, while the full answer stays under the
+agent's output_key for the markdown report (which drops the block, see
+`strip_digest`). Strings and lists are clipped while validating, so a digest never
+grows past its schema's bounds. An answer without a valid digest hands over its text
+instead, minus any <scratchpad>.
+
+The agents reading hand-offs also run `handoff_bmc`, which drops the other agents'
+answers ADK would otherwise quote into the request, so the digests are all they get.
+"""
+import re
+from typing import Annotated, Literal, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+from pydantic import BaseModel, BeforeValidator, ValidationError
+
+
+def _clip(length: int):
+    return BeforeValidator(lambda value: str(value).strip()[:length])
+
+
+def _first(count: int):
+    return BeforeValidator(lambda value: list(value)[:count] if isinstance(value, (list, tuple)) else [value])
+
+
+def _lower(value):
+    return str(value).strip().lower()
+
+
+def _title(value):
+    return str(value).strip().capitalize()
+
+
+Text = Annotated[str, _clip(160)]
+Rating = Annotated[Literal["Buy", "Hold", "Sell"], BeforeValidator(_title)]
+
+
+class KeyLevels(BaseModel):
+    support: Annotated[list[float], _first(3)] = []
+    resistance: Annotated[list[float], _first(3)] = []
+
+
+class TechnicalDigest(BaseModel):
+    trend: Annotated[Literal["uptrend", "downtrend", "sideways"], BeforeValidator(_lower)]
+    momentum: Text = ""
+    key_levels: KeyLevels = KeyLevels()
+    signals: Annotated[list[Text], _first(4)] = []
+    risks: Annotated[list[Text], _first(3)] = []
+
+
+class FundamentalDigest(BaseModel):
+    valuation: Annotated[Literal["undervalued", "fair", "overvalued"], BeforeValidator(_lower)]
+    valuation_note: Text = ""
+    growth: Annotated[Literal["accelerating", "stable", "decelerating"], BeforeValidator(_lower)]
+    analyst_consensus: Text = ""
+    catalysts: Annotated[list[Text], _first(3)] = []
+    risks: Annotated[list[Text], _first(3)] = []
+
+
+class Verdict(BaseModel):
+    rating: Rating
+    reason: Text = ""
+
+
+class SummaryDigest(BaseModel):
+    recommendation: Rating
+    short_term: Verdict
+    long_term: Verdict
+    key_points: Annotated[list[Text], _first(4)] = []
+
+
+# agent name -> (output_key with the full answer, hand-off key, digest schema)
+HANDOFFS = {
+    "technical_analysis_agent": ("technical_report", "technical_handoff", TechnicalDigest),
+    "fundamental_analysis_agent": ("fundamental_report", "fundamental_handoff", FundamentalDigest),
+    "summary_recommendation_agent": ("summary_report", "summary_handoff", SummaryDigest),
+}
+
+_DIGEST_RE = re.compile(r"\s*<digest>(.*?)</digest>\s*", re.S)
+_SCRATCHPAD_RE = re.compile(r"<scratchpad>.*?</scratchpad>\s*", re.S)
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+# how ADK opens a quoted answer of another agent in a model request
+_QUOTED_AGENT_MARKERS = ("For context:", "<<<BEGIN_QUOTED_AGENT_CONTENT>>>")
+
+
+def parse_digest(text: str, schema: type[BaseModel]) -> Optional[BaseModel]:
+    """The last <digest> block in `text` validated against `schema`, or None."""
+    blocks = _DIGEST_RE.findall(text or "")
+    if not blocks:
+        return None
+    try:
+        return schema.model_validate_json(_FENCE_RE.sub("", blocks[-1].strip()))
+    except (ValidationError, ValueError):
+        return None
+
+
+def strip_digest(text: str) -> str:
+    """`text` without its <digest> blocks, for the report."""
+    return _DIGEST_RE.sub("\n\n", text or "").strip() + "\n\n"
+
+
+def handoff(agent: str, text: str) -> str:
+    """What the next agents get from `agent`'s answer: its digest as compact JSON, else the answer itself."""
+    digest = parse_digest(text, HANDOFFS[agent][2])
+    if digest is not None:
+        return digest.model_dump_json()
+    return _SCRATCHPAD_RE.sub("", strip_digest(text)).strip()
+
+
+def handoff_state(agent: str, text: Optional[str]) -> dict:
+    """Session state holding `agent`'s hand-off; empty for agents without one or without an answer."""
+    if agent not in HANDOFFS or not text:
+        return {}
+    return {HANDOFFS[agent][1]: handoff(agent, text)}
+
+
+async def handoff_aac(callback_context: CallbackContext) -> Optional[types.Content]:
+    """After-agent callback storing the agent's hand-off (see handoff) in state."""
+    agent = callback_context.agent_name
+    state = callback_context.state
+    text = state.get(HANDOFFS[agent][0]) if agent in HANDOFFS else None
+    if text and parse_digest(text, HANDOFFS[agent][2]) is None:
+        print(f"{agent} gave no valid digest for {state.get('ticker')}; handing over its full answer")
+    state.update(handoff_state(agent, text))
+    return None
+
+
+async def handoff_bmc(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """
+    Before-model callback removing other agents' answers from the request.
+
+    Keeps the agent's own instruction and the user's message. Must run before the
+    cache and trace callbacks, which key on and measure the request.
+    """
+    contents = [
+        content for content in llm_request.contents
+        if content.role != "user" or not any(
+            part.text and part.text.lstrip().startswith(_QUOTED_AGENT_MARKERS) for part in content.parts or [])
+    ]
+    llm_request.contents = contents or [types.Content(role="user", parts=[types.Part(text="BEGIN")])]
+    return None
@@ -0,0 +1,265 @@
+"""
+Hedged, deadline-aware model calls.
+
+After the parallel stage the workflow is sequential, so one slow response holds up
+the whole ticker. `hedged(model, agent_name)` wraps an agent's model so that each
+call, per the agent's entry in HEDGE_POLICIES:
+
+- gives up with ModelDeadlineExceeded once the deadline has passed;
+- sends a duplicate request when the first response has not arrived after the
+  policy's percentile of the model's recent latencies (`hedge_after` seconds until
+  enough calls were seen), and keeps whichever answers first;
+- retries rate-limited (429) requests with full-jitter exponential backoff.
+
+For a streamed response the race is on the first chunk. Duplicates and retries wait
+for the provider's rate limiter like every other call. `print_hedge_stats` reports
+hedge rate, hedge wins, retries, deadline misses and the latency hedging saved: a
+lower bound taken at each hedge win (the beaten request had already run that much
+longer than the one that won), and, with HEDGE_MEASURE_LOSERS=1, the measured saving.
+"""
+import asyncio
+import collections
+import os
+import random
+import time
+from typing import AsyncGenerator, Optional, Union
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.models.registry import LLMRegistry
+
+from tools.ratelimit import get_limiter, provider_for_model
+from tools.tracing import percentile
+
+# Per agent: deadline for a whole call in seconds, the latency percentile after which
+# a duplicate is sent (None: never hedge) and the hedge delay until there is history.
+HEDGE_POLICIES = {
+    "technical_analysis_agent": {"deadline": 180.0, "hedge_percentile": None},
+    "fundamental_analysis_agent": {"deadline": 300.0, "hedge_percentile": 90, "hedge_after": 60.0},
+    "sector_research_agent": {"deadline": 300.0, "hedge_percentile": 90, "hedge_after": 60.0},
+    "summary_recommendation_agent": {"deadline": 180.0, "hedge_percentile": None},
+    "visualization_agent": {"deadline": 300.0, "hedge_percentile": 90, "hedge_after": 90.0},
+}
+
+_settings = {
+    "enabled": os.environ.get("MODEL_HEDGING", "on") != "off",
+    "max_retries": 4,
+    "backoff_base": 2.0,
+    "backoff_cap": 30.0,
+    # latencies needed before the percentile replaces hedge_after
+    "min_samples": 20,
+    "window": 200,
+    # let the request a hedge beat finish in the background to measure the latency saved
+    "measure_losers": os.environ.get("HEDGE_MEASURE_LOSERS") == "1",
+}
+
+_latencies: dict[str, collections.deque] = {}
+_stats: dict[str, dict] = {}
+_background: set = set()
+
+
+class ModelDeadlineExceeded(TimeoutError):
+    """A model call did not finish within its agent's deadline."""
+
+
+def configure_hedging(**settings) -> None:
+    """Overrides hedging settings (enabled, max_retries, backoff_base, ...); None leaves a setting unchanged."""
+    for name, value in settings.items():
+        if name not in _settings:
+            raise ValueError(f"Unknown hedging setting {name!r}")
+        if value is not None:
+            _settings[name] = value
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    # google-genai errors carry the HTTP status on `code`, litellm's on `status_code`
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "status_code", None)
+    return status == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def hedge_delay(model: str, policy: dict) -> Optional[float]:
+    """Seconds to wait for the first response before hedging, or None to never hedge."""
+    if not _settings["enabled"] or policy.get("hedge_percentile") is None:
+        return None
+    samples = _latencies.get(model)
+    if samples is None or len(samples) < _settings["min_samples"]:
+        return policy.get("hedge_after")
+    return percentile(list(samples), policy["hedge_percentile"])
+
+
+def _record_latency(model: str, seconds: float) -> None:
+    _latencies.setdefault(model, collections.deque(maxlen=_settings["window"])).append(seconds)
+
+
+def _copy_request(llm_request: LlmRequest) -> LlmRequest:
+    """A copy the model may edit in place; tools are shared, as models only read them."""
+    return llm_request.model_copy(update={
+        "contents": [content.model_copy(deep=True) for content in llm_request.contents],
+        "config": llm_request.config.model_copy(deep=True),
+    })
+
+
+class HedgedLlm(BaseLlm):
+    """Wraps `inner` with the deadline, hedging and retries of HEDGE_POLICIES[agent]."""
+
+    inner: BaseLlm
+    agent: str
+
+    @property
+    def capabilities(self):
+        return self.inner.capabilities
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        if not _settings["enabled"]:
+            async for llm_response in self.inner.generate_content_async(llm_request, stream):
+                yield llm_response
+            return
+
+        policy = HEDGE_POLICIES.get(self.agent, {})
+        stats = _stats.setdefault(self.agent, {"calls": 0, "hedged": 0, "hedge_won": 0, "retries": 0,
+                                               "deadline_missed": 0, "saved_min": 0.0, "saved": 0.0, "measured": 0})
+        stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + policy["deadline"] if policy.get("deadline") else None
+
+        agen = None
+        try:
+            async with asyncio.timeout_at(deadline_at):
+                first, agen = await self._first_response(llm_request, stream, policy, stats)
+            if agen is None:
+                return
+            yield first
+            while True:
+                async with asyncio.timeout_at(deadline_at):
+                    try:
+                        llm_response = await agen.__anext__()
+                    except StopAsyncIteration:
+                        break
+                yield llm_response
+        except TimeoutError:
+            if deadline_at is None or loop.time() < deadline_at:
+                raise
+            stats["deadline_missed"] += 1
+            raise ModelDeadlineExceeded(
+                f"{self.agent}: no answer from {llm_request.model} within {policy['deadline']:.0f}s") from None
+        finally:
+            if agen is not None:
+                await agen.aclose()
+
+    async def _first_response(self, llm_request: LlmRequest, stream: bool, policy: dict, stats: dict):
+        """The first response and the rest of its stream, retrying rate-limited requests."""
+        for attempt in range(_settings["max_retries"] + 1):
+            if attempt:
+                await get_limiter(provider_for_model(llm_request.model)).acquire()
+            try:
+                return await self._race(llm_request, stream, policy, stats)
+            except Exception as error:
+                if not is_rate_limited(error) or attempt == _settings["max_retries"]:
+                    raise
+                stats["retries"] += 1
+                backoff = min(_settings["backoff_cap"], _settings["backoff_base"] * 2 ** attempt)
+                await asyncio.sleep(random.uniform(0, backoff))
+
+    async def _attempt(self, llm_request: LlmRequest, stream: bool):
+        started = time.perf_counter()
+        agen = self.inner.generate_content_async(_copy_request(llm_request), stream)
+        try:
+            first = await agen.__anext__()
+        except StopAsyncIteration:
+            await agen.aclose()
+            return None, None, time.perf_counter() - started
+        except BaseException:
+            await agen.aclose()
+            raise
+        return first, agen, time.perf_counter() - started
+
+    async def _race(self, llm_request: LlmRequest, stream: bool, policy: dict, stats: dict):
+        """Runs the request, plus a duplicate if it is slower than the hedge delay; returns the first to answer."""
+        model = llm_request.model
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._attempt(llm_request, stream))
+        attempts, winner = [primary], None
+        try:
+            await asyncio.wait([primary], timeout=hedge_delay(model, policy))
+            if not primary.done():
+                await get_limiter(provider_for_model(model)).acquire()
+                if not primary.done():
+                    stats["hedged"] += 1
+                    attempts.append(asyncio.ensure_future(self._attempt(llm_request, stream)))
+
+            pending, error = set(attempts), None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=attempts.index):
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        error = error or task.exception()
+            if winner is None:
+                raise error
+
+            first, agen, elapsed = winner.result()
+            _record_latency(model, elapsed)
+            if winner is not primary:
+                stats["hedge_won"] += 1
+                # the primary has not answered after running this much longer than the hedge took
+                stats["saved_min"] += max(0.0, time.perf_counter() - started - elapsed)
+                if _settings["measure_losers"] and not primary.done():
+                    task = asyncio.ensure_future(_finish_loser(primary, time.perf_counter() - started, stats))
+                    _background.add(task)
+                    task.add_done_callback(_background.discard)
+                    attempts.remove(primary)
+                elif not primary.done():
+                    _record_latency(model, time.perf_counter() - started)  # lower bound of the straggler
+            return first, agen
+        finally:
+            for task in attempts:
+                if task is not winner:
+                    await _discard(task)
+
+
+async def _discard(task: asyncio.Future) -> None:
+    """Cancels an attempt that lost the race, or closes its stream if it had already answered."""
+    if not task.done():
+        task.cancel()
+    try:
+        _, agen, _ = await task
+    except BaseException:
+        return
+    if agen is not None:
+        await agen.aclose()
+
+
+async def _finish_loser(task: asyncio.Future, won_at: float, stats: dict) -> None:
+    try:
+        _, agen, elapsed = await task
+    except Exception:
+        return
+    if agen is not None:
+        await agen.aclose()
+    stats["saved"] += max(0.0, elapsed - won_at)
+    stats["measured"] += 1
+
+
+def hedged(model: Union[str, BaseLlm], agent: str) -> HedgedLlm:
+    """Wraps a model name or instance for `agent`; its name stays the inner model's."""
+    inner = LLMRegistry.new_llm(model) if isinstance(model, str) else model
+    return HedgedLlm(model=inner.model, inner=inner, agent=agent)
+
+
+def hedge_stats() -> dict[str, dict]:
+    """Counters per agent since the process started."""
+    return {agent: dict(stats) for agent, stats in _stats.items()}
+
+
+def print_hedge_stats() -> None:
+    stats = {agent: s for agent, s in hedge_stats().items() if s["calls"]}
+    if not stats:
+        return
+    print(f"\n{'model calls':<32}{'calls':>7}{'hedged':>8}{'hedge won':>11}{'retries':>9}{'deadline':>10}"
+          f"{'saved >= s':>12}{'saved s':>9}")
+    for agent, s in stats.items():
+        saved = f"{s['saved']:.1f}" if s["measured"] else "-"
+        print(f"{agent:<32}{s['calls']:>7}{s['hedged'] / s['calls']:>8.0%}{s['hedge_won']:>11}"
+              f"{s['retries']:>9}{s['deadline_missed']:>10}{s['saved_min']:>12.1f}{saved:>9}")
@@ -0,0 +1,129 @@
+"""
+Shrinks chart images before they are attached to a model request.
+
+The chart written to outputs/ and the chart cache keep full resolution; the model
+gets a copy that is cropped to the panels it needs, trimmed of figure margins,
+scaled down and re-encoded. Settings are read from the LLM_CHART_* env vars and can
+be overridden with `configure_image_pipeline`.
+"""
+import io
+import json
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+IMAGE_FORMATS = ("png", "webp", "jpeg", "original")
+
+MIME_TYPES = {"png": "image/png", "webp": "image/webp", "jpeg": "image/jpeg"}
+
+_settings = {
+    # "original" attaches the rendered PNG untouched
+    "format": os.environ.get("LLM_CHART_FORMAT", "png"),
+    "max_width": int(os.environ.get("LLM_CHART_WIDTH", 1000)),
+    "quality": int(os.environ.get("LLM_CHART_QUALITY", 80)),
+    # palette size for png; 0 keeps full colour
+    "colors": int(os.environ.get("LLM_CHART_COLORS", 32)),
+    "trim": True,
+    # chart panels to keep, from the panel bands render_chart_png embeds; None keeps all
+    "panels": None,
+}
+
+
+def configure_image_pipeline(**settings) -> None:
+    """Overrides pipeline settings (format, max_width, quality, colors, trim, panels); None leaves a setting unchanged."""
+    for name, value in settings.items():
+        if name not in _settings:
+            raise ValueError(f"Unknown image pipeline setting {name!r}")
+        if name == "format" and value is not None and value not in IMAGE_FORMATS:
+            raise ValueError(f"Image format must be one of {IMAGE_FORMATS}, got {value!r}")
+        if value is not None:
+            _settings[name] = value
+
+
+def pipeline_settings() -> dict:
+    return dict(_settings)
+
+
+def _drop_panels(image: "Image.Image", keep: list[str]) -> "Image.Image":
+    from PIL import Image
+
+    bands = json.loads(image.info.get("Panels", "{}"))
+    if not bands:
+        return image
+    height = image.height
+    dropped = sorted((int(top * height), int(bottom * height)) for name, (top, bottom) in bands.items() if name not in keep)
+    if not dropped:
+        return image
+
+    pieces, cursor = [], 0
+    for top, bottom in dropped:
+        if top > cursor:
+            pieces.append(image.crop((0, cursor, image.width, top)))
+        cursor = max(cursor, bottom)
+    if cursor < height:
+        pieces.append(image.crop((0, cursor, image.width, height)))
+
+    out = Image.new(image.mode, (image.width, sum(p.height for p in pieces)))
+    y = 0
+    for piece in pieces:
+        out.paste(piece, (0, y))
+        y += piece.height
+    return out
+
+
+def _trim(image: "Image.Image", pad: int = 8) -> "Image.Image":
+    """Crops the uniform figure margin, keeping `pad` pixels around the content."""
+    from PIL import Image, ImageChops
+
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    box = ImageChops.difference(image, background).getbbox()
+    if box is None:
+        return image
+    left, top, right, bottom = box
+    return image.crop((max(0, left - pad), max(0, top - pad), min(image.width, right + pad), min(image.height, bottom + pad)))
+
+
+def prepare_chart(png_bytes: bytes, settings: Optional[dict] = None) -> tuple[bytes, str]:
+    """
+    Runs a rendered chart through the pipeline.
+
+    Args:
+        png_bytes: The chart as rendered by render_chart_png.
+        settings: Overrides for the configured settings.
+
+    Returns:
+        (image bytes, mime type) to attach to the model request.
+    """
+    settings = {**_settings, **(settings or {})}
+    if settings["format"] == "original":
+        return png_bytes, MIME_TYPES["png"]
+
+    # Pillow is imported on the first chart, not when main starts
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(png_bytes))
+    image.load()
+    info = dict(image.info)
+    image = image.convert("RGB")
+    image.info = info
+
+    if settings["panels"]:
+        image = _drop_panels(image, settings["panels"])
+    if settings["trim"]:
+        image = _trim(image)
+    if settings["max_width"] and image.width > settings["max_width"]:
+        height = round(image.height * settings["max_width"] / image.width)
+        image = image.resize((settings["max_width"], height), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    if settings["format"] == "png":
+        if settings["colors"]:
+            image = image.quantize(colors=settings["colors"], method=Image.Quantize.MEDIANCUT)
+        image.save(buffer, format="PNG", optimize=True)
+    elif settings["format"] == "webp":
+        image.save(buffer, format="WEBP", quality=settings["quality"], method=4)
+    else:
+        image.save(buffer, format="JPEG", quality=settings["quality"], optimize=True)
+    return buffer.getvalue(), MIME_TYPES[settings["format"]]
@@ -0,0 +1,110 @@
+"""
+Writes the posters returned by the visualization agent.
+
+The model already returns an encoded PNG or JPEG, so `save_poster` writes those bytes
+to outputs/ as they are, from a worker thread: hashing and writing a multi-megabyte
+poster never holds up the event loop the other sessions run on. Files are named
+after a hash of their content, so several images in one response, or a rerun that
+draws a different poster, never overwrite each other.
+
+Optional derivatives (a small WebP thumbnail and/or a full-size WebP copy) are made
+in the render process pool; `drain_derivatives` waits for the ones still running.
+"""
+import asyncio
+import hashlib
+import os
+from typing import Optional
+
+EXTENSIONS = {"image/png": "png", "image/jpeg": "jpeg", "image/webp": "webp"}
+
+DERIVATIVES = ("thumb", "webp")
+
+_settings = {
+    "output_dir": "outputs",
+    # comma-separated DERIVATIVES to make for every poster; empty makes none
+    "derivatives": [d for d in os.environ.get("POSTER_DERIVATIVES", "").split(",") if d],
+    "thumb_width": int(os.environ.get("POSTER_THUMB_WIDTH", 320)),
+    "quality": int(os.environ.get("POSTER_QUALITY", 80)),
+}
+
+_pending: list[asyncio.Future] = []
+
+
+def configure_image_sink(output_dir: Optional[str] = None, derivatives: Optional[list[str]] = None,
+                         thumb_width: Optional[int] = None, quality: Optional[int] = None) -> None:
+    """Overrides where posters go and which derivatives are made; None leaves a setting unchanged."""
+    for name in derivatives or []:
+        if name not in DERIVATIVES:
+            raise ValueError(f"Poster derivatives must be among {DERIVATIVES}, got {name!r}")
+    for name, value in (("output_dir", output_dir), ("derivatives", derivatives),
+                        ("thumb_width", thumb_width), ("quality", quality)):
+        if value is not None:
+            _settings[name] = value
+
+
+def poster_name(ticker: str, data: bytes, mime_type: Optional[str]) -> str:
+    """`{TICKER}_output_{hash}.{ext}`, from the first 12 hex digits of the bytes' sha256."""
+    extension = EXTENSIONS.get(mime_type or "", "png")
+    return f"{ticker}_output_{hashlib.sha256(data).hexdigest()[:12]}.{extension}"
+
+
+def write_poster(ticker: str, data: bytes, mime_type: Optional[str]) -> str:
+    """Writes a poster's encoded bytes unchanged, unless the same poster is already there. Returns its file name."""
+    name = poster_name(ticker, data, mime_type)
+    path = os.path.join(_settings["output_dir"], name)
+    if not os.path.exists(path):
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+    return name
+
+
+async def save_poster(ticker: str, data: bytes, mime_type: Optional[str]) -> str:
+    """
+    Writes a poster off the event loop and schedules its derivatives.
+
+    Returns:
+        The file name under the output directory.
+    """
+    name = await asyncio.to_thread(write_poster, ticker, data, mime_type)
+    if _settings["derivatives"]:
+        _submit(os.path.join(_settings["output_dir"], name))
+    return name
+
+
+def make_derivatives(path: str, derivatives: list[str], thumb_width: int, quality: int) -> list[str]:
+    """Writes the requested derivatives next to `path`; runs in a pool worker. Returns their paths."""
+    from PIL import Image
+
+    stem = os.path.splitext(path)[0]
+    written = []
+    with Image.open(path) as image:
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for derivative in derivatives:
+            if derivative == "thumb":
+                target, out = f"{stem}_thumb.webp", image.copy()
+                out.thumbnail((thumb_width, thumb_width * 4))
+            else:
+                target, out = f"{stem}.webp", image
+            if not os.path.exists(target):
+                out.save(f"{target}.tmp", format="WEBP", quality=quality, method=4)
+                os.replace(f"{target}.tmp", target)
+            written.append(target)
+    return written
+
+
+def _submit(path: str) -> None:
+    from tools.chartrender import render_in_pool
+
+    _pending.append(asyncio.ensure_future(render_in_pool(
+        make_derivatives, path, list(_settings["derivatives"]), _settings["thumb_width"], _settings["quality"])))
+
+
+async def drain_derivatives() -> None:
+    """Waits for the derivatives still being made; a failed one is reported, not raised."""
+    while _pending:
+        batch = list(_pending)
+        _pending.clear()
+        for result in await asyncio.gather(*batch, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"Poster derivative failed: {result}")
@@ -0,0 +1,340 @@
+"""
+Vectorized technical indicators over a panel of tickers.
+
+Every function takes 2-D float arrays shaped (n_tickers, n_bars), oldest bar first,
+and returns arrays of the same shape. Series shorter than the panel are left-padded
+with NaN; an indicator is NaN until its warm-up window is complete. 1-D inputs are
+treated as a single-ticker panel.
+
+Recursive indicators (EMA, Wilder RSI, ATR) are computed with one pass over the time
+axis that updates all tickers at once, so the cost is O(n_bars) NumPy calls regardless
+of how many tickers are in the panel. IndicatorState carries the same recursions
+forward one bar at a time for incremental updates.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _as_panel(x) -> np.ndarray:
+    x = np.asarray(x, dtype="f8")
+    return x[np.newaxis, :] if x.ndim == 1 else x
+
+
+def _shift(x: np.ndarray) -> np.ndarray:
+    """Previous bar's value along the time axis (NaN for the first bar)."""
+    out = np.full_like(x, np.nan)
+    out[:, 1:] = x[:, :-1]
+    return out
+
+
+def sma(x, window: int) -> np.ndarray:
+    """Simple moving average; NaN where the window holds fewer than `window` valid bars."""
+    x = _as_panel(x)
+    valid = ~np.isnan(x)
+    csum = np.cumsum(np.where(valid, x, 0.0), axis=1)
+    ccount = np.cumsum(valid, axis=1)
+    total = csum.copy()
+    count = ccount.copy()
+    total[:, window:] -= csum[:, :-window]
+    count[:, window:] -= ccount[:, :-window]
+    return np.where(count == window, total / window, np.nan)
+
+
+def rolling_std(x, window: int, ddof: int = 0) -> np.ndarray:
+    """
+    Rolling standard deviation over complete windows.
+
+    Uses running sums of the row-centred series, so it stays O(n_bars) per ticker;
+    centring keeps the E[x^2] - E[x]^2 cancellation error negligible for price data.
+    """
+    x = _as_panel(x)
+    with np.errstate(invalid="ignore"):
+        centred = x - np.nanmean(x, axis=1, keepdims=True)
+    mean = sma(centred, window)
+    mean_sq = sma(centred ** 2, window)
+    variance = np.maximum(mean_sq - mean ** 2, 0.0) * window / (window - ddof)
+    return np.sqrt(variance)
+
+
+def _recursive_mean(x: np.ndarray, alpha: float, seed_window: int) -> np.ndarray:
+    """
+    Exponential smoothing `s = s + alpha * (x - s)` seeded with the mean of the first
+    `seed_window` valid values of each row. NaN inputs leave the state untouched.
+    """
+    n_rows, n_bars = x.shape
+    # iterate over a time-major copy so each step touches contiguous memory
+    x = np.ascontiguousarray(x.T)
+    out = np.empty_like(x)
+    state = np.full(n_rows, np.nan)
+    acc = np.zeros(n_rows)
+    seen = np.zeros(n_rows, dtype=np.int64)
+    for t in range(n_bars):
+        value = x[t]
+        valid = ~np.isnan(value)
+        seen += valid
+        warming = valid & (seen <= seed_window)
+        if warming.any():
+            acc[warming] += value[warming]
+            seeded = warming & (seen == seed_window)
+            state[seeded] = acc[seeded] / seed_window
+        running = valid & (seen > seed_window)
+        state = np.where(running, state + alpha * (value - state), state)
+        out[t] = state
+    return out.T
+
+
+def ema(x, span: int) -> np.ndarray:
+    """Exponential moving average (alpha = 2 / (span + 1)), seeded with the SMA of the first `span` bars."""
+    return _recursive_mean(_as_panel(x), 2.0 / (span + 1), span)
+
+
+def wilder(x, period: int) -> np.ndarray:
+    """Wilder's smoothing (alpha = 1 / period), seeded with the SMA of the first `period` bars."""
+    return _recursive_mean(_as_panel(x), 1.0 / period, period)
+
+
+def _rsi_from_averages(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    """Relative Strength Index with Wilder smoothing."""
+    close = _as_panel(close)
+    delta = close - _shift(close)
+    avg_gain = wilder(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0)), period)
+    avg_loss = wilder(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0)), period)
+    return np.where(np.isnan(avg_gain), np.nan, _rsi_from_averages(avg_gain, avg_loss))
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns (macd_line, signal_line, histogram)."""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, window: int = 20, num_std: float = 2.0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns (middle, upper, lower) bands using the population standard deviation."""
+    mid = sma(close, window)
+    width = num_std * rolling_std(close, window)
+    return mid, mid + width, mid - width
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """True range; the first bar of each series falls back to high - low."""
+    high, low, close = _as_panel(high), _as_panel(low), _as_panel(close)
+    prev_close = _shift(close)
+    span = high - low
+    tr = np.fmax(span, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return np.where(np.isnan(span), np.nan, tr)
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """Average True Range with Wilder smoothing."""
+    return wilder(true_range(high, low, close), period)
+
+
+def compute_indicators(close, high=None, low=None) -> dict[str, np.ndarray]:
+    """
+    Computes the standard indicator set for a panel.
+
+    Returns:
+        A dict of (n_tickers, n_bars) arrays keyed SMA_50, SMA_200, EMA_21, RSI, MACD,
+        MACD_signal, MACD_hist, BB_mid, BB_upper, BB_lower and, when high/low are given, ATR.
+    """
+    close = _as_panel(close)
+    line, signal_line, hist = macd(close)
+    bb_mid, bb_upper, bb_lower = bollinger(close)
+    out = {
+        "SMA_50": sma(close, 50),
+        "SMA_200": sma(close, 200),
+        "EMA_21": ema(close, 21),
+        "RSI": rsi(close),
+        "MACD": line,
+        "MACD_signal": signal_line,
+        "MACD_hist": hist,
+        "BB_mid": bb_mid,
+        "BB_upper": bb_upper,
+        "BB_lower": bb_lower,
+    }
+    if high is not None and low is not None:
+        out["ATR"] = atr(high, low, close)
+    return out
+
+
+def add_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds the SMA_50, SMA_200 and RSI columns used by the charts to a single-ticker OHLCV frame."""
+    close = df["Close"].to_numpy(dtype="f8")
+    df["SMA_50"] = sma(close, 50)[0]
+    df["SMA_200"] = sma(close, 200)[0]
+    df["RSI"] = rsi(close)[0]
+    return df
+
+
+def on_own_bars(func, x) -> np.ndarray:
+    """
+    Applies a panel function to each row's own bars, skipping its NaN gaps.
+
+    A date-aligned panel has NaN wherever a ticker did not trade (a holiday of its
+    exchange, a halt), and a windowed indicator over such a row is NaN for a whole
+    window after every gap. The valid bars of each row are right-aligned into a
+    gap-free panel, `func` is applied to it, and the results are put back on the
+    row's dates (NaN on its gaps).
+    """
+    x = _as_panel(x)
+    valid = ~np.isnan(x)
+    counts = valid.sum(axis=1)
+    width = int(counts.max()) if len(counts) else 0
+    rows, cols = np.nonzero(valid)
+    packed = width - counts[rows] + np.cumsum(valid, axis=1)[rows, cols] - 1
+    compact = np.full((x.shape[0], width), np.nan)
+    compact[rows, packed] = x[rows, cols]
+    out = np.full(x.shape, np.nan)
+    out[rows, cols] = func(compact)[rows, packed]
+    return out
+
+
+def frames_to_panel(frames: dict[str, pd.DataFrame], columns=("Open", "High", "Low", "Close", "Volume")
+                    ) -> tuple[list[str], pd.DatetimeIndex, dict[str, np.ndarray]]:
+    """
+    Date-aligns per-ticker OHLCV frames into 2-D arrays.
+
+    Bars are aligned on their exchange-local wall-clock timestamp, so daily bars from
+    different exchanges line up by date. Missing bars are NaN.
+
+    Returns:
+        (tickers, index, arrays) where arrays[column] has shape (len(tickers), len(index)).
+    """
+    tickers = list(frames)
+    local = {t: df.index.tz_localize(None) if df.index.tz is not None else df.index for t, df in frames.items()}
+    index = pd.DatetimeIndex([])
+    for dates in local.values():
+        index = index.union(dates)
+    arrays = {c: np.full((len(tickers), len(index)), np.nan) for c in columns}
+    for row, ticker in enumerate(tickers):
+        positions = index.get_indexer(local[ticker])
+        for c in columns:
+            arrays[c][row, positions] = frames[ticker][c].to_numpy(dtype="f8")
+    return tickers, index, arrays
+
+
+class IndicatorState:
+    """
+    Rolling state for incremental, O(1)-per-ticker indicator updates.
+
+    Build it once from history with `from_history`, then call `update` with the newest
+    bar for every ticker (1-D arrays, NaN for tickers without a new bar). Moving averages
+    keep a ring buffer plus running sums, and the recursive indicators keep their last
+    smoothed value, so the values returned match what the batch functions would produce
+    for the extended series.
+    """
+
+    def __init__(self, n_tickers: int, sma_windows=(50, 200), ema_span: int = 21,
+                 rsi_period: int = 14, atr_period: int = 14, bb_window: int = 20):
+        self.sma_windows = tuple(sma_windows)
+        self.ema_span = ema_span
+        self.rsi_period = rsi_period
+        self.atr_period = atr_period
+        self.bb_window = bb_window
+        windows = set(self.sma_windows) | {bb_window}
+        self.buffers = {w: np.full((n_tickers, w), np.nan) for w in windows}
+        self.cursor = {w: np.zeros(n_tickers, dtype=np.int64) for w in windows}
+        self.sums = {w: np.zeros(n_tickers) for w in windows}
+        self.counts = {w: np.zeros(n_tickers, dtype=np.int64) for w in windows}
+        self.sumsq = np.zeros(n_tickers)
+        self.ema = {span: np.full(n_tickers, np.nan) for span in {ema_span, 12, 26}}
+        self.macd_signal = np.full(n_tickers, np.nan)
+        self.avg_gain = np.full(n_tickers, np.nan)
+        self.avg_loss = np.full(n_tickers, np.nan)
+        self.atr = np.full(n_tickers, np.nan)
+        self.prev_close = np.full(n_tickers, np.nan)
+
+    @classmethod
+    def from_history(cls, close, high=None, low=None, **kwargs) -> "IndicatorState":
+        """Seeds the state from a full (n_tickers, n_bars) history."""
+        close = _as_panel(close)
+        state = cls(close.shape[0], **kwargs)
+        for w, buf in state.buffers.items():
+            if close.shape[1] >= w:
+                buf[:] = close[:, -w:]
+            else:
+                buf[:, w - close.shape[1]:] = close
+            state.sums[w] = np.nansum(buf, axis=1)
+            state.counts[w] = np.sum(~np.isnan(buf), axis=1)
+        state.sumsq = np.nansum(state.buffers[state.bb_window] ** 2, axis=1)
+        for span in state.ema:
+            state.ema[span] = ema(close, span)[:, -1]
+        state.macd_signal = ema(ema(close, 12) - ema(close, 26), 9)[:, -1]
+        delta = close - _shift(close)
+        state.avg_gain = wilder(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0)), state.rsi_period)[:, -1]
+        state.avg_loss = wilder(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0)), state.rsi_period)[:, -1]
+        if high is not None and low is not None:
+            state.atr = atr(high, low, close, state.atr_period)[:, -1]
+        state.prev_close = close[:, -1].copy()
+        return state
+
+    def update(self, close, high=None, low=None) -> dict[str, np.ndarray]:
+        """
+        Folds one new bar per ticker into the state.
+
+        Rows with a NaN close keep their state. Recursions that are not seeded yet stay
+        NaN; rebuild such rows with from_history once they have enough bars.
+
+        Returns:
+            The latest value of each indicator, as 1-D arrays of length n_tickers.
+        """
+        close = np.asarray(close, dtype="f8")
+        rows = np.flatnonzero(~np.isnan(close))
+        value = close[rows]
+
+        for w, buf in self.buffers.items():
+            slot = self.cursor[w][rows]
+            old = buf[rows, slot]
+            old_valid = ~np.isnan(old)
+            self.sums[w][rows] += value - np.where(old_valid, old, 0.0)
+            self.counts[w][rows] += 1 - old_valid
+            if w == self.bb_window:
+                self.sumsq[rows] += value ** 2 - np.where(old_valid, old, 0.0) ** 2
+            buf[rows, slot] = value
+            self.cursor[w][rows] = (slot + 1) % w
+
+        for span, current in self.ema.items():
+            current[rows] += 2.0 / (span + 1) * (value - current[rows])
+        line = self.ema[12][rows] - self.ema[26][rows]
+        self.macd_signal[rows] += 0.2 * (line - self.macd_signal[rows])
+
+        delta = value - self.prev_close[rows]
+        k = 1.0 / self.rsi_period
+        self.avg_gain[rows] += k * (np.maximum(delta, 0.0) - self.avg_gain[rows])
+        self.avg_loss[rows] += k * (np.maximum(-delta, 0.0) - self.avg_loss[rows])
+
+        if high is not None and low is not None:
+            high = np.asarray(high, dtype="f8")[rows]
+            low = np.asarray(low, dtype="f8")[rows]
+            prev = self.prev_close[rows]
+            tr = np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+            self.atr[rows] += (tr - self.atr[rows]) / self.atr_period
+
+        self.prev_close[rows] = value
+        return self.latest()
+
+    def _window_mean(self, w: int) -> np.ndarray:
+        return np.where(self.counts[w] == w, self.sums[w] / w, np.nan)
+
+    def latest(self) -> dict[str, np.ndarray]:
+        """The current value of every indicator, as 1-D arrays of length n_tickers."""
+        out = {f"SMA_{w}": self._window_mean(w) for w in self.sma_windows}
+        out[f"EMA_{self.ema_span}"] = self.ema[self.ema_span].copy()
+        line = self.ema[12] - self.ema[26]
+        out["MACD"] = line
+        out["MACD_signal"] = self.macd_signal.copy()
+        out["MACD_hist"] = line - self.macd_signal
+        out["RSI"] = np.where(np.isnan(self.avg_gain), np.nan, _rsi_from_averages(self.avg_gain, self.avg_loss))
+        mid = self._window_mean(self.bb_window)
+        variance = np.maximum(self.sumsq / self.bb_window - mid ** 2, 0.0)
+        width = 2.0 * np.sqrt(variance)
+        out["BB_mid"], out["BB_upper"], out["BB_lower"] = mid, mid + width, mid - width
+        out["ATR"] = self.atr.copy()
+        return out
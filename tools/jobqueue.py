@@ -0,0 +1,82 @@
+"""
+Directory job queue for the resident worker (`python main.py --serve`).
+
+A job is a JSON file holding the main.py arguments of one batch. It is written to
+`{root}/incoming/` and claimed by renaming it into `running/`, which is atomic on one
+filesystem, so a job is never picked up twice. Finished jobs move to `done/` (or
+`failed/`) with their per-ticker results. Submitting only writes a file, so the cron
+side does not pay for importing the agent stack:
+
+    python -m tools.jobqueue NBIS AAPL --fresh
+"""
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+QUEUE_STATES = ("incoming", "running", "done", "failed")
+
+
+class JobQueue:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.environ.get("JOB_QUEUE_DIR", "data/queue")
+        for state in QUEUE_STATES:
+            os.makedirs(os.path.join(self.root, state), exist_ok=True)
+
+    def _path(self, state: str, job_id: str) -> str:
+        return os.path.join(self.root, state, f"{job_id}.json")
+
+    def submit(self, argv: list[str]) -> str:
+        """Queues a batch given as main.py arguments; returns the job id."""
+        job_id = f"{time.time_ns()}-{os.getpid()}"
+        path = self._path("incoming", job_id)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"argv": list(argv), "submitted": time.time()}, f)
+        os.replace(f"{path}.tmp", path)
+        return job_id
+
+    def pending(self) -> list[str]:
+        """Ids of the queued jobs, oldest first."""
+        names = os.listdir(os.path.join(self.root, "incoming"))
+        return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+    def claim(self) -> Optional[dict]:
+        """Takes the oldest queued job, or returns None if there is none."""
+        for job_id in self.pending():
+            running = self._path("running", job_id)
+            try:
+                os.rename(self._path("incoming", job_id), running)
+            except FileNotFoundError:
+                continue  # claimed by another worker
+            with open(running) as f:
+                return {**json.load(f), "id": job_id}
+        return None
+
+    def finish(self, job: dict, results: list[dict], failed: bool = False) -> str:
+        """Records a claimed job's results under done/ (or failed/); returns the record's path."""
+        path = self._path("failed" if failed else "done", job["id"])
+        record = {key: value for key, value in job.items() if key != "id"}
+        record.update(finished=time.time(), results=results)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(record, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+        os.remove(self._path("running", job["id"]))
+        return path
+
+    def recover(self) -> int:
+        """
+        Puts jobs left in running/ by a worker that died back in the queue.
+
+        Only call this while no other worker uses the queue. Returns how many were requeued.
+        """
+        names = [n for n in os.listdir(os.path.join(self.root, "running")) if n.endswith(".json")]
+        for name in names:
+            os.replace(os.path.join(self.root, "running", name), os.path.join(self.root, "incoming", name))
+        return len(names)
+
+
+if __name__ == "__main__":
+    queue = JobQueue()
+    job_id = queue.submit(sys.argv[1:])
+    print(f"Queued job {job_id} in {queue.root} ({len(queue.pending())} pending)")
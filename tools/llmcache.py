@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmResponse, LlmRequest
+
+# How long a cached response stays valid, per agent. The technical and summary
+# requests embed the chart bytes and upstream reports, so a hit already implies
+# identical inputs; fundamental research relies on live web search and goes stale.
+LLM_CACHE_TTLS = {
+    "technical_analysis_agent": 24 * 3600,
+    "fundamental_analysis_agent": 6 * 3600,
+    "sector_research_agent": 6 * 3600,
+    "summary_recommendation_agent": 24 * 3600,
+    "visualization_agent": 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+
+# "on": read and write, "off": bypass, "replay": serve only from cache (offline / CI).
+LLM_CACHE_MODES = ("on", "off", "replay")
+
+_settings = {
+    "mode": os.environ.get("LLM_CACHE_MODE", "on"),
+    "root": os.environ.get("LLM_CACHE_DIR", "data/llm_cache"),
+}
+
+
+class LlmCacheMiss(RuntimeError):
+    """Raised in replay mode when a request has no cached response."""
+
+
+def configure_llm_cache(mode: Optional[str] = None, root: Optional[str] = None) -> None:
+    if mode is not None:
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(f"LLM cache mode must be one of {LLM_CACHE_MODES}, got {mode!r}")
+        _settings["mode"] = mode
+    if root is not None:
+        _settings["root"] = root
+
+
+def _strip_call_ids(value):
+    """Drops the per-run function call ids ADK generates, which would otherwise make every key unique."""
+    if isinstance(value, dict):
+        return {k: _strip_call_ids(v) for k, v in value.items() if k != "id"}
+    if isinstance(value, list):
+        return [_strip_call_ids(v) for v in value]
+    return value
+
+
+def request_key(llm_request: LlmRequest) -> str:
+    """Hash of the model name plus everything in the request that can change the response."""
+    config = llm_request.config.model_dump(mode="json", exclude_none=True, exclude={"http_options", "labels"}) if llm_request.config else {}
+    payload = {
+        "model": llm_request.model,
+        "contents": _strip_call_ids([c.model_dump(mode="json", exclude_none=True) for c in llm_request.contents]),
+        "config": config,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _path(agent_name: str, key: str) -> str:
+    return os.path.join(_settings["root"], agent_name, f"{key}.json")
+
+
+async def llm_cache_bmc(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """
+    Before-model callback that returns a stored response for an identical earlier request.
+
+    Must run after any callback that edits the request (e.g. route_bmc switching the model).
+    The key is remembered in state so llm_cache_amc can store the response under it.
+    """
+    mode = _settings["mode"]
+    if mode == "off":
+        return None
+
+    agent_name = callback_context.agent_name
+    key = request_key(llm_request)
+    path = _path(agent_name, key)
+    ttl = LLM_CACHE_TTLS.get(agent_name, DEFAULT_TTL)
+    try:
+        if time.time() - os.path.getmtime(path) <= ttl or mode == "replay":
+            with open(path) as f:
+                print(f"LLM cache hit for {agent_name}")
+                return LlmResponse.model_validate_json(f.read())
+    except FileNotFoundError:
+        pass
+
+    if mode == "replay":
+        raise LlmCacheMiss(f"No cached response for {agent_name} request {key}")
+    callback_context.state[f"temp:llm_cache_key:{agent_name}"] = key
+    return None
+
+
+async def llm_cache_amc(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """After-model callback that stores the final (non-partial, error-free) response."""
+    if _settings["mode"] != "on" or llm_response.partial or llm_response.error_code:
+        return None
+    agent_name = callback_context.agent_name
+    key = callback_context.state.get(f"temp:llm_cache_key:{agent_name}")
+    if not key:
+        return None
+
+    path = _path(agent_name, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(llm_response.model_dump_json(exclude_none=True))
+    os.replace(tmp, path)
+    callback_context.state[f"temp:llm_cache_key:{agent_name}"] = None
+    return None
@@ -0,0 +1,341 @@
+"""
+Structured fundamental metrics store.
+
+Income statement lines are kept in SQLite, one row per ticker, frequency and fiscal
+period, next to a snapshot of the valuation fields from `info`. A bulk fetcher fills
+the store for many tickers at once: network calls run on a thread pool with retry and
+backoff, and statements are only re-fetched when a new quarter is likely to have
+been reported. Growth metrics are computed for the whole universe in one pass.
+"""
+import contextlib
+import datetime
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, Optional, Protocol
+
+import numpy as np
+import pandas as pd
+
+# Statement rows we keep, mapped to column names.
+STATEMENT_LINES = {"Total Revenue": "revenue", "Net Income": "net_income"}
+
+# Fields of yfinance's `info` we keep, mapped to column names.
+INFO_FIELDS = {
+    "marketCap": "market_cap",
+    "trailingPE": "trailing_pe",
+    "priceToSalesTrailing12Months": "ps_ratio",
+    "totalDebt": "total_debt",
+    "debtToEquity": "debt_to_equity",
+}
+
+# Classification fields of `info`, kept as text.
+INFO_TEXT_FIELDS = {"sector": "sector", "industry": "industry"}
+
+# The next quarter's figures are expected this many days after the latest stored
+# period end: one quarter plus the ~40 day filing window.
+QUARTER_DUE_DAYS = 130
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    ticker TEXT NOT NULL,
+    freq TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    revenue REAL,
+    net_income REAL,
+    PRIMARY KEY (ticker, freq, period_end)
+);
+CREATE TABLE IF NOT EXISTS info (
+    ticker TEXT PRIMARY KEY,
+    market_cap REAL,
+    trailing_pe REAL,
+    ps_ratio REAL,
+    total_debt REAL,
+    debt_to_equity REAL,
+    sector TEXT,
+    industry TEXT,
+    refreshed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refreshes (
+    ticker TEXT PRIMARY KEY,
+    statements_at REAL,
+    info_at REAL
+);
+"""
+
+
+class MetricsProvider(Protocol):
+    """Source of fundamentals. Statements are DataFrames shaped like yfinance's (lines x period ends, newest first)."""
+
+    def fetch_statements(self, ticker: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        ...
+
+    def fetch_info(self, ticker: str) -> dict:
+        ...
+
+
+class YFinanceMetricsProvider:
+    """
+    Fetches statements and info from Yahoo Finance.
+
+    yfinance routes every Ticker through one shared HTTP session, so concurrent fetches
+    reuse connections; pass `session` to supply a specific one instead.
+    """
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def _ticker(self, ticker: str):
+        import yfinance as yf
+
+        return yf.Ticker(ticker, session=self.session)
+
+    def fetch_statements(self, ticker: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        stock = self._ticker(ticker)
+        return stock.quarterly_income_stmt, stock.income_stmt
+
+    def fetch_info(self, ticker: str) -> dict:
+        return self._ticker(ticker).info
+
+
+def with_retry(func, *args, attempts: int = 4, base_delay: float = 1.0):
+    """Calls `func(*args)`, retrying failures with exponential backoff and jitter."""
+    for attempt in range(attempts):
+        try:
+            return func(*args)
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(base_delay * 2 ** attempt * (0.5 + random.random()))
+
+
+def statement_rows(ticker: str, freq: str, stmt: Optional[pd.DataFrame]) -> list[tuple]:
+    """Turns a yfinance statement frame into (ticker, freq, period_end, revenue, net_income) rows."""
+    if stmt is None or stmt.empty:
+        return []
+    rows = []
+    for period_end in stmt.columns:
+        values = [
+            float(stmt.at[line, period_end]) if line in stmt.index and pd.notna(stmt.at[line, period_end]) else None
+            for line in STATEMENT_LINES
+        ]
+        rows.append((ticker, freq, pd.Timestamp(period_end).date().isoformat(), *values))
+    return rows
+
+
+def _number(value) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class MetricsStore:
+    """SQLite-backed fundamentals for a universe of tickers."""
+
+    def __init__(self, path: str = "data/metrics.sqlite", provider: Optional[MetricsProvider] = None,
+                 info_max_age_seconds: float = 12 * 3600, workers: int = 8):
+        """
+        Args:
+            path: SQLite database file.
+            provider: Data source (default: YFinanceMetricsProvider).
+            info_max_age_seconds: Re-fetch the info snapshot when it is older than this.
+            workers: Concurrent fetches in `refresh`.
+        """
+        self.path = path
+        self.provider = provider or YFinanceMetricsProvider()
+        self.info_max_age_seconds = info_max_age_seconds
+        self.workers = workers
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            # databases created before the text fields were kept
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(info)")}
+            for column in INFO_TEXT_FIELDS.values():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE info ADD COLUMN {column} TEXT")
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection for one transaction: committed (or rolled back) and closed on exit."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _due(self, tickers: list[str], now: float) -> dict[str, tuple[bool, bool]]:
+        """For each ticker: (statements due, info due)."""
+        today = datetime.date.fromtimestamp(now)
+        placeholders = ",".join("?" * len(tickers))
+        with self._connect() as conn:
+            refreshed = {row[0]: row[1:] for row in conn.execute(
+                f"SELECT ticker, statements_at, info_at FROM refreshes WHERE ticker IN ({placeholders})", tickers)}
+            latest = dict(conn.execute(
+                f"SELECT ticker, MAX(period_end) FROM statements WHERE freq = 'quarterly' AND ticker IN ({placeholders}) "
+                "GROUP BY ticker", tickers))
+
+        due = {}
+        for ticker in tickers:
+            statements_at, info_at = refreshed.get(ticker, (None, None))
+            if statements_at is None:
+                statements_due = True
+            else:
+                # once a new quarter is due (or if none were ever reported), check at most
+                # once a day until it shows up
+                next_due = (datetime.date.fromisoformat(latest[ticker]) + datetime.timedelta(days=QUARTER_DUE_DAYS)
+                            if ticker in latest else today)
+                statements_due = today >= next_due and now - statements_at >= 24 * 3600
+            info_due = info_at is None or now - info_at >= self.info_max_age_seconds
+            due[ticker] = (statements_due, info_due)
+        return due
+
+    def _fetch(self, ticker: str, statements: bool, info: bool) -> tuple[list[tuple], Optional[dict]]:
+        rows, snapshot = [], None
+        if statements:
+            quarterly, annual = with_retry(self.provider.fetch_statements, ticker)
+            rows = statement_rows(ticker, "quarterly", quarterly) + statement_rows(ticker, "annual", annual)
+        if info:
+            snapshot = with_retry(self.provider.fetch_info, ticker) or {}
+        return rows, snapshot
+
+    def refresh(self, tickers: list[str], force: bool = False) -> dict[str, str]:
+        """
+        Brings the store up to date for `tickers`, fetching only what is stale.
+
+        Fetches run concurrently; results are written from the calling thread as they
+        arrive, so one failing ticker does not hold up the others.
+
+        Returns:
+            Error messages for the tickers that could not be refreshed.
+        """
+        tickers = sorted({t.upper() for t in tickers})
+        if not tickers:
+            return {}
+        now = time.time()
+        due = {t: (True, True) for t in tickers} if force else self._due(tickers, now)
+        due = {t: d for t, d in due.items() if any(d)}
+        if not due:
+            return {}
+
+        print(f"Refreshing metrics for {len(due)} tickers")
+        errors = {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(due))) as pool, self._connect() as conn:
+            futures = {pool.submit(self._fetch, t, *d): t for t, d in due.items()}
+            for future in as_completed(futures):
+                ticker = futures[future]
+                statements, info = due[ticker]
+                try:
+                    rows, snapshot = future.result()
+                except Exception as e:
+                    errors[ticker] = str(e)
+                    print(f"Metrics refresh failed for {ticker}: {e}")
+                    continue
+                if statements:
+                    conn.executemany("INSERT OR REPLACE INTO statements VALUES (?, ?, ?, ?, ?)", rows)
+                    conn.execute("INSERT INTO refreshes (ticker, statements_at) VALUES (?, ?) "
+                                 "ON CONFLICT(ticker) DO UPDATE SET statements_at = excluded.statements_at", (ticker, now))
+                if info:
+                    values = [_number(snapshot.get(field)) for field in INFO_FIELDS]
+                    values += [snapshot.get(field) or None for field in INFO_TEXT_FIELDS]
+                    columns = ", ".join([*INFO_FIELDS.values(), *INFO_TEXT_FIELDS.values()])
+                    conn.execute(f"INSERT OR REPLACE INTO info (ticker, {columns}, refreshed_at) "
+                                 f"VALUES ({', '.join('?' * (len(values) + 2))})", (ticker, *values, now))
+                    conn.execute("INSERT INTO refreshes (ticker, info_at) VALUES (?, ?) "
+                                 "ON CONFLICT(ticker) DO UPDATE SET info_at = excluded.info_at", (ticker, now))
+                conn.commit()
+        return errors
+
+    def statements(self, freq: str, tickers: Optional[list[str]] = None) -> pd.DataFrame:
+        query = "SELECT ticker, period_end, revenue, net_income FROM statements WHERE freq = ?"
+        params = [freq]
+        if tickers:
+            query += f" AND ticker IN ({','.join('?' * len(tickers))})"
+            params += [t.upper() for t in tickers]
+        with self._connect() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    def info(self, tickers: Optional[list[str]] = None) -> pd.DataFrame:
+        query = f"SELECT ticker, {', '.join([*INFO_FIELDS.values(), *INFO_TEXT_FIELDS.values()])} FROM info"
+        params = []
+        if tickers:
+            query += f" WHERE ticker IN ({','.join('?' * len(tickers))})"
+            params = [t.upper() for t in tickers]
+        with self._connect() as conn:
+            return pd.read_sql_query(query, conn, params=params).set_index("ticker")
+
+    def metrics_table(self, tickers: Optional[list[str]] = None) -> pd.DataFrame:
+        """
+        Growth and valuation metrics for every stored ticker (or just `tickers`), one row each.
+
+        Columns are the INFO_FIELDS and INFO_TEXT_FIELDS plus revenue, net_income, revenue_growth (annual YoY) and
+        revenue_cagr / net_income_cagr over the last 4 quarters, all as fractions; NaN where
+        the inputs are missing.
+        """
+        quarterly = _latest_periods(self.statements("quarterly", tickers), 4)
+        annual = _latest_periods(self.statements("annual", tickers), 2)
+
+        table = self.info(tickers)
+        table = table.join(growth_metrics(quarterly, annual), how="outer")
+        table.index.name = "ticker"
+        return table
+
+
+def _latest_periods(stmts: pd.DataFrame, n: int) -> dict[str, pd.DataFrame]:
+    """Pivots statement rows into one (tickers x n) frame per line, column 0 the newest period."""
+    stmts = stmts.sort_values(["ticker", "period_end"], ascending=[True, False])
+    stmts["rank"] = stmts.groupby("ticker").cumcount()
+    stmts = stmts[stmts["rank"] < n]
+    return {
+        line: stmts.pivot(index="ticker", columns="rank", values=line).reindex(columns=range(n))
+        for line in STATEMENT_LINES.values()
+    }
+
+
+def growth_metrics(quarterly: dict[str, pd.DataFrame], annual: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Vectorized growth metrics across tickers.
+
+    Args:
+        quarterly: Per-line (tickers x 4) frames from `_latest_periods`, newest quarter first.
+        annual: Per-line (tickers x 2) frames, newest year first.
+
+    Returns:
+        A frame indexed by ticker with revenue, net_income, revenue_growth, revenue_cagr
+        and net_income_cagr.
+    """
+    def cagr(frame: pd.DataFrame, positive_only: bool) -> pd.Series:
+        ending, beginning = frame[0].to_numpy(float), frame[3].to_numpy(float)
+        ratio = ending / np.where(beginning == 0, np.nan, beginning)
+        valid = (beginning > 0) & (ending > 0) if positive_only else (beginning != 0) & (ending != 0)
+        # negative ratios have no real 4th root and come out as NaN, i.e. N/A
+        with np.errstate(invalid="ignore"):
+            return pd.Series(np.where(valid, np.power(ratio, 1 / 4) - 1, np.nan), index=frame.index)
+
+    rev_curr, rev_prev = annual["revenue"][0], annual["revenue"][1]
+    return pd.DataFrame({
+        "revenue": rev_curr,
+        "net_income": annual["net_income"][0],
+        "revenue_growth": (rev_curr - rev_prev) / rev_prev.where(rev_prev != 0),
+    }).join(pd.DataFrame({
+        "revenue_cagr": cagr(quarterly["revenue"], positive_only=True),
+        "net_income_cagr": cagr(quarterly["net_income"], positive_only=False),
+    }), how="outer")
+
+
+_store: Optional[MetricsStore] = None
+
+
+def get_metrics_store() -> MetricsStore:
+    """Returns the shared store (database path from the METRICS_DB env var, default data/metrics.sqlite)."""
+    global _store
+    if _store is None:
+        _store = MetricsStore(path=os.environ.get("METRICS_DB", "data/metrics.sqlite"))
+    return _store
+
+
+def set_metrics_store(store: Optional[MetricsStore]) -> None:
+    """Replaces the shared store, e.g. with one backed by a different provider."""
+    global _store
+    _store = store
@@ -0,0 +1,240 @@
+"""
+Compact in-memory panel of daily prices and chart indicators for a whole universe.
+
+get_stock_data builds a float64 DataFrame per ticker, with its own tz-aware index and
+pandas overhead, and the screener then copies every one of them into a fresh close
+panel. UniversePanel reads the price store's bars straight into one array per column,
+shaped (tickers, bars) on a shared date index: float32 for prices and indicators,
+int64 for volume. A ticker's history is a contiguous slice of each array's row, so
+`view` hands the chart renderer a DataFrame backed by the panel's own memory, and the
+screener reads each ticker's latest values off the arrays without copying anything.
+
+SMA_50, SMA_200 and RSI are computed once for all tickers (tools/indicators.py) on
+each ticker's own bars, so a ticker that did not trade on another exchange's dates
+gets the same readings as from get_stock_data.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from tools.indicators import rsi, sma
+from tools.pricestore import get_price_store
+
+PANEL_COLUMNS = ("Open", "High", "Low", "Close", "Volume", "SMA_50", "SMA_200", "RSI")
+
+INDICATOR_COLUMNS = ("SMA_50", "SMA_200", "RSI")
+
+# Calendar days of daily bars in the shared panel: the 200 bars a chart draws plus 200
+# more to warm up SMA_200 (CHART_DAYS['day'] in tools/customtool.py), which also covers
+# the screener's history.
+PANEL_DAYS = 500
+
+# Tickers per indicator pass; bounds the float64 scratch arrays of a large universe.
+INDICATOR_CHUNK = 256
+
+_BAR_FIELDS = {"Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"}
+
+
+def _local_ns(ts: np.ndarray, tz: str) -> np.ndarray:
+    """UTC nanosecond timestamps as exchange-local wall-clock nanoseconds."""
+    return pd.DatetimeIndex(pd.to_datetime(ts, utc=True)).tz_convert(tz).tz_localize(None).asi8
+
+
+class UniversePanel:
+    """
+    Date-aligned (tickers, bars) arrays for a universe of tickers.
+
+    Bars are aligned on their exchange-local wall-clock timestamp, like
+    frames_to_panel, so daily bars from different exchanges line up by date. Missing
+    bars are NaN (volume 0). The arrays are read-only once built and may be shared
+    between threads.
+
+    Attributes:
+        tickers: Row order of the arrays.
+        index: The shared, timezone-naive DatetimeIndex.
+        columns: Column name to (tickers, bars) array.
+        tz: Exchange timezone per ticker.
+        errors: Tickers that could not be loaded, with the reason.
+        built_at: time.time() when the bars were read.
+    """
+
+    def __init__(self, tickers: list[str], index: pd.DatetimeIndex, columns: dict[str, np.ndarray],
+                 tz: dict[str, str], start: np.ndarray, stop: np.ndarray, dense: np.ndarray,
+                 number_of_days: int, errors: Optional[dict] = None):
+        self.tickers = tickers
+        self.rows = {ticker: row for row, ticker in enumerate(tickers)}
+        self.index = index
+        self.columns = columns
+        self.tz = tz
+        self.start = start
+        self.stop = stop
+        self.dense = dense
+        self.number_of_days = number_of_days
+        self.errors = errors or {}
+        self.built_at = time.time()
+        for array in columns.values():
+            array.flags.writeable = False
+
+    @classmethod
+    def from_bars(cls, series: dict[str, tuple[np.ndarray, str]], number_of_days: int = PANEL_DAYS,
+                  columns=PANEL_COLUMNS, errors: Optional[dict] = None) -> "UniversePanel":
+        """
+        Builds the panel from price store bars.
+
+        Args:
+            series: Ticker to (bars, tz) as returned by PriceStore.bars; empty series are skipped.
+            number_of_days: Calendar days the bars were loaded for.
+            columns: Columns to keep, a subset of PANEL_COLUMNS.
+            errors: Tickers that failed to load, kept on the panel.
+        """
+        series = {ticker: (bars, tz) for ticker, (bars, tz) in series.items() if len(bars)}
+        tickers = list(series)
+        local = [_local_ns(np.asarray(bars["ts"]), tz) for bars, tz in series.values()]
+        keys = np.unique(np.concatenate(local)) if local else np.empty(0, dtype="i8")
+        positions = [np.searchsorted(keys, dates) for dates in local]
+        shape = (len(tickers), len(keys))
+
+        arrays = {}
+        for column in columns:
+            if column == "Volume":
+                arrays[column] = np.zeros(shape, dtype="i8")
+            else:
+                arrays[column] = np.full(shape, np.nan, dtype="f4")
+        for row, (bars, _) in enumerate(series.values()):
+            for column, field in _BAR_FIELDS.items():
+                if column in arrays:
+                    arrays[column][row, positions[row]] = bars[field]
+
+        wanted = [c for c in INDICATOR_COLUMNS if c in arrays]
+        if wanted and tickers:
+            # computed on each ticker's own bars, right-aligned without the calendar
+            # gaps of the shared index, then scattered to their dates
+            bars_list = [bars for bars, _ in series.values()]
+            for first in range(0, len(tickers), INDICATOR_CHUNK):
+                chunk = range(first, min(first + INDICATOR_CHUNK, len(tickers)))
+                width = max(len(positions[row]) for row in chunk)
+                close = np.full((len(chunk), width), np.nan)
+                for i, row in enumerate(chunk):
+                    close[i, width - len(bars_list[row]):] = bars_list[row]["close"]
+                indicators = {"SMA_50": lambda: sma(close, 50), "SMA_200": lambda: sma(close, 200), "RSI": lambda: rsi(close)}
+                for column in wanted:
+                    values = indicators[column]()
+                    for i, row in enumerate(chunk):
+                        arrays[column][row, positions[row]] = values[i, width - len(positions[row]):]
+
+        start = np.array([p[0] for p in positions], dtype=np.int64)
+        stop = np.array([p[-1] + 1 for p in positions], dtype=np.int64)
+        dense = np.array([len(p) for p in positions]) == stop - start
+        index = pd.DatetimeIndex(keys.view("M8[ns]"), name="Date")
+        return cls(tickers, index, arrays, {t: tz for t, (_, tz) in series.items()}, start, stop, dense,
+                   number_of_days, errors)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker.upper() in self.rows
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the arrays and the index."""
+        return sum(a.nbytes for a in self.columns.values()) + self.index.nbytes
+
+    def column(self, name: str) -> np.ndarray:
+        """The (tickers, bars) array of one column."""
+        return self.columns[name]
+
+    def last(self, name: str) -> np.ndarray:
+        """Each ticker's value of `name` at its own last bar."""
+        return self.columns[name][np.arange(len(self.tickers)), self.stop - 1]
+
+    def view(self, ticker: str, bars: Optional[int] = None) -> pd.DataFrame:
+        """
+        One ticker's history as a DataFrame backed by the panel's arrays.
+
+        The frame has the panel's columns and a timezone-naive exchange-local index,
+        starting at the ticker's first bar. It shares memory with the panel, so treat
+        it as read-only. Only a ticker with gaps in the shared index (dates on which
+        other exchanges traded) is copied, to drop its empty rows.
+
+        Args:
+            ticker: A ticker in the panel.
+            bars: Only the last `bars` bars (e.g. the ones a chart draws).
+        """
+        row = self.rows[ticker.upper()]
+        start, stop = int(self.start[row]), int(self.stop[row])
+        if bars is not None and self.dense[row]:
+            start = max(start, stop - bars)
+        df = pd.DataFrame({name: array[row, start:stop] for name, array in self.columns.items()},
+                          index=self.index[start:stop], copy=False)
+        if not self.dense[row]:
+            df = df[~np.isnan(df["Close"].to_numpy())]
+            if bars is not None:
+                df = df.iloc[-bars:]
+        return df
+
+    def is_fresh(self) -> bool:
+        """True if the bars were read within the price store's refresh interval."""
+        return time.time() - self.built_at < get_price_store().max_age_seconds
+
+    def covers(self, tickers: list[str], number_of_days: int) -> bool:
+        """True if every ticker is loaded (or known to have failed) with at least `number_of_days` of history."""
+        return number_of_days <= self.number_of_days and all(
+            t.upper() in self.rows or t.upper() in self.errors for t in tickers)
+
+
+def load_panel(tickers: list[str], number_of_days: int = PANEL_DAYS, columns=PANEL_COLUMNS,
+               workers: int = 8) -> UniversePanel:
+    """
+    Reads daily bars for `tickers` from the price store into a UniversePanel,
+    refreshing the store concurrently. Tickers that fail or have no bars are listed
+    in the panel's `errors`.
+    """
+    store = get_price_store()
+
+    def load(ticker):
+        try:
+            return ticker, store.bars(ticker, "1d", number_of_days), None
+        except Exception as e:
+            return ticker, None, str(e)
+
+    series, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for ticker, loaded, error in pool.map(load, [t.upper() for t in tickers]):
+            if loaded is None or len(loaded[0]) == 0:
+                errors[ticker] = error or "no price data"
+            else:
+                series[ticker] = loaded
+    return UniversePanel.from_bars(series, number_of_days, columns, errors)
+
+
+_panel: Optional[UniversePanel] = None
+_panel_lock = threading.Lock()
+
+
+def get_universe_panel() -> Optional[UniversePanel]:
+    """Returns the process-wide panel, if one has been loaded."""
+    return _panel
+
+
+def set_universe_panel(panel: Optional[UniversePanel]) -> None:
+    """Swaps the process-wide panel (None drops it)."""
+    global _panel
+    _panel = panel
+
+
+def universe_panel(tickers: list[str], number_of_days: int = PANEL_DAYS) -> UniversePanel:
+    """
+    Returns the process-wide panel, loading it for `tickers` first unless the current
+    one already covers them and is younger than the price store's refresh interval.
+    """
+    global _panel
+    with _panel_lock:
+        panel = _panel
+        if not (panel is not None and panel.is_fresh() and panel.covers(tickers, number_of_days)):
+            panel = _panel = load_panel(list(dict.fromkeys(t.upper() for t in tickers)), number_of_days)
+        return panel
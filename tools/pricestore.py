@@ -0,0 +1,279 @@
+import json
+import os
+import time
+from typing import Optional, Protocol
+
+import numpy as np
+import pandas as pd
+
+from tools.resample import INTERVAL_MINUTES, resample_bars
+from tools.singleflight import KeyedLocks
+
+# On-disk layout of one bar; one .npy file per ticker and interval.
+BAR_DTYPE = np.dtype([
+    ("ts", "<i8"),        # bar start, ns since epoch (UTC)
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<i8"),
+])
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# How far back the data source serves each intraday interval, in calendar days.
+MAX_PERIOD_DAYS = {"1m": 7, "2m": 60, "5m": 60, "15m": 60, "30m": 60, "90m": 60, "60m": 730, "1h": 730}
+
+# Intraday candles are derived from this series once they have been backfilled.
+BASE_INTERVAL = "1m"
+
+
+class PriceProvider(Protocol):
+    """Source of OHLCV bars. Implementations return a DataFrame with OHLCV_COLUMNS and a tz-aware index."""
+
+    def fetch(self, ticker: str, interval: str, start: Optional[pd.Timestamp] = None,
+              period: Optional[str] = None) -> pd.DataFrame:
+        ...
+
+
+class YFinanceProvider:
+    """Fetches bars from Yahoo Finance, either a trailing `period` or everything from `start`."""
+
+    def fetch(self, ticker: str, interval: str, start: Optional[pd.Timestamp] = None,
+              period: Optional[str] = None) -> pd.DataFrame:
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker)
+        if start is not None:
+            return stock.history(start=start, interval=interval)
+        return stock.history(period=period, interval=interval)
+
+
+class PriceStore:
+    """
+    Local columnar OHLCV store with incremental refresh.
+
+    Bars are kept as a structured NumPy array per ticker and interval
+    (`{root}/{interval}/{TICKER}.npy`, memory-mapped on read) with a small JSON sidecar
+    holding the exchange timezone and refresh bookkeeping. A read only asks the provider
+    for the bars from the last stored bar onwards; the last stored bar is always
+    re-fetched because it may have been an in-progress session.
+
+    If the open of the re-fetched overlap bar no longer matches what is stored, the provider has
+    re-adjusted history (split or dividend), so the whole span is fetched again.
+    """
+
+    def __init__(self, root: str = "data/prices", provider: Optional[PriceProvider] = None,
+                 max_age_seconds: float = 900):
+        """
+        Args:
+            root: Directory holding the store.
+            provider: Data source for missing bars (default: YFinanceProvider).
+            max_age_seconds: Skip the provider entirely if the series was refreshed this recently.
+        """
+        self.root = root
+        self.provider = provider or YFinanceProvider()
+        self.max_age_seconds = max_age_seconds
+        # one refresh per series at a time; a thread that waited finds it fresh and skips the fetch
+        self._locks = KeyedLocks()
+
+    def _paths(self, ticker: str, interval: str) -> tuple[str, str]:
+        base = os.path.join(self.root, interval, ticker.upper())
+        return f"{base}.npy", f"{base}.json"
+
+    def load(self, ticker: str, interval: str) -> tuple[Optional[np.ndarray], dict]:
+        """Returns the stored bars (memory-mapped, read-only) and sidecar metadata, or (None, {})."""
+        data_path, meta_path = self._paths(ticker, interval)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, {}
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return np.load(data_path, mmap_mode="r"), meta
+
+    def save(self, ticker: str, interval: str, bars: np.ndarray, meta: dict) -> None:
+        """Atomically replaces the stored bars and metadata."""
+        data_path, meta_path = self._paths(ticker, interval)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        tmp_data, tmp_meta = f"{data_path}.tmp", f"{meta_path}.tmp"
+        with open(tmp_data, "wb") as f:
+            np.save(f, np.ascontiguousarray(bars, dtype=BAR_DTYPE))
+        with open(tmp_meta, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_data, data_path)
+        os.replace(tmp_meta, meta_path)
+
+    def get(self, ticker: str, interval: str = "1d", number_of_days: int = 500) -> pd.DataFrame:
+        """
+        Returns the last `number_of_days` calendar days of bars, refreshing the stored tail first.
+
+        Args:
+            ticker: The stock ticker symbol (e.g., 'AAPL').
+            interval: Data source interval string ('1d', '1h', '15m', ...).
+            number_of_days: Calendar days of history to return.
+
+        Returns:
+            A DataFrame with Open, High, Low, Close, Volume columns and a tz-aware DatetimeIndex.
+        """
+        bars, tz = self.bars(ticker, interval, number_of_days)
+        return bars_to_frame(bars, tz)
+
+    def bars(self, ticker: str, interval: str = "1d", number_of_days: int = 500) -> tuple[np.ndarray, str]:
+        """
+        Same as `get`, but returns the raw structured bars and the exchange timezone.
+
+        The bars may be a read-only memory map of the store; tools/panel.py reads them
+        straight into its arrays without building a DataFrame per ticker.
+        """
+        if interval in INTERVAL_MINUTES:
+            bars, meta = self.refresh_derived(ticker, interval, number_of_days)
+        else:
+            bars, meta = self.refresh(ticker, interval, number_of_days)
+        tz = meta.get("tz", "UTC")
+        if len(bars) == 0:
+            return bars, tz
+        last = pd.Timestamp(int(bars["ts"][-1]), tz="UTC").tz_convert(tz)
+        cutoff = last.normalize() - pd.Timedelta(days=number_of_days - 1)
+        # bars are sorted by time, so this stays a view of the memory map
+        return bars[np.searchsorted(bars["ts"], cutoff.value):], tz
+
+    def refresh(self, ticker: str, interval: str, number_of_days: int) -> tuple[np.ndarray, dict]:
+        """Brings the stored series up to date and returns (bars, meta)."""
+        with self._locks((ticker.upper(), interval)):
+            return self._refresh(ticker, interval, number_of_days)
+
+    def _refresh(self, ticker: str, interval: str, number_of_days: int) -> tuple[np.ndarray, dict]:
+        number_of_days = min(number_of_days, MAX_PERIOD_DAYS.get(interval, number_of_days))
+        bars, meta = self.load(ticker, interval)
+        now = time.time()
+
+        if bars is None or len(bars) == 0 or number_of_days > meta.get("covered_days", 0):
+            return self._full_refresh(ticker, interval, number_of_days, meta)
+
+        if now - meta.get("refreshed_at", 0) < self.max_age_seconds:
+            return bars, meta
+        return self._extend(ticker, interval, bars, meta, number_of_days)
+
+    def refresh_derived(self, ticker: str, interval: str, number_of_days: int) -> tuple[np.ndarray, dict]:
+        """
+        Brings an intraday series (15m, 1h, ...) up to date from the 1-minute series.
+
+        The first request for an interval backfills its history natively, since the
+        1-minute series only reaches back MAX_PERIOD_DAYS['1m']. After that, only the
+        1-minute bars are downloaded and the newer candles of every intraday interval are
+        aggregated from them, replacing the last stored candle, which may have been open.
+        """
+        with self._locks((ticker.upper(), interval)):
+            return self._refresh_derived(ticker, interval, number_of_days)
+
+    def _refresh_derived(self, ticker: str, interval: str, number_of_days: int) -> tuple[np.ndarray, dict]:
+        number_of_days = min(number_of_days, MAX_PERIOD_DAYS.get(interval, number_of_days))
+        base, base_meta = self.refresh(ticker, BASE_INTERVAL, MAX_PERIOD_DAYS[BASE_INTERVAL])
+        bars, meta = self.load(ticker, interval)
+
+        if bars is None or len(bars) == 0 or number_of_days > meta.get("covered_days", 0):
+            bars, meta = self._full_refresh(ticker, interval, number_of_days, meta)
+        elif len(base) and base["ts"][0] > bars["ts"][-1]:
+            # the 1-minute series starts after the last stored candle; close the gap natively
+            bars, meta = self._extend(ticker, interval, bars, meta, number_of_days)
+        if len(base) == 0 or len(bars) == 0:
+            return bars, meta
+
+        last = bars["ts"][-1]
+        covered = base["ts"][0] <= last
+        new = resample_bars(base[base["ts"] >= last] if covered else base, interval, meta.get("tz", base_meta.get("tz", "UTC")))
+        new = new[new["ts"] >= last] if covered else new[new["ts"] > last]
+        if len(new):
+            bars = np.concatenate([bars[bars["ts"] < new["ts"][0]], new])
+            meta = {**meta, "refreshed_at": time.time()}
+            self.save(ticker, interval, bars, meta)
+        return bars, meta
+
+    def _extend(self, ticker: str, interval: str, bars: np.ndarray, meta: dict, number_of_days: int) -> tuple[np.ndarray, dict]:
+        """Fetches the bars from the last stored one onwards and merges them in."""
+        now = time.time()
+        last = bars[-1]
+        tz = meta.get("tz", "UTC")
+        start = pd.Timestamp(int(last["ts"]), tz="UTC").tz_convert(tz)
+        if interval.endswith("d") or interval.endswith("wk") or interval.endswith("mo"):
+            start = start.normalize()
+        if interval in MAX_PERIOD_DAYS:
+            # the source rejects intraday requests reaching back further than its limit
+            start = max(start, pd.Timestamp.now(tz=tz) - pd.Timedelta(days=MAX_PERIOD_DAYS[interval]) + pd.Timedelta(minutes=1))
+        tail = frame_to_bars(self.provider.fetch(ticker, interval, start=start))
+
+        if len(tail):
+            overlap = tail[tail["ts"] == last["ts"]]
+            if len(overlap) and not _same_history(overlap[0], last):
+                print(f"{ticker} {interval}: history was re-adjusted, refetching")
+                return self._full_refresh(ticker, interval, meta.get("covered_days", number_of_days), meta)
+            bars = np.concatenate([bars[bars["ts"] < tail[0]["ts"]], tail])
+
+        meta = {**meta, "refreshed_at": now}
+        self.save(ticker, interval, bars, meta)
+        return bars, meta
+
+    def _full_refresh(self, ticker: str, interval: str, number_of_days: int, meta: dict) -> tuple[np.ndarray, dict]:
+        df = self.provider.fetch(ticker, interval, period=f"{number_of_days}d")
+        bars = frame_to_bars(df)
+        tz = str(df.index.tz) if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is not None else meta.get("tz", "UTC")
+        meta = {
+            **meta,
+            "tz": tz,
+            "covered_days": max(number_of_days, meta.get("covered_days", 0)),
+            "refreshed_at": time.time(),
+        }
+        if len(bars):
+            self.save(ticker, interval, bars, meta)
+        return bars, meta
+
+
+def _same_history(new_bar, stored_bar, rel_tol: float = 1e-6) -> bool:
+    """True if a re-fetched bar still lines up with the stored one (only open is compared; the rest of the bar may still be moving)."""
+    return bool(abs(new_bar["open"] - stored_bar["open"]) <= rel_tol * max(abs(stored_bar["open"]), 1e-12))
+
+
+def frame_to_bars(df: pd.DataFrame) -> np.ndarray:
+    """Converts a provider DataFrame into the store's structured array, dropping non-OHLCV columns."""
+    if df is None or df.empty:
+        return np.empty(0, dtype=BAR_DTYPE)
+    df = df.dropna(subset=["Open", "High", "Low", "Close"])
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is None:
+        index = index.tz_localize("UTC")
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars["ts"] = index.tz_convert("UTC").as_unit("ns").asi8
+    bars["open"] = df["Open"].to_numpy(dtype="f8")
+    bars["high"] = df["High"].to_numpy(dtype="f8")
+    bars["low"] = df["Low"].to_numpy(dtype="f8")
+    bars["close"] = df["Close"].to_numpy(dtype="f8")
+    bars["volume"] = df["Volume"].fillna(0).to_numpy(dtype="i8")
+    return bars
+
+
+def bars_to_frame(bars: np.ndarray, tz: str = "UTC") -> pd.DataFrame:
+    """Converts stored bars back into the DataFrame shape get_stock_data has always returned."""
+    index = pd.DatetimeIndex(pd.to_datetime(np.asarray(bars["ts"]), utc=True), name="Date").tz_convert(tz)
+    return pd.DataFrame({
+        "Open": np.asarray(bars["open"]),
+        "High": np.asarray(bars["high"]),
+        "Low": np.asarray(bars["low"]),
+        "Close": np.asarray(bars["close"]),
+        "Volume": np.asarray(bars["volume"]),
+    }, index=index)
+
+
+_store: Optional[PriceStore] = None
+
+
+def get_price_store() -> PriceStore:
+    """Returns the process-wide store used by get_stock_data."""
+    global _store
+    if _store is None:
+        _store = PriceStore(root=os.environ.get("PRICE_STORE_DIR", "data/prices"))
+    return _store
+
+
+def set_price_store(store: Optional[PriceStore]) -> None:
+    """Swaps the process-wide store, e.g. for one backed by an offline fake provider."""
+    global _store
+    _store = store
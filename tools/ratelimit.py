@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmResponse, LlmRequest
+
+
+class AsyncRateLimiter:
+    """
+    Spaces out calls so that no more than `requests_per_minute` start in any minute.
+
+    Callers `await limiter.acquire()` before the rate-limited call. Slots are handed
+    out in FIFO order, so concurrent sessions share the provider budget fairly.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self._interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self._interval <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# Requests per minute for each model provider; 0 disables limiting.
+PROVIDER_LIMITS = {
+    "gemini": 60,
+    "perplexity": 20,
+}
+
+_limiters: dict[str, AsyncRateLimiter] = {}
+
+
+def configure_rate_limits(**requests_per_minute: float) -> None:
+    """
+    Overrides the per-provider limits, e.g. configure_rate_limits(gemini=120, perplexity=10).
+    """
+    for provider, rpm in requests_per_minute.items():
+        if rpm is None:
+            continue
+        PROVIDER_LIMITS[provider] = rpm
+        _limiters.pop(provider, None)
+
+
+def provider_for_model(model: Optional[str]) -> str:
+    """Maps an ADK/LiteLLM model name to the provider whose quota it consumes."""
+    model = (model or "").lower()
+    if model.startswith("perplexity/") or "sonar" in model:
+        return "perplexity"
+    return "gemini"
+
+
+def get_limiter(provider: str) -> AsyncRateLimiter:
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = AsyncRateLimiter(PROVIDER_LIMITS.get(provider, 0))
+        _limiters[provider] = limiter
+    return limiter
+
+
+async def rate_limit_bmc(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """Before-model callback that waits for a slot on the model provider's limiter."""
+    await get_limiter(provider_for_model(llm_request.model)).acquire()
+    return None
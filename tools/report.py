@@ -0,0 +1,113 @@
+import datetime
+import os
+import re
+from typing import Optional
+
+from tools.handoff import strip_digest
+
+# Report sections in the order they appear in the final markdown.
+SECTION_ORDER = [
+    "technical_analysis_agent",
+    "fundamental_analysis_agent",
+    "summary_recommendation_agent",
+    "visualization_agent",
+]
+
+_SECTION_RE = re.compile(r"<!-- section: (\S+) -->\n(.*?)\n<!-- /section: \1 -->\n", re.S)
+_IMAGE_RE = re.compile(r"<!-- image: (\S+) -->")
+_HEADER_RE = re.compile(r"<!-- partial report for \S+, run (\S+) -->")
+
+
+class ReportWriter:
+    """
+    Streams a ticker's markdown report to disk as agent sections complete.
+
+    Completed sections are appended to `outputs/{ticker}_output.md.partial` as soon as
+    the agent's final response arrives, so a failure later in the workflow keeps what
+    was already paid for. `finalize` lays the sections out in SECTION_ORDER and
+    atomically renames the result onto `outputs/{ticker}_output.md`. The agents'
+    <digest> blocks (tools/handoff.py) stay in the partial file, where a resumed run
+    reads them back, but not in the final report.
+
+    A partial file from an interrupted run can be loaded with `start(resume=True)`;
+    its completed sections are kept and only the missing stages need to run again.
+    """
+
+    def __init__(self, ticker: str, reqdt: str, output_dir: str = "outputs"):
+        self.ticker = ticker
+        self.reqdt = reqdt
+        self.path = os.path.join(output_dir, f"{ticker}_output.md")
+        self.partial_path = f"{self.path}.partial"
+        self.sections: dict[str, str] = {}
+        self.image_name: Optional[str] = None
+        self._pending: dict[str, list[str]] = {}
+
+    def start(self, resume: bool = False) -> dict[str, str]:
+        """
+        Opens the partial file, optionally keeping completed sections from an earlier run.
+
+        Returns:
+            The sections carried over, keyed by agent name.
+        """
+        if resume and os.path.exists(self.partial_path):
+            with open(self.partial_path) as f:
+                journal = f.read()
+            self.sections = {name: body for name, body in _SECTION_RE.findall(journal)}
+            images = _IMAGE_RE.findall(journal)
+            self.image_name = images[-1] if images else None
+            # the chart linked from the report is the one from the original run
+            header = _HEADER_RE.search(journal)
+            self.reqdt = header.group(1) if header else self.reqdt
+        else:
+            os.makedirs(os.path.dirname(self.partial_path) or ".", exist_ok=True)
+            with open(self.partial_path, "w") as f:
+                f.write(f"<!-- partial report for {self.ticker}, run {self.reqdt} -->\n")
+        return dict(self.sections)
+
+    def add_text(self, agent: str, text: str) -> None:
+        if agent not in self.sections:
+            self._pending.setdefault(agent, []).append(text)
+
+    def add_image(self, image_name: str) -> None:
+        self.image_name = image_name
+        self._append(f"<!-- image: {image_name} -->\n")
+
+    def carry(self, agent: str, body: str) -> None:
+        """Records a section produced by an earlier run (e.g. a reused report) as complete."""
+        if agent in self.sections:
+            return
+        self.sections[agent] = body
+        self._append(f"<!-- section: {agent} -->\n{body}\n<!-- /section: {agent} -->\n")
+
+    def complete_section(self, agent: str) -> None:
+        """Writes the agent's buffered text to the partial file; later calls for the same agent are ignored."""
+        if agent in self.sections:
+            return
+        body = "".join(f"{item}\n\n" for item in self._pending.pop(agent, []))
+        self.sections[agent] = body
+        self._append(f"<!-- section: {agent} -->\n{body}\n<!-- /section: {agent} -->\n")
+
+    def _append(self, text: str) -> None:
+        with open(self.partial_path, "a") as f:
+            f.write(text)
+            f.flush()
+
+    def finalize(self) -> str:
+        """Writes the final report next to the partial file, renames it into place and drops the partial."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"# Analysis of {self.ticker} done on {datetime.datetime.now().strftime('%m/%d/%Y')}\n\n")
+            f.write(f"# Stock chart of {self.ticker} used for Technical Analysis\n\n")
+            f.write(f"![{self.ticker} chart](./{self.ticker}_chart_{self.reqdt}.png)")
+
+            names = SECTION_ORDER + [name for name in self.sections if name not in SECTION_ORDER]
+            for name in names:
+                f.write(f"\n\n# {name}\n\n")
+                body = self.sections.get(name, "")
+                f.write(strip_digest(body) if "<digest>" in body else body)
+            # no poster when the visualization agent was skipped or returned no image
+            if self.image_name:
+                f.write(f"![{self.ticker} Recomendation](./{self.image_name})")
+        os.replace(tmp_path, self.path)
+        os.remove(self.partial_path)
+        return self.path
@@ -0,0 +1,114 @@
+"""
+Streaming aggregation of 1-minute bars into coarser candles.
+
+Buckets are anchored to the exchange session open in local time (09:30 for US
+equities), which is how the data source labels its own 15m/1h bars, so derived
+candles line up with natively fetched ones: 09:30, 10:30, ... for hourly.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Candle width in minutes of each interval the resampler can produce.
+INTERVAL_MINUTES = {"2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "1h": 60, "90m": 90}
+
+SESSION_OPEN_MINUTES = 9 * 60 + 30
+
+
+def _is_dst(local: pd.DatetimeIndex) -> np.ndarray:
+    """Whether each tz-aware timestamp is in daylight saving time (its UTC offset is above its year's standard one)."""
+    def utc_offsets(index: pd.DatetimeIndex) -> pd.TimedeltaIndex:
+        return index.tz_localize(None) - index.tz_convert("UTC").tz_localize(None)
+
+    standard = {year: utc_offsets(pd.DatetimeIndex([f"{year}-01-01", f"{year}-07-01"]).tz_localize(local.tz)).min()
+                for year in np.unique(local.year)}
+    return np.asarray(utc_offsets(local) > pd.TimedeltaIndex([standard[year] for year in local.year]))
+
+
+def bucket_starts(ts: np.ndarray, interval: str, tz: str, session_open: int = SESSION_OPEN_MINUTES) -> np.ndarray:
+    """
+    Start of the candle each bar falls into, as ns since epoch (UTC).
+
+    Buckets are laid out on the local wall clock, so on the days the clocks change
+    they still start at the session open and every `width` minutes after it.
+    """
+    width = INTERVAL_MINUTES[interval]
+    local = pd.DatetimeIndex(pd.to_datetime(np.asarray(ts), utc=True)).tz_convert(tz)
+    wall = local.tz_localize(None)
+    day = wall.normalize()
+    minutes = ((wall - day) // pd.Timedelta(minutes=1)).to_numpy()
+    offset = session_open + (minutes - session_open) // width * width
+    starts = day + pd.to_timedelta(offset, unit="min")
+    # a start in the repeated hour when clocks go back takes its bar's side of the change
+    starts = starts.tz_localize(tz, ambiguous=_is_dst(local), nonexistent="shift_forward")
+    return starts.tz_convert("UTC").as_unit("ns").asi8
+
+
+def aggregate(bars: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Folds consecutive bars sharing a bucket start into one candle each.
+
+    Args:
+        bars: Time-ordered bars in the price store's structured layout.
+        starts: Bucket start of each bar, from bucket_starts.
+    """
+    if len(bars) == 0:
+        return bars[:0].copy()
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    last = np.r_[first[1:] - 1, len(bars) - 1]
+    out = np.empty(len(first), dtype=bars.dtype)
+    out["ts"] = starts[first]
+    out["open"] = bars["open"][first]
+    out["high"] = np.maximum.reduceat(bars["high"], first)
+    out["low"] = np.minimum.reduceat(bars["low"], first)
+    out["close"] = bars["close"][last]
+    out["volume"] = np.add.reduceat(bars["volume"], first)
+    return out
+
+
+class BarAggregator:
+    """
+    Incremental resampler: feed 1-minute bars in chunks, get back the candles they complete.
+
+    The last candle stays open until a bar from a later bucket arrives (or `flush` is
+    called), so every candle returned by `push` is final.
+    """
+
+    def __init__(self, interval: str, tz: str, session_open: int = SESSION_OPEN_MINUTES):
+        self.interval = interval
+        self.tz = tz
+        self.session_open = session_open
+        self._open_bars: Optional[np.ndarray] = None
+        self._open_start: Optional[int] = None
+
+    def push(self, bars: np.ndarray) -> np.ndarray:
+        """Adds time-ordered 1-minute bars and returns the candles that are now complete."""
+        if len(bars) == 0:
+            return bars[:0].copy()
+        if self._open_start is not None:
+            bars = np.concatenate([self._open_bars, bars])
+        starts = bucket_starts(bars["ts"], self.interval, self.tz, self.session_open)
+        pending = starts == starts[-1]
+        self._open_bars, self._open_start = bars[pending], int(starts[-1])
+        return aggregate(bars[~pending], starts[~pending])
+
+    def current(self) -> Optional[np.ndarray]:
+        """The still-open candle as a 1-bar array, or None."""
+        if self._open_start is None:
+            return None
+        return aggregate(self._open_bars, np.full(len(self._open_bars), self._open_start))
+
+    def flush(self) -> Optional[np.ndarray]:
+        """Closes and returns the open candle."""
+        out = self.current()
+        self._open_bars, self._open_start = None, None
+        return out
+
+
+def resample_bars(bars: np.ndarray, interval: str, tz: str) -> np.ndarray:
+    """Aggregates a whole 1-minute series in one go, including the trailing open candle."""
+    aggregator = BarAggregator(interval, tz)
+    done = aggregator.push(bars)
+    tail = aggregator.flush()
+    return done if tail is None else np.concatenate([done, tail])
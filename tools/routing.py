@@ -0,0 +1,226 @@
+"""
+Per-ticker routing between the full research pipeline and lighter ones.
+
+Before the batch starts, `plan_routes` reads cheap signals for every ticker (screen
+score and 20-day volatility) and picks a route:
+
+- full: every agent on its configured model.
+- light: the poster is drawn by a flash image model.
+- minimal: no poster.
+
+Sections whose inputs have not changed since the last report are carried over
+separately (tools/delta.py). The callbacks below apply the route inside the
+workflow, and `print_route_savings` reports what the lighter routes and the carried
+sections saved.
+"""
+import datetime
+import json
+import os
+from typing import Optional
+
+import pandas as pd
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from tools.screener import screen
+from tools.tracing import percentile
+
+ROUTING_RULES = {
+    "full_score": 1.0,           # share of screener rules passed for the full pipeline
+    "poster_min_score": 0.5,     # below this, skip the poster
+    "high_volatility": 0.6,      # annualized 20-day volatility that always gets the full pipeline
+}
+
+# Model used by an agent on the light route.
+LIGHT_MODELS = {
+    "visualization_agent": "gemini-2.5-flash-image",
+}
+
+# Rough per-call latency and price of each model, used for the savings estimate where a
+# batch has no measurement of its own. Adjust to your account's pricing.
+MODEL_ESTIMATES = {
+    "gemini-3-pro-image-preview": {"seconds": 40.0, "usd": 0.134},
+    "gemini-2.5-flash-image": {"seconds": 10.0, "usd": 0.039},
+    "perplexity/sonar-pro": {"seconds": 20.0, "usd": 0.03},
+    "gemini-3-flash-preview": {"seconds": 8.0, "usd": 0.01},
+}
+
+_settings = {
+    "root": os.environ.get("ROUTING_DIR", "data/routing"),
+}
+
+
+def configure_routing(root: Optional[str] = None, **rules) -> None:
+    """Sets where route state is kept and/or overrides ROUTING_RULES entries."""
+    if root is not None:
+        _settings["root"] = root
+    ROUTING_RULES.update({k: v for k, v in rules.items() if v is not None})
+
+
+def _float(value) -> Optional[float]:
+    return None if value is None or pd.isna(value) else float(value)
+
+
+def decide_route(signals: dict) -> dict:
+    """
+    Picks the route for one ticker.
+
+    Args:
+        signals: score and volatility for the ticker today.
+
+    Returns:
+        A dict with tier, skip (agent names), models (agent -> model) and the reasons
+        behind it.
+    """
+    rules = ROUTING_RULES
+    score, volatility = signals.get("score"), signals.get("volatility")
+    route = {"tier": "full", "skip": [], "models": {}, "reasons": []}
+
+    volatile = volatility is not None and volatility >= rules["high_volatility"]
+    if score is None:
+        route["reasons"].append("no screen data")
+    elif volatile:
+        route["reasons"].append(f"volatility {volatility:.0%}")
+    elif score < rules["poster_min_score"]:
+        route["tier"] = "minimal"
+        route["skip"].append("visualization_agent")
+        route["reasons"].append(f"score {score:.2f}")
+    elif score < rules["full_score"]:
+        route["tier"] = "light"
+        route["models"].update(LIGHT_MODELS)
+        route["reasons"].append(f"score {score:.2f}")
+    else:
+        route["reasons"].append(f"score {score:.2f}")
+    return route
+
+
+def plan_routes(tickers: list[str], table: Optional[pd.DataFrame] = None) -> dict[str, dict]:
+    """
+    Routes every ticker in the batch.
+
+    Args:
+        tickers: The batch.
+        table: A screen() result for these tickers, if one was already computed.
+
+    Returns:
+        The route for each ticker (see decide_route), with the signals it was based on
+        under "signals".
+    """
+    if table is None:
+        table = screen(tickers)
+    rule_columns = [c for c in table.columns if c.startswith("pass_")]
+    scores = table[rule_columns].mean(axis=1) if rule_columns else pd.Series(1.0, index=table.index)
+
+    routes = {}
+    for ticker in tickers:
+        has_prices = ticker in table.index and pd.notna(table.at[ticker, "close"])
+        signals = {
+            "score": _float(scores.get(ticker)) if has_prices else None,
+            "volatility": _float(table.at[ticker, "volatility"]) if has_prices else None,
+        }
+        routes[ticker] = {**decide_route(signals), "signals": signals}
+    _log_decisions(routes)
+    return routes
+
+
+def _log_decisions(routes: dict[str, dict]) -> None:
+    """Appends the decisions to {root}/decisions.jsonl."""
+    os.makedirs(_settings["root"], exist_ok=True)
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    with open(os.path.join(_settings["root"], "decisions.jsonl"), "a") as f:
+        for ticker, route in routes.items():
+            f.write(json.dumps({
+                "time": now, "ticker": ticker, "tier": route["tier"], "skip": route["skip"], "models": route["models"],
+                "reasons": route["reasons"], "signals": route["signals"],
+            }) + "\n")
+
+
+def print_routes(routes: dict[str, dict]) -> None:
+    tiers = pd.Series([r["tier"] for r in routes.values()]).value_counts()
+    print(f"Routing: {', '.join(f'{n} {tier}' for tier, n in tiers.items())}")
+    for ticker, route in routes.items():
+        if route["tier"] != "full":
+            print(f"  {ticker:<8} {route['tier']:<8} {'; '.join(route['reasons'])}")
+
+
+async def route_bac(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Before-agent callback skipping agents the ticker's route leaves out (state['route_skip'])."""
+    agent_name = callback_context.agent_name
+    if agent_name in (callback_context.state.get("route_skip") or []):
+        print(f"Router skipped {agent_name} for {callback_context.state.get('ticker')}")
+        return types.Content(role="model", parts=[types.Part(text=f"{agent_name} skipped on the lighter route.")])
+    return None
+
+
+async def route_bmc(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """
+    Before-model callback switching the request to the route's model (state['route_models']).
+
+    Must run before the cache, rate-limit and trace callbacks, which key on the model.
+    """
+    model = (callback_context.state.get("route_models") or {}).get(callback_context.agent_name)
+    if model:
+        llm_request.model = model
+    return None
+
+
+def _model_seconds(tracers: list) -> dict[tuple, float]:
+    """Measured p50 model-call seconds per (agent, model) in this batch."""
+    seconds: dict[tuple, list] = {}
+    for tracer in tracers:
+        for s in tracer.spans:
+            if s["cat"] == "model":
+                seconds.setdefault((s["name"], s["args"].get("model")), []).append(s["dur"] / 1e6)
+    return {key: percentile(values, 50) for key, values in seconds.items()}
+
+
+def route_savings(routes: dict[str, dict], tracers: list, full_models: dict[str, str],
+                  carried: Optional[dict[str, list]] = None) -> dict[str, dict]:
+    """
+    Model time and spend the lighter routes and carried sections avoided, per decision.
+
+    Latencies are this batch's measured p50 for the agent and model where there is
+    one, else MODEL_ESTIMATES; prices always come from MODEL_ESTIMATES.
+
+    Args:
+        routes: plan_routes output.
+        tracers: The batch's tracers.
+        full_models: Each agent's configured (full route) model.
+        carried: Agents whose sections were carried over, per ticker.
+    """
+    measured = _model_seconds(tracers)
+
+    def cost(agent: str, model: Optional[str]) -> tuple[float, float]:
+        if model is None:
+            return 0.0, 0.0
+        estimate = MODEL_ESTIMATES.get(model, {"seconds": 0.0, "usd": 0.0})
+        return measured.get((agent, model), estimate["seconds"]), estimate["usd"]
+
+    totals: dict[str, dict] = {}
+    for ticker in set(routes) | set(carried or {}):
+        route = routes.get(ticker, {"skip": [], "models": {}})
+        kept = (carried or {}).get(ticker, [])
+        decisions = [(f"carry {a}", a, None) for a in kept]
+        decisions += [(f"skip {a}", a, None) for a in route["skip"] if a not in kept]
+        decisions += [(f"{m} for {a}", a, m) for a, m in route["models"].items() if a not in route["skip"] and a not in kept]
+        for label, agent, light_model in decisions:
+            full_seconds, full_usd = cost(agent, full_models.get(agent))
+            light_seconds, light_usd = cost(agent, light_model)
+            row = totals.setdefault(label, {"n": 0, "seconds": 0.0, "usd": 0.0})
+            row["n"] += 1
+            row["seconds"] += full_seconds - light_seconds
+            row["usd"] += full_usd - light_usd
+    return totals
+
+
+def print_route_savings(routes: dict[str, dict], tracers: list, full_models: dict[str, str],
+                        carried: Optional[dict[str, list]] = None) -> None:
+    totals = route_savings(routes, tracers, full_models, carried)
+    if not totals:
+        return
+    print(f"\n{'routing decision':<48}{'n':>5}{'model s saved':>15}{'USD saved':>11}")
+    for label, row in totals.items():
+        print(f"{label:<48}{row['n']:>5}{row['seconds']:>15.1f}{row['usd']:>11.2f}")
+    print(f"{'total':<48}{sum(r['n'] for r in totals.values()):>5}"
+          f"{sum(r['seconds'] for r in totals.values()):>15.1f}{sum(r['usd'] for r in totals.values()):>11.2f}")
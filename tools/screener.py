@@ -0,0 +1,121 @@
+"""
+Deterministic pre-filter that prunes the universe before any LLM call.
+
+Prices come from the shared universe panel (tools/panel.py) and fundamentals from the
+metrics store; every rule is evaluated for all tickers at once on the (tickers, bars)
+panel, so screening a few thousand symbols costs one vectorized pass rather than a
+pipeline run each.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from tools.indicators import on_own_bars, rolling_std
+from tools.metricsstore import get_metrics_store
+from tools.panel import load_panel, universe_panel
+
+# Default rules; set a value to None to disable the rule. A ticker with no data for an
+# enabled rule does not pass it.
+SCREEN_RULES = {
+    "trend": True,                 # SMA_50 above SMA_200
+    "rsi_min": 30.0,
+    "rsi_max": 70.0,
+    "max_ps": 20.0,                # price / trailing-12-month sales
+    "min_market_cap": 1e9,
+}
+
+# Enough daily history for a settled 200-bar SMA.
+HISTORY_DAYS = 400
+
+
+def load_closes(tickers: list[str], number_of_days: int = HISTORY_DAYS, workers: int = 8) -> tuple[list[str], np.ndarray, dict]:
+    """
+    Loads daily closes for `tickers` into one panel, refreshing the price store concurrently.
+
+    Returns:
+        (tickers, closes, errors): the tickers that loaded, a (tickers, bars) close panel
+        and error messages for the ones that did not.
+    """
+    panel = load_panel(tickers, number_of_days, columns=("Close",), workers=workers)
+    if not len(panel):
+        return [], np.empty((0, 0)), panel.errors
+    return panel.tickers, panel.column("Close").astype("f8"), panel.errors
+
+
+def _last_valid(panel: np.ndarray) -> np.ndarray:
+    """Last non-NaN value of each row (NaN for an all-NaN row)."""
+    valid = ~np.isnan(panel)
+    last = panel.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    values = panel[np.arange(panel.shape[0]), last]
+    return np.where(valid.any(axis=1), values, np.nan)
+
+
+def screen(tickers: list[str], rules: Optional[dict] = None, refresh_metrics: bool = True) -> pd.DataFrame:
+    """
+    Applies the screening rules to every ticker.
+
+    Args:
+        tickers: Universe to screen.
+        rules: Overrides for SCREEN_RULES.
+        refresh_metrics: Bring the metrics store up to date first (only stale tickers are fetched).
+
+    Returns:
+        A frame indexed by ticker with the inputs (close, SMA_50, SMA_200, RSI, ps_ratio,
+        market_cap), the annualized 20-day volatility, one boolean column per enabled rule
+        and `passed`.
+    """
+    rules = {**SCREEN_RULES, **(rules or {})}
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+
+    # the same panel then feeds the charts, so each ticker's bars are read once per batch
+    panel = universe_panel(tickers)
+    for ticker in tickers:
+        if ticker in panel.errors:
+            print(f"Screener: no prices for {ticker}: {panel.errors[ticker]}")
+    table = pd.DataFrame(index=pd.Index(tickers, name="ticker"))
+    if len(panel):
+        # indicators per bar are in the panel; take each ticker's reading at its own last bar
+        closes = panel.column("Close").astype("f8")
+        table = table.join(pd.DataFrame({
+            "close": panel.last("Close").astype("f8"),
+            "SMA_50": panel.last("SMA_50").astype("f8"),
+            "SMA_200": panel.last("SMA_200").astype("f8"),
+            "RSI": panel.last("RSI").astype("f8"),
+            "volatility": _last_valid(on_own_bars(
+                lambda c: rolling_std(np.diff(np.log(c), axis=1, prepend=np.nan), 20, ddof=1), closes)) * np.sqrt(252),
+        }, index=pd.Index(panel.tickers, name="ticker")))
+    else:
+        table = table.assign(close=np.nan, SMA_50=np.nan, SMA_200=np.nan, RSI=np.nan, volatility=np.nan)
+
+    if rules.get("max_ps") is not None or rules.get("min_market_cap") is not None:
+        store = get_metrics_store()
+        if refresh_metrics:
+            store.refresh(tickers)
+        table = table.join(store.metrics_table(tickers)[["ps_ratio", "market_cap"]])
+
+    checks = {}
+    if rules.get("trend"):
+        checks["trend"] = table["SMA_50"] > table["SMA_200"]
+    if rules.get("rsi_min") is not None:
+        checks["rsi_min"] = table["RSI"] >= rules["rsi_min"]
+    if rules.get("rsi_max") is not None:
+        checks["rsi_max"] = table["RSI"] <= rules["rsi_max"]
+    if rules.get("max_ps") is not None:
+        checks["max_ps"] = table["ps_ratio"] <= rules["max_ps"]
+    if rules.get("min_market_cap") is not None:
+        checks["min_market_cap"] = table["market_cap"] >= rules["min_market_cap"]
+
+    # comparisons with NaN are False, so missing data fails the rule
+    for name, passed in checks.items():
+        table[f"pass_{name}"] = passed
+    table["passed"] = np.logical_and.reduce([c.to_numpy() for c in checks.values()]) if checks else True
+    return table
+
+
+def print_screen(table: pd.DataFrame) -> None:
+    survivors = table.index[table["passed"]]
+    print(f"Screener kept {len(survivors)}/{len(table)} tickers: {', '.join(survivors) or '-'}")
+    rule_columns = [c for c in table.columns if c.startswith("pass_")]
+    for column in rule_columns:
+        print(f"  {column[5:]:<16} failed by {int((~table[column]).sum())}")
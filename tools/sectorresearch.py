@@ -0,0 +1,157 @@
+"""
+Shared sector research for tickers in the same industry.
+
+The planner groups a batch by sector and industry (from the metrics store); every
+group with at least MIN_GROUP_SIZE tickers gets one sector write-up per day from the
+sector research agent, stored under `{root}/{date}/` and shared by all sessions, so
+the per-ticker fundamental research only has to cover company-specific items.
+Concurrent sessions waiting on the same group share one in-flight call.
+"""
+import datetime
+import os
+import re
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+from tools.metricsstore import get_metrics_store
+from tools.singleflight import SingleFlight
+
+# Groups smaller than this keep the sector analysis in the per-ticker research: a
+# shared call for a single ticker would cost an extra request instead of saving one.
+MIN_GROUP_SIZE = 2
+
+_settings = {
+    "agent": None,
+    "root": os.environ.get("SECTOR_RESEARCH_DIR", "data/sector_research"),
+}
+
+_flights = SingleFlight()
+
+
+def configure_sector_research(agent=None, root: Optional[str] = None) -> None:
+    """Sets the agent that writes sector reports and/or the directory they are kept in."""
+    if agent is not None:
+        _settings["agent"] = agent
+    if root is not None:
+        _settings["root"] = root
+
+
+def group_name(sector: Optional[str], industry: Optional[str]) -> Optional[str]:
+    """'Sector / Industry', or whichever of the two is known; None if neither is."""
+    parts = [p for p in (sector, industry) if isinstance(p, str) and p.strip()]
+    return " / ".join(parts) or None
+
+
+def plan_sector_research(tickers: list[str], refresh: bool = True) -> dict[str, dict]:
+    """
+    Groups tickers by sector and industry.
+
+    Args:
+        tickers: The batch.
+        refresh: Bring the metrics store up to date first (only stale tickers are fetched).
+
+    Returns:
+        For each ticker in a group of at least MIN_GROUP_SIZE, the session state that
+        points it at the shared report: sector_group, sector and industry.
+    """
+    store = get_metrics_store()
+    if refresh:
+        store.refresh(tickers)
+    info = store.info(tickers)
+
+    groups: dict[str, list[str]] = {}
+    labels = {}
+    for ticker in tickers:
+        if ticker not in info.index:
+            continue
+        sector, industry = (value if isinstance(value, str) else "" for value in info.loc[ticker, ["sector", "industry"]])
+        name = group_name(sector, industry)
+        if name:
+            groups.setdefault(name, []).append(ticker)
+            labels[name] = (sector, industry)
+
+    plan = {}
+    for name, members in groups.items():
+        if len(members) < MIN_GROUP_SIZE:
+            continue
+        sector, industry = labels[name]
+        for ticker in members:
+            plan[ticker] = {"sector_group": name, "sector": sector, "industry": industry}
+    return plan
+
+
+def print_plan(plan: dict[str, dict], n_tickers: int) -> None:
+    groups = {}
+    for ticker, state in plan.items():
+        groups.setdefault(state["sector_group"], []).append(ticker)
+    print(f"Sector research: {len(groups)} shared reports cover {len(plan)}/{n_tickers} tickers "
+          f"({len(plan) - len(groups)} sector write-ups saved)")
+    for name, members in sorted(groups.items(), key=lambda g: -len(g[1])):
+        print(f"  {name:<48} {', '.join(members)}")
+
+
+def _path(name: str, day: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+    return os.path.join(_settings["root"], day, f"{slug}.md")
+
+
+async def _research(name: str, sector: str, industry: str, path: str) -> str:
+    from google.adk.runners import InMemoryRunner
+
+    agent = _settings["agent"]
+    async with InMemoryRunner(agent=agent, app_name="sector_research") as runner:
+        session = await runner.session_service.create_session(
+            app_name=runner.app_name, user_id="planner",
+            state={"sector_group": name, "sector": sector, "industry": industry})
+        async for _ in runner.run_async(user_id="planner", session_id=session.id,
+                                        new_message=types.Content(parts=[types.Part(text="BEGIN")])):
+            pass
+        session = await runner.session_service.get_session(app_name=runner.app_name, user_id="planner", session_id=session.id)
+    report = (session.state.get(agent.output_key) or "").strip()
+    if report:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            f.write(report)
+        os.replace(f"{path}.tmp", path)
+    return report
+
+
+async def get_sector_report(name: str, sector: str = "", industry: str = "") -> str:
+    """
+    Today's shared report for a sector group, written by the sector agent on first use.
+
+    Returns an empty string if no sector agent is configured or it produced nothing.
+    """
+    if _settings["agent"] is None:
+        return ""
+    day = datetime.date.today().isoformat()
+    path = _path(name, day)
+    if os.path.exists(path):
+        with open(path) as f:
+            return f.read()
+
+    async def research():
+        print(f"Researching sector {name}")
+        return await _research(name, sector, industry, path)
+
+    return await _flights.do((day, name), research)
+
+
+async def sector_report_bac(callback_context: CallbackContext) -> Optional[types.Content]:
+    """
+    Before-agent callback for the fundamental agent: puts the shared sector report in state['sector_report'].
+
+    Does nothing for tickers the planner left ungrouped, which keep the full sector
+    analysis in their own research.
+    """
+    state = callback_context.state
+    name = state.get("sector_group")
+    if not name or state.get("sector_report"):
+        return None
+    try:
+        state["sector_report"] = await get_sector_report(name, state.get("sector", ""), state.get("industry", ""))
+    except Exception as e:
+        print(f"Sector research for {name} failed, {state.get('ticker')} covers its sector itself: {e}")
+    return None
@@ -0,0 +1,269 @@
+"""
+Disk-backed session and artifact services for long batch runs.
+
+Session state lives in SQLite (ADK's SqliteSessionService) and artifacts in a
+content-addressed blob store: each distinct payload is written once under its
+sha256, and artifact versions are rows pointing at it, so the same chart saved by
+many sessions costs one file. Finished sessions are evicted together with their
+artifacts, and `collect_garbage` drops blobs nothing refers to any more.
+"""
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Iterator, Optional, Union
+
+from google.adk.artifacts.base_artifact_service import ArtifactVersion, BaseArtifactService, ensure_part
+from google.genai import types
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    digest TEXT,
+    mime_type TEXT,
+    part_json TEXT,
+    custom_metadata TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, scope, filename, version)
+);
+CREATE INDEX IF NOT EXISTS artifacts_digest ON artifacts (digest);
+"""
+
+# scope of "user:" artifacts, which outlive sessions
+USER_SCOPE = "user:"
+
+# Minimum age of a blob collect_garbage may delete. A blob is written (or found and
+# touched) before the row pointing at it is inserted, possibly by another process
+# sharing the directory, so a young unreferenced blob may be about to be used.
+BLOB_GRACE_SECONDS = 3600
+
+
+class ContentAddressedArtifactService(BaseArtifactService):
+    """
+    Artifact service storing payloads as `{root}/blobs/{sha[:2]}/{sha}` files indexed in SQLite.
+
+    Inline data is deduplicated by content hash; other parts (text, file references)
+    are small and stored in the index row itself.
+    """
+
+    def __init__(self, root: str = "data/sessions"):
+        self.root = root
+        self.blob_root = os.path.join(root, "blobs")
+        os.makedirs(self.blob_root, exist_ok=True)
+        self.db_path = os.path.join(root, "artifacts.db")
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection for one transaction: committed (or rolled back) and closed on exit."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _scope(filename: str, session_id: Optional[str]) -> str:
+        if filename.startswith("user:"):
+            return USER_SCOPE
+        if session_id is None:
+            raise ValueError("Session ID must be provided for session-scoped artifacts.")
+        return session_id
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_root, digest[:2], digest)
+
+    def _write_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        try:
+            # refreshes the mtime, so collect_garbage leaves the blob alone until the row is in
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    def _save(self, app_name, user_id, filename, part: types.Part, session_id, custom_metadata) -> int:
+        scope = self._scope(filename, session_id)
+        digest, mime_type, part_json = None, None, None
+        if part.inline_data is not None and part.inline_data.data is not None:
+            digest = self._write_blob(part.inline_data.data)
+            mime_type = part.inline_data.mime_type
+        else:
+            part_json = part.model_dump_json(exclude_none=True)
+            mime_type = "text/plain" if part.text is not None else (part.file_data.mime_type if part.file_data else None)
+
+        with self._connect() as conn:
+            # takes the write lock before reading, so concurrent saves get consecutive versions
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT MAX(version) FROM artifacts WHERE app_name = ? AND user_id = ? AND scope = ? AND filename = ?",
+                (app_name, user_id, scope, filename)).fetchone()
+            version = 0 if row[0] is None else row[0] + 1
+            conn.execute("INSERT INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+                app_name, user_id, scope, filename, version, digest, mime_type, part_json,
+                json.dumps(custom_metadata) if custom_metadata else None, time.time()))
+        return version
+
+    def _rows(self, app_name, user_id, filename, session_id, version=None) -> list[tuple]:
+        scope = self._scope(filename, session_id)
+        query = ("SELECT version, digest, mime_type, part_json, custom_metadata, created FROM artifacts "
+                 "WHERE app_name = ? AND user_id = ? AND scope = ? AND filename = ?")
+        params = [app_name, user_id, scope, filename]
+        if version is not None:
+            query += " AND version = ?"
+            params.append(version)
+        with self._connect() as conn:
+            return conn.execute(query + " ORDER BY version", params).fetchall()
+
+    def _load(self, app_name, user_id, filename, session_id, version) -> Optional[types.Part]:
+        rows = self._rows(app_name, user_id, filename, session_id, version)
+        if not rows:
+            return None
+        _, digest, mime_type, part_json, _, _ = rows[-1]
+        if digest is None:
+            return types.Part.model_validate_json(part_json)
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                return types.Part.from_bytes(data=f.read(), mime_type=mime_type)
+        except FileNotFoundError:
+            return None
+
+    def _artifact_version(self, app_name, user_id, filename, session_id, row) -> ArtifactVersion:
+        version, digest, mime_type, _, custom_metadata, created = row
+        return ArtifactVersion(
+            version=version,
+            canonical_uri=f"file://{os.path.abspath(self._blob_path(digest))}" if digest else
+            f"artifact://apps/{app_name}/users/{user_id}/sessions/{session_id}/artifacts/{filename}/versions/{version}",
+            custom_metadata=json.loads(custom_metadata) if custom_metadata else {},
+            create_time=created,
+            mime_type=mime_type,
+        )
+
+    async def save_artifact(self, *, app_name: str, user_id: str, filename: str,
+                            artifact: Union[types.Part, dict[str, Any]], session_id: Optional[str] = None,
+                            custom_metadata: Optional[dict[str, Any]] = None) -> int:
+        return await asyncio.to_thread(self._save, app_name, user_id, filename, ensure_part(artifact), session_id, custom_metadata)
+
+    async def load_artifact(self, *, app_name: str, user_id: str, filename: str,
+                            session_id: Optional[str] = None, version: Optional[int] = None) -> Optional[types.Part]:
+        return await asyncio.to_thread(self._load, app_name, user_id, filename, session_id, version)
+
+    def _keys(self, app_name, user_id, session_id) -> list[str]:
+        scopes = [USER_SCOPE] + ([session_id] if session_id else [])
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT DISTINCT filename FROM artifacts WHERE app_name = ? AND user_id = ? "
+                f"AND scope IN ({','.join('?' * len(scopes))})", (app_name, user_id, *scopes)).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def _delete(self, app_name, user_id, filename, session_id) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM artifacts WHERE app_name = ? AND user_id = ? AND scope = ? AND filename = ?",
+                         (app_name, user_id, self._scope(filename, session_id), filename))
+
+    async def list_artifact_keys(self, *, app_name: str, user_id: str, session_id: Optional[str] = None) -> list[str]:
+        return await asyncio.to_thread(self._keys, app_name, user_id, session_id)
+
+    async def delete_artifact(self, *, app_name: str, user_id: str, filename: str,
+                              session_id: Optional[str] = None) -> None:
+        await asyncio.to_thread(self._delete, app_name, user_id, filename, session_id)
+
+    async def list_versions(self, *, app_name: str, user_id: str, filename: str,
+                            session_id: Optional[str] = None) -> list[int]:
+        rows = await asyncio.to_thread(self._rows, app_name, user_id, filename, session_id)
+        return [row[0] for row in rows]
+
+    async def list_artifact_versions(self, *, app_name: str, user_id: str, filename: str,
+                                     session_id: Optional[str] = None) -> list[ArtifactVersion]:
+        rows = await asyncio.to_thread(self._rows, app_name, user_id, filename, session_id)
+        return [self._artifact_version(app_name, user_id, filename, session_id, row) for row in rows]
+
+    async def get_artifact_version(self, *, app_name: str, user_id: str, filename: str,
+                                   session_id: Optional[str] = None, version: Optional[int] = None) -> Optional[ArtifactVersion]:
+        rows = await asyncio.to_thread(self._rows, app_name, user_id, filename, session_id, version)
+        return self._artifact_version(app_name, user_id, filename, session_id, rows[-1]) if rows else None
+
+    def evict_session(self, app_name: str, user_id: str, session_id: str) -> int:
+        """Drops every artifact version of a session; returns the number of rows removed."""
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM artifacts WHERE app_name = ? AND user_id = ? AND scope = ?",
+                                (app_name, user_id, session_id)).rowcount
+
+    def collect_garbage(self, grace_seconds: float = BLOB_GRACE_SECONDS) -> int:
+        """
+        Deletes blobs no artifact refers to and that are older than `grace_seconds`;
+        returns the number of files removed. Shard directories are left in place, as
+        another process may be about to write into them.
+        """
+        cutoff = time.time() - grace_seconds
+        with self._connect() as conn:
+            live = {row[0] for row in conn.execute("SELECT DISTINCT digest FROM artifacts WHERE digest IS NOT NULL")}
+        removed = 0
+        for entry in os.scandir(self.blob_root):
+            if not entry.is_dir():
+                continue
+            for blob in os.scandir(entry.path):
+                if blob.name in live or blob.name.endswith(".tmp"):
+                    continue
+                try:
+                    if blob.stat().st_mtime < cutoff:
+                        os.remove(blob.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+def create_runner(agent, root: Optional[str] = None, in_memory: bool = False):
+    """
+    Builds the batch runner.
+
+    Args:
+        agent: The root agent.
+        root: Directory for the session database and artifact blobs (default: the
+            SESSION_STORE_DIR env var or data/sessions).
+        in_memory: Keep sessions and artifacts in process memory instead.
+    """
+    if in_memory:
+        from google.adk.runners import InMemoryRunner
+
+        return InMemoryRunner(agent=agent)
+
+    from google.adk.runners import Runner
+    from google.adk.sessions.sqlite_session_service import SqliteSessionService
+
+    root = root or os.environ.get("SESSION_STORE_DIR", "data/sessions")
+    os.makedirs(root, exist_ok=True)
+    return Runner(
+        app_name="stock_analysis_agent",
+        agent=agent,
+        session_service=SqliteSessionService(os.path.join(root, "sessions.db")),
+        artifact_service=ContentAddressedArtifactService(root),
+    )
+
+
+async def evict_session(runner, user_id: str, session_id: str) -> None:
+    """Deletes a finished session and all of its artifacts from the runner's services."""
+    artifacts = runner.artifact_service
+    if isinstance(artifacts, ContentAddressedArtifactService):
+        await asyncio.to_thread(artifacts.evict_session, runner.app_name, user_id, session_id)
+    elif artifacts is not None:
+        for filename in await artifacts.list_artifact_keys(app_name=runner.app_name, user_id=user_id, session_id=session_id):
+            if not filename.startswith("user:"):
+                await artifacts.delete_artifact(app_name=runner.app_name, user_id=user_id, filename=filename, session_id=session_id)
+    await runner.session_service.delete_session(app_name=runner.app_name, user_id=user_id, session_id=session_id)
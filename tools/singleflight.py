@@ -0,0 +1,53 @@
+"""
+Request coalescing: concurrent calls for the same key share one in-flight call.
+
+`SingleFlight` is for coroutines on one event loop; `KeyedLocks` gives threads a
+lock per key so that the second caller finds the first caller's result (e.g. a
+freshly refreshed store entry) instead of repeating the fetch.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; callers arriving meanwhile await the same result."""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns `await func()`, or the result of the identical call already running.
+
+        The call runs in its own task, so one waiter being cancelled does not cancel
+        it for the others. Exceptions are delivered to every waiter.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(func())
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def run_in_thread(self, key: Hashable, func: Callable, *args) -> Any:
+        """`do` for a blocking function, which runs in the default thread pool."""
+        return await self.do(key, lambda: asyncio.to_thread(func, *args))
+
+
+class KeyedLocks:
+    """A lazily created threading.Lock per key."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks: dict[Hashable, threading.Lock] = {}
+
+    def __call__(self, key: Hashable) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
@@ -0,0 +1,248 @@
+"""
+Stage-level tracing for one workflow run.
+
+A Tracer is bound to the current ticker through a context variable, so the ADK
+callbacks below and the `traced` tool wrappers all record into the right run even
+when many sessions execute concurrently. Spans are written in Chrome trace format
+(open the file in chrome://tracing or https://ui.perfetto.dev).
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmResponse, LlmRequest
+from google.genai import types
+
+
+class Tracer:
+    """Collects spans for one ticker run."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans: list[dict] = []
+        self._open: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def begin(self, key: tuple, name: str, cat: str, **args) -> None:
+        self._open[key] = {"name": name, "cat": cat, "ts": self._now_us(), "args": dict(args)}
+
+    def end(self, key: tuple, **args) -> Optional[dict]:
+        span = self._open.pop(key, None)
+        if span is None:
+            return None
+        span["dur"] = self._now_us() - span["ts"]
+        span["args"].update(args)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def is_open(self, key: tuple) -> bool:
+        return key in self._open
+
+    def mark_first(self, key: tuple, arg: str) -> None:
+        """Records the ms elapsed since an open span began under `arg`, once."""
+        span = self._open.get(key)
+        if span is not None and arg not in span["args"]:
+            span["args"][arg] = round((self._now_us() - span["ts"]) / 1000, 1)
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        key = (cat, name, object())
+        self.begin(key, name, cat, **args)
+        try:
+            yield
+        finally:
+            self.end(key)
+
+    def to_chrome_trace(self) -> dict:
+        # one row per category keeps parallel branches readable
+        tids = {}
+        events = []
+        for span in sorted(self.spans, key=lambda s: s["ts"]):
+            tid = tids.setdefault(span["cat"], len(tids) + 1)
+            events.append({"name": span["name"], "cat": span["cat"], "ph": "X", "pid": 1, "tid": tid,
+                           "ts": round(span["ts"], 1), "dur": round(span["dur"], 1), "args": span["args"]})
+        for cat, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": cat}})
+        return {"traceEvents": events, "otherData": {"run": self.name}}
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+_current: contextvars.ContextVar[Optional[Tracer]] = contextvars.ContextVar("tracer", default=None)
+
+
+def start_trace(name: str) -> Tracer:
+    """Creates a tracer and binds it to the current context (and the tasks it spawns)."""
+    tracer = Tracer(name)
+    _current.set(tracer)
+    return tracer
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, cat: str = "tool", **args):
+    """Records a span on the current tracer; a no-op outside a traced run."""
+    tracer = _current.get()
+    if tracer is None:
+        yield
+        return
+    with tracer.span(name, cat, **args):
+        yield
+
+
+def traced(cat: str = "tool", name: Optional[str] = None):
+    """Decorator recording every call of a sync or async function as a span."""
+    def decorator(func):
+        label = name or func.__name__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(label, cat):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _inline_bytes(contents) -> int:
+    total = 0
+    for content in contents or []:
+        for part in (content.parts or []) if isinstance(content, types.Content) else []:
+            if part.inline_data and part.inline_data.data:
+                total += len(part.inline_data.data)
+            # a chart returned by get_stock_chart rides in its function response
+            for media in (part.function_response.parts or []) if part.function_response else []:
+                if media.inline_data and media.inline_data.data:
+                    total += len(media.inline_data.data)
+    return total
+
+
+async def trace_bac(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Before-agent callback opening the agent's stage span."""
+    tracer = _current.get()
+    if tracer is not None:
+        tracer.begin(("agent", callback_context.agent_name), callback_context.agent_name, "agent")
+    return None
+
+
+async def trace_aac(callback_context: CallbackContext) -> Optional[types.Content]:
+    """After-agent callback closing the agent's stage span."""
+    tracer = _current.get()
+    if tracer is not None:
+        tracer.end(("agent", callback_context.agent_name))
+    return None
+
+
+async def trace_bmc(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """
+    Before-model callback opening a model-call span.
+
+    Place it last in the before-model chain so cache hits and rate-limit waits are
+    not counted as model time.
+    """
+    tracer = _current.get()
+    if tracer is not None:
+        tracer.begin(("model", callback_context.agent_name), callback_context.agent_name, "model",
+                     model=llm_request.model, request_image_bytes=_inline_bytes(llm_request.contents))
+    return None
+
+
+async def trace_amc(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """
+    After-model callback recording model latency, token counts and response image bytes.
+
+    The latency is taken at the model's first response. The agents do not stream, so
+    that is the whole response rather than a time to first token.
+    """
+    tracer = _current.get()
+    if tracer is None:
+        return None
+    key = ("model", callback_context.agent_name)
+    if not tracer.is_open(key):
+        return None
+    tracer.mark_first(key, "model_latency_ms")
+    if llm_response.partial:
+        return None
+
+    usage = llm_response.usage_metadata
+    tracer.end(
+        key,
+        prompt_tokens=getattr(usage, "prompt_token_count", None),
+        output_tokens=getattr(usage, "candidates_token_count", None),
+        response_image_bytes=_inline_bytes([llm_response.content] if llm_response.content else []),
+        error=llm_response.error_code,
+    )
+    return None
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile; good enough for a run summary."""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def aggregate(tracers: list[Tracer]) -> list[dict]:
+    """
+    Summarizes spans across runs, one row per (category, name).
+
+    Returns:
+        Rows with n, p50/p95 wall time in seconds, p50 model latency,
+        token totals and image byte totals.
+    """
+    groups: dict[tuple, list[dict]] = {}
+    for tracer in tracers:
+        for s in tracer.spans:
+            groups.setdefault((s["cat"], s["name"]), []).append(s)
+
+    rows = []
+    for (cat, name), spans in sorted(groups.items()):
+        seconds = [s["dur"] / 1e6 for s in spans]
+        latency = [s["args"]["model_latency_ms"] / 1000 for s in spans if s["args"].get("model_latency_ms") is not None]
+        rows.append({
+            "cat": cat,
+            "name": name,
+            "n": len(spans),
+            "p50": percentile(seconds, 50),
+            "p95": percentile(seconds, 95),
+            "model_latency_p50": percentile(latency, 50) if latency else None,
+            "prompt_tokens": sum(s["args"].get("prompt_tokens") or 0 for s in spans),
+            "output_tokens": sum(s["args"].get("output_tokens") or 0 for s in spans),
+            "image_bytes": sum((s["args"].get("request_image_bytes") or 0) + (s["args"].get("response_image_bytes") or 0) for s in spans),
+        })
+    return rows
+
+
+def print_aggregate(tracers: list[Tracer]) -> None:
+    rows = aggregate(tracers)
+    if not rows:
+        return
+    print(f"\n{'stage':<40}{'n':>5}{'p50 (s)':>10}{'p95 (s)':>10}{'model p50':>10}{'in tok':>10}{'out tok':>10}{'img KB':>10}")
+    for r in rows:
+        latency = f"{r['model_latency_p50']:.2f}" if r["model_latency_p50"] is not None else "-"
+        print(f"{r['cat'] + ':' + r['name']:<40}{r['n']:>5}{r['p50']:>10.2f}{r['p95']:>10.2f}{latency:>10}"
+              f"{r['prompt_tokens']:>10}{r['output_tokens']:>10}{r['image_bytes'] / 1024:>10.0f}")